@@ -0,0 +1,84 @@
+import time
+import asyncio
+import argparse
+from fractions import Fraction
+
+from calc_helpers import (
+    DistributionCache,
+    calculate_rational_tail,
+    combined_tail_probability,
+)
+from cogs.bags import run_exact_calculation
+from config import BAG_I_DEFINITION, BAG_II_DEFINITION
+
+# Benchmarks the exact calculation engines against each other and measures
+# the float engines' rounding error against the exact rational result.
+#
+# Usage: python bench_engines.py [--repeat N]
+
+CASES = [
+    (10, 5, 200),
+    (50, 30, 800),
+    (100, 0, 300),
+    (0, 100, 2000),
+    (100, 100, 2300),
+    (100, 100, 4000),
+]
+
+
+def best_time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the exact engines.")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'bag1':>5} {'bag2':>5} {'ss':>6} | {'dict ms':>9} {'array ms':>9} "
+        f"{'rational ms':>11} | {'dict abs err':>12} {'array abs err':>13}"
+    )
+    for bag1, bag2, ss in CASES:
+        dict_time, dict_result = best_time(
+            lambda: asyncio.run(
+                run_exact_calculation(
+                    BAG_I_DEFINITION, BAG_II_DEFINITION, bag1, bag2, [ss]
+                )
+            ),
+            args.repeat,
+        )
+
+        def array_engine():
+            # Fresh cache each run so the timing includes building the folds.
+            cache = DistributionCache()
+            return combined_tail_probability(
+                cache.fold(BAG_I_DEFINITION, bag1),
+                cache.survival(BAG_II_DEFINITION, bag2),
+                ss,
+            )
+
+        array_time, array_result = best_time(array_engine, args.repeat)
+        rational_time, (rational_tail, _) = best_time(
+            lambda: calculate_rational_tail(
+                BAG_I_DEFINITION, BAG_II_DEFINITION, bag1, bag2, ss
+            ),
+            args.repeat,
+        )
+
+        # Fraction(float) is exact, so these are the true rounding errors.
+        dict_error = abs(float(rational_tail - Fraction(dict_result[0][0][1] / 100)))
+        array_error = abs(float(rational_tail - Fraction(array_result)))
+        print(
+            f"{bag1:>5} {bag2:>5} {ss:>6} | {dict_time * 1000:>9.1f} {array_time * 1000:>9.1f} "
+            f"{rational_time * 1000:>11.1f} | {dict_error:>12.3e} {array_error:>13.3e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import sys
+import csv
+import json
+import asyncio
+import argparse
+import multiprocessing
+from types import SimpleNamespace
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import config
+from calc_helpers import DistributionCache
+from distribution_table import ensure_distribution_table
+from cogs.bags import async_parser, result_records
+
+# Runs the /bags calculation without Discord, for precomputing tables, load
+# testing and checking results.
+#
+# Usage:
+#   python calc_cli.py BAG1 BAG2 SS [SS ...]        one query
+#   python calc_cli.py --batch jsonl < queries.jsonl  {"bag1": .., "bag2": .., "ss": ..} per line
+#   python calc_cli.py --batch csv < queries.csv      bag1,bag2,ss rows (header optional)
+#
+# One result is written to stdout per query, in input order, as JSON lines or
+# CSV (--output). Batches are read in chunks; queries in a chunk that share
+# (bag1, bag2) are answered by a single calculation, and different pairs run
+# in parallel worker processes.
+
+try:
+    from scipy.stats import norm  # noqa: F401
+
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+CSV_FIELDS = ["bag1", "bag2", "ss", "probability", "exact", "ci_low", "ci_high", "method", "error"]
+
+_engine = None  # per-process stand-in for the bot instance
+
+
+def make_engine(calc_pool, calc_workers):
+    # The attributes async_parser and the engines read from the bot.
+    engine = SimpleNamespace(
+        **{setting: getattr(config, setting) for setting in config.ENGINE_SETTINGS}
+    )
+    engine.SCIPY_AVAILABLE = SCIPY_AVAILABLE
+    engine.CALC_WORKERS = calc_workers
+    engine.calc_pool = calc_pool
+    engine.distribution_cache = DistributionCache(
+        table=ensure_distribution_table(
+            config.DISTRIBUTION_TABLE_PATH, config.DISTRIBUTION_TABLE_BAGS
+        )
+    )
+    return engine
+
+
+def _init_worker():
+    # Batch workers are already one per core, so their sampling engines run
+    # in-process instead of starting pools of their own.
+    global _engine
+    _engine = make_engine(ThreadPoolExecutor(max_workers=1), 1)
+
+
+def _solve_pair(bag1, bag2, targets, seed):
+    return solve_pair(_engine, bag1, bag2, targets, seed)
+
+
+def solve_pair(engine, bag1, bag2, targets, seed=None):
+    """Answers every target for one (bag1, bag2) pair with one calculation.
+    Returns {ss: result dict}."""
+    try:
+        result_data, method = asyncio.run(
+            async_parser(engine, bag1, bag2, sorted(targets), seed=seed)
+        )
+    except ValueError as e:
+        return {ss: {"error": str(e)} for ss in targets}
+
+    return result_records(result_data, method)
+
+
+def parse_query(raw, input_format):
+    if input_format == "jsonl":
+        data = json.loads(raw)
+        return int(data["bag1"]), int(data["bag2"]), int(data["ss"])
+    row = next(csv.reader([raw]))
+    bag1, bag2, ss = (int(field) for field in row[:3])
+    return bag1, bag2, ss
+
+
+def read_queries(stream, input_format):
+    # Yields (query, error) per non-empty line; a CSV header row is skipped.
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            bag1, bag2, ss = parse_query(line, input_format)
+            if bag1 < 0 or bag2 < 0 or ss < 0:
+                raise ValueError("bag1, bag2 and ss must be non-negative.")
+            yield (bag1, bag2, ss), None
+        except (ValueError, KeyError, TypeError) as e:
+            if input_format == "csv" and line_number == 1:
+                continue
+            yield None, f"line {line_number}: {e}"
+
+
+def read_chunks(queries, chunk_size):
+    chunk = []
+    for item in queries:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_chunk(pool, chunk, seed):
+    # Groups the chunk by (bag1, bag2) so each pair is calculated once.
+    pairs = {}
+    for query, _ in chunk:
+        if query is not None:
+            bag1, bag2, ss = query
+            pairs.setdefault((bag1, bag2), set()).add(ss)
+
+    futures = {
+        pair: pool.submit(_solve_pair, pair[0], pair[1], targets, seed)
+        for pair, targets in pairs.items()
+    }
+    answers = {pair: future.result() for pair, future in futures.items()}
+
+    for query, error in chunk:
+        if query is None:
+            yield {"error": error}
+            continue
+        bag1, bag2, ss = query
+        yield {"bag1": bag1, "bag2": bag2, "ss": ss, **answers[(bag1, bag2)][ss]}
+
+
+def write_result(writer, output_format, result):
+    if output_format == "jsonl":
+        sys.stdout.write(json.dumps(result) + "\n")
+    else:
+        writer.writerow(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soulstone probability calculator.")
+    parser.add_argument("query", nargs="*", type=int, help="BAG1 BAG2 SS [SS ...]")
+    parser.add_argument("--batch", choices=["jsonl", "csv"], help="read queries from stdin")
+    parser.add_argument("--output", choices=["jsonl", "csv"], help="defaults to the batch format, else jsonl")
+    parser.add_argument("--workers", type=int, default=config.CALC_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, help="makes simulated results reproducible")
+    args = parser.parse_args()
+
+    if bool(args.batch) == bool(args.query):
+        parser.error("give either BAG1 BAG2 SS [SS ...] or --batch")
+    if args.query and len(args.query) < 3:
+        parser.error("a query needs BAG1 BAG2 and at least one SS")
+
+    output_format = args.output or args.batch or "jsonl"
+    writer = None
+    if output_format == "csv":
+        writer = csv.DictWriter(sys.stdout, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+
+    workers = max(1, args.workers)
+    # "fork" to match the bot's pool; each worker keeps its caches for the
+    # whole batch.
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=None if args.query else _init_worker,
+    ) as pool:
+        if args.query:
+            # A single pair: the pool serves the sampling engines instead.
+            bag1, bag2, *targets = args.query
+            answers = solve_pair(make_engine(pool, workers), bag1, bag2, set(targets), args.seed)
+            for ss in targets:
+                write_result(writer, output_format, {"bag1": bag1, "bag2": bag2, "ss": ss, **answers[ss]})
+            return
+
+        queries = read_queries(sys.stdin, args.batch)
+        for chunk in read_chunks(queries, max(1, args.chunk_size)):
+            for result in run_chunk(pool, chunk, args.seed):
+                write_result(writer, output_format, result)
+            sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
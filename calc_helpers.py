@@ -0,0 +1,641 @@
+import os
+import json
+import collections
+import math
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+import numpy as np
+
+from loop_monitor import TimeSlice
+
+
+# Numeric helpers shared by the calculation commands. Bag definitions are the
+# same [(value, probability), ...] lists as BAG_I_DEFINITION / BAG_II_DEFINITION.
+
+
+def normalize_bag_definition(box_def):
+    total_prob = sum(prob for val, prob in box_def)
+    return [(val, prob / total_prob) for val, prob in box_def]
+
+
+# Below this many draws before the goal can be reached, stepping is cheaper
+# than the transform in draws_until_by_transform.
+TRANSFORM_MIN_DRAWS = 64
+
+
+class _TailBounds:
+    """Chernoff bounds on the total S_n of n draws, from the moment generating
+    function M of one draw: P(S_n >= t) <= exp(n log M(theta) - theta t) and
+    P(S_n <= t) <= exp(n log M(-theta) + theta t) for every theta > 0."""
+
+    def __init__(self, values, probs):
+        values = np.asarray(values, dtype=float)
+        probs = np.asarray(probs, dtype=float)
+        self.thetas = np.geomspace(1e-6, 5.0, 400) / max(values.max(), 1.0)
+        self.log_mgf_up = np.log(np.exp(np.outer(self.thetas, values)) @ probs)
+        self.log_mgf_down = np.log(np.exp(np.outer(-self.thetas, values)) @ probs)
+
+    def last_below(self, t, tolerance):
+        # Largest n with P(S_n >= t) <= tolerance.
+        usable = self.log_mgf_up > 0
+        bounds = (math.log(tolerance) + self.thetas[usable] * t) / self.log_mgf_up[usable]
+        return max(int(bounds.max(initial=0.0)), 0)
+
+    def first_above(self, t, tolerance):
+        # Smallest n with P(S_n <= t) <= tolerance.
+        usable = self.log_mgf_down < 0
+        bounds = (math.log(tolerance) - self.thetas[usable] * t) / self.log_mgf_down[usable]
+        return math.ceil(bounds.min())
+
+    def upper(self, n, t):
+        with np.errstate(over="ignore"):
+            return float(np.exp(n * self.log_mgf_up - self.thetas * t).min())
+
+    def lower(self, n, t):
+        with np.errstate(over="ignore"):
+            return float(np.exp(n * self.log_mgf_down + self.thetas * t).min())
+
+
+def draws_until_by_transform(values, probs, target_sum, tolerance):
+    """P(N = n) for every n where it exceeds `tolerance`, as an array indexed
+    by n, or None when the goal is reachable within TRANSFORM_MIN_DRAWS.
+
+    N = n exactly when the total is some target_sum - d (1 <= d <= max value)
+    after n - 1 draws and the next draw is at least d. Those few point
+    probabilities come from the discrete Fourier transform phi of one draw,
+    P(S_m = k) = 1/L sum_j phi_j^m e^(2 pi i j k / L), so each n costs one
+    dot product over the frequencies that have not decayed, instead of a
+    shift-and-add over all totals for every draw. L is large enough that
+    wrap-around only moves mass the Chernoff bounds show to be negligible."""
+    bounds = _TailBounds(values, probs)
+    first = bounds.last_below(target_sum, tolerance * 1e-3)
+    if first < TRANSFORM_MIN_DRAWS:
+        return None
+    last = bounds.first_above(target_sum - 1, tolerance * 1e-3) + 1
+    max_value = max(values)
+
+    half_width = 1024
+    while (
+        bounds.lower(first, target_sum - half_width) > tolerance * 1e-6
+        or bounds.upper(last, target_sum + half_width) > tolerance * 1e-6
+    ):
+        half_width *= 2
+    length = 4 * half_width
+
+    single = np.zeros(max_value + 1)
+    for val, prob in zip(values, probs):
+        single[val] += prob
+    at_least = np.cumsum(single[::-1])[::-1]  # at_least[d] = P(X >= d)
+    phi = np.fft.rfft(single, length)
+    # Frequencies other than 0 and L/2 stand for themselves and their conjugate.
+    weights = np.full(len(phi), 2.0 / length)
+    weights[[0, -1]] = 1.0 / length
+
+    # Drop frequencies whose terms are negligible from the first draw count on;
+    # every coefficient is at most E[X] = sum(at_least[1:]) in magnitude.
+    with np.errstate(divide="ignore"):
+        log_magnitude = np.log(np.abs(phi))
+    keep = (first - 1) * log_magnitude + np.log(weights * at_least[1:].sum()) > math.log(
+        tolerance * 1e-6 / len(phi)
+    )
+    frequencies = np.flatnonzero(keep)
+    log_phi = np.log(phi[keep])
+    offsets = (target_sum - np.arange(1, max_value + 1)) % length
+    coefficients = weights[keep] * (
+        np.exp(2j * np.pi * np.outer(frequencies, offsets) / length) @ at_least[1:]
+    )
+
+    # P(N = m + 1) = Re sum_j c_j phi_j^m, evaluated a block of draw counts at
+    # a time: phi_j^(start + r) = phi_j^start * table[r, j].
+    block = 256
+    table = np.exp(np.outer(np.arange(block), log_phi))
+    stop_probs = np.zeros(last + 1)
+    for start in range(first - 1, last, block):
+        count = min(block, last - start)
+        terms = coefficients * np.exp(start * log_phi)
+        stop_probs[start + 1 : start + 1 + count] = (table[:count] @ terms).real
+    np.clip(stop_probs, 0.0, None, out=stop_probs)
+    return stop_probs
+
+
+async def calculate_draws_until_goal(box_def, target_sum, tolerance=1e-12):
+    """Distribution of N, the number of bags opened one by one until the
+    running total reaches at least target_sum. Returns an array where
+    result[n] = P(N = n); mass below `tolerance` is dropped.
+
+    Large goals go through draws_until_by_transform. For small ones each step
+    is one vectorized shift-and-add per bag value over the window of totals
+    still below the goal; totals that reach the goal are removed as the
+    stopping mass of that step, and negligible low totals are trimmed, so the
+    window stays a few standard deviations wide."""
+    box_def = normalize_bag_definition(box_def)
+    if target_sum <= 0:
+        return np.array([1.0])
+    if all(val <= 0 for val, prob in box_def if prob > 0):
+        raise ValueError("This bag can never reach a positive soulstone goal.")
+
+    values = [val for val, prob in box_def if prob > 0]
+    probs = [prob for val, prob in box_def if prob > 0]
+    # Totals only take multiples of the common factor, so the goal can be
+    # counted in those units; this keeps the transform free of lattice peaks.
+    step = math.gcd(*values)
+    values = [val // step for val in values]
+    target_sum = -(-target_sum // step)
+    max_value = max(values)
+
+    stop_probs = draws_until_by_transform(values, probs, target_sum, tolerance)
+    if stop_probs is not None:
+        return stop_probs
+
+    window = np.array([1.0])  # window[i] = P(S_n = offset + i), S_n < target_sum
+    offset = 0
+    stop_probs = [0.0]
+    remaining = 1.0
+    time_slice = TimeSlice("Draws-until-goal distribution")
+    while remaining > tolerance:
+        await time_slice.checkpoint()
+        next_window = np.zeros(len(window) + max_value)
+        for val, prob in zip(values, probs):
+            next_window[val : val + len(window)] += prob * window
+
+        cut = target_sum - offset  # index of the first total >= target_sum
+        stop_probs.append(float(next_window[cut:].sum()))
+        window = next_window[:cut]
+        remaining = float(window.sum())
+
+        significant = np.flatnonzero(window > tolerance * 1e-6)
+        if len(significant) == 0:
+            break
+        window = window[significant[0] :]
+        offset += int(significant[0])
+
+    return np.array(stop_probs)
+
+
+def summarize_draws_until(stop_probs, percentiles=(50, 90)):
+    # Mean plus the smallest n with P(N <= n) >= p for each percentile.
+    draw_counts = np.arange(len(stop_probs))
+    mean_draws = float(np.dot(draw_counts, stop_probs) / stop_probs.sum())
+    cumulative = np.cumsum(stop_probs)
+    quantiles = [
+        (
+            percentile,
+            int(
+                min(
+                    np.searchsorted(cumulative, percentile / 100 - 1e-12),
+                    len(stop_probs) - 1,
+                )
+            ),
+        )
+        for percentile in percentiles
+    ]
+    return mean_draws, quantiles
+
+
+def add_draw(dist, box_def):
+    # Distribution of the total after one more draw from the (normalized) bag:
+    # one shift-and-add per bag value.
+    next_dist = np.zeros(len(dist) + max(val for val, prob in box_def))
+    for val, prob in box_def:
+        next_dist[val : val + len(dist)] += prob * dist
+    return next_dist
+
+
+class DistributionCache:
+    """n-fold distributions of bag definitions as dense arrays indexed by the
+    soulstone total, kept in an LRU shared by the commands (bot.distribution_cache).
+    fold(n) is built from the largest cached fold below n, one shift-and-add
+    per extra draw, so walking n upwards costs one step per call. With a
+    DistributionTable attached, arrays it holds are served from it instead.
+    Calculations run in worker threads as well as on the event loop, so the
+    public methods hold a lock."""
+
+    def __init__(self, max_entries=512, table=None):
+        self.max_entries = max_entries
+        self.table = table
+        self._arrays = collections.OrderedDict()
+        self._lock = threading.RLock()
+
+    def _get(self, key):
+        if self.table is not None:
+            kind, box_key, num_draws = key
+            array = self.table.get(kind, box_key, num_draws)
+            if array is not None:
+                return array
+        array = self._arrays.get(key)
+        if array is not None:
+            self._arrays.move_to_end(key)
+        return array
+
+    def _put(self, key, array):
+        array.flags.writeable = False  # shared between callers
+        self._arrays[key] = array
+        self._arrays.move_to_end(key)
+        while len(self._arrays) > self.max_entries:
+            self._evicted(*self._arrays.popitem(last=False))
+        return array
+
+    def _evicted(self, key, array):
+        pass
+
+    def fold(self, box_def, num_draws):
+        with self._lock:
+            box_key = tuple(box_def)
+            cached = self._get(("fold", box_key, num_draws))
+            if cached is not None:
+                return cached
+
+            if num_draws == 0:
+                return self._put(("fold", box_key, 0), np.array([1.0]))
+
+            start, dist = self._nearest_fold(box_key, num_draws)
+            box_def = normalize_bag_definition(box_def)
+            for draws in range(start + 1, num_draws):
+                dist = self._keep(("fold", box_key, draws), add_draw(dist, box_def))
+            return self._put(("fold", box_key, num_draws), add_draw(dist, box_def))
+
+    def _nearest_fold(self, box_key, num_draws):
+        # (n, fold) for the largest cached n below num_draws, or (0, [1.0]).
+        for start in range(num_draws - 1, 0, -1):
+            dist = self._get(("fold", box_key, start))
+            if dist is not None:
+                return start, dist
+        return 0, np.array([1.0])
+
+    def _keep(self, key, array):
+        # Folds computed on the way to the requested one.
+        return self._put(key, array)
+
+    def survival(self, box_def, num_draws):
+        # survival[k] = P(S >= k) for k in 0..max total, plus a trailing 0.
+        with self._lock:
+            key = ("survival", tuple(box_def), num_draws)
+            cached = self._get(key)
+            if cached is not None:
+                return cached
+            dist = self.fold(box_def, num_draws)
+            survival = np.append(np.cumsum(dist[::-1])[::-1], 0.0)
+            return self._put(key, survival)
+
+    def clear(self):
+        with self._lock:
+            self._arrays.clear()
+
+    def save_snapshot(self, path, max_bytes=64 * 1024 * 1024):
+        """Writes the most recently used arrays, up to `max_bytes`, to an .npz
+        file for load_snapshot() on the next start. Returns how many."""
+        with self._lock:
+            items = list(self._arrays.items())
+        keys, arrays, size = [], [], 0
+        for key, array in reversed(items):
+            size += array.nbytes
+            if size > max_bytes:
+                break
+            keys.append([key[0], [list(item) for item in key[1]], key[2]])
+            arrays.append(np.asarray(array))
+        keys.reverse()  # oldest first, so loading restores the LRU order
+        arrays.reverse()
+        named = {f"a{i}": array for i, array in enumerate(arrays)}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, index=np.array(json.dumps(keys)), **named)
+        os.replace(tmp_path, path)
+        return len(keys)
+
+    def load_snapshot(self, path):
+        # No snapshot (first start, or it was deleted) just means a cold cache.
+        if not path or not os.path.exists(path):
+            return 0
+        with np.load(path) as snapshot:
+            keys = json.loads(str(snapshot["index"]))
+            for i, (kind, box_key, num_draws) in enumerate(keys):
+                key = (kind, tuple(tuple(item) for item in box_key), num_draws)
+                with self._lock:
+                    self._put(key, snapshot[f"a{i}"])
+        return len(keys)
+
+
+class CombinedDistributionCache:
+    """Distributions of the Bag I + Bag II total, with their survival arrays,
+    for recently used (n1, n2) pairs. A pair one draw above a cached one is
+    built from it with add_draw, and one draw below is normally still cached
+    from the way up, so stepping the counts never convolves the bags again.
+    A pair below that is not cached is convolved from the per-bag folds:
+    removing a draw by deconvolution is a recursion whose rounding errors grow
+    geometrically (past 1e8 at 100 Bag I draws), so it is not done."""
+
+    def __init__(self, distribution_cache, max_entries=64):
+        self.distribution_cache = distribution_cache
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.RLock()  # used from worker threads
+
+    def get(self, box1_def, box2_def, draws_box1, draws_box2):
+        """(combined, survival): combined[s] = P(S = s) and survival[s] =
+        P(S >= s), with a trailing 0 so survival[len(combined)] is valid."""
+        with self._lock:
+            return self._get(box1_def, box2_def, draws_box1, draws_box2)
+
+    def _get(self, box1_def, box2_def, draws_box1, draws_box2):
+        box_keys = (tuple(box1_def), tuple(box2_def))
+        key = (box_keys, draws_box1, draws_box2)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+
+        below_box1 = self._entries.get((box_keys, draws_box1 - 1, draws_box2))
+        below_box2 = self._entries.get((box_keys, draws_box1, draws_box2 - 1))
+        if below_box1 is not None:
+            combined = add_draw(below_box1[0], normalize_bag_definition(box1_def))
+        elif below_box2 is not None:
+            combined = add_draw(below_box2[0], normalize_bag_definition(box2_def))
+        else:
+            combined = np.convolve(
+                self.distribution_cache.fold(box1_def, draws_box1),
+                self.distribution_cache.fold(box2_def, draws_box2),
+            )
+        survival = np.append(np.cumsum(combined[::-1])[::-1], 0.0)
+        combined.flags.writeable = False
+        survival.flags.writeable = False
+        self._entries[key] = (combined, survival)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return combined, survival
+
+
+def combined_tail_probability(dist1, survival2, target_sum):
+    # P(S1 + S2 >= target) = sum over s1 of P(S1 = s1) * P(S2 >= target - s1).
+    needed = np.clip(target_sum - np.arange(len(dist1)), 0, len(survival2) - 1)
+    return float(min(np.dot(dist1, survival2[needed]), 1.0))
+
+
+def normal_tail_probability(mean, variance, target_sum):
+    # Same continuity-corrected approximation as run_normal_approximation;
+    # 0.5 * erfc(z / sqrt(2)) == 1 - norm.cdf(z), without SciPy call overhead.
+    if variance == 0:
+        return 1.0 if target_sum <= mean else 0.0
+    z_score = (target_sum - 0.5 - mean) / math.sqrt(variance)
+    return 0.5 * math.erfc(z_score / math.sqrt(2))
+
+
+def find_cheapest_mix(probability, price1, price2, required_prob, max_bags1, max_bags2):
+    """Cheapest (bag1, bag2) with probability(bag1, bag2) >= required_prob,
+    searching 0..max_bags1 of Bag I and 0..max_bags2 of Bag II. probability
+    must be non-decreasing in both counts, so the minimal bag1 for each bag2
+    forms a staircase that only moves down as bag2 grows: the walk needs
+    O(bag1 + bag2) evaluations, and stops once bag2 alone costs more than the
+    best mix found.
+    Returns (best, bag1_alone, bag2_alone, evaluations): best is
+    (bag1, bag2, prob) or None if nothing qualifies, and bagN_alone is the
+    smallest qualifying count of that bag on its own (or None)."""
+    evaluations = 0
+
+    def meets(bag1, bag2):
+        nonlocal evaluations
+        evaluations += 1
+        return probability(bag1, bag2) >= required_prob
+
+    def min_single(only_bag1):
+        # Smallest count of one bag type that qualifies on its own
+        # (exponential then binary search), or None.
+        def check(count):
+            return meets(count, 0) if only_bag1 else meets(0, count)
+
+        max_bags = max_bags1 if only_bag1 else max_bags2
+        high = 1
+        while high < max_bags and not check(high):
+            high *= 2
+        high = min(high, max_bags)
+        if not check(high):
+            return None
+        low = high // 2
+        while low < high:
+            middle = (low + high) // 2
+            if check(middle):
+                high = middle
+            else:
+                low = middle + 1
+        return high
+
+    if required_prob <= 0 or meets(0, 0):
+        return (0, 0, probability(0, 0)), 0, 0, evaluations
+
+    bag1_alone = min_single(True)
+    bag2_alone = min_single(False)
+    bag1 = bag1_alone if bag1_alone is not None else max_bags1
+    bag2_limit = bag2_alone if bag2_alone is not None else max_bags2
+
+    best = None
+    for bag2 in range(bag2_limit + 1):
+        if best is not None and price2 * bag2 >= best[0]:
+            break
+        if not meets(bag1, bag2):
+            continue
+        while bag1 > 0 and meets(bag1 - 1, bag2):
+            bag1 -= 1
+        cost = price1 * bag1 + price2 * bag2
+        if best is None or cost < best[0]:
+            best = (cost, bag1, bag2)
+        if bag1 == 0:
+            break
+
+    if best is not None:
+        _, bag1, bag2 = best
+        best = (bag1, bag2, probability(bag1, bag2))
+    return best, bag1_alone, bag2_alone, evaluations
+
+
+def integer_bag_weights(box_def):
+    # Probabilities as integer weights over a common denominator, e.g. the
+    # whole percentages 0.36, 0.37, ... become 36, 37, ... out of 100.
+    fractions = [
+        (val, Fraction(prob).limit_denominator(10**6)) for val, prob in box_def
+    ]
+    denominator = math.lcm(*(frac.denominator for val, frac in fractions))
+    weights = [(val, int(frac * denominator)) for val, frac in fractions]
+    return weights, sum(weight for val, weight in weights)
+
+
+def integer_power_coefficients(box_def, num_draws):
+    """Integer coefficients of (sum w_v x^v)^n and the denominator W^n, so that
+    P(S_n = s) = coefficients[s] / denominator exactly.
+
+    Kronecker substitution: the polynomial is packed into one big integer with
+    a byte-aligned slot per power of x, wide enough for the largest possible
+    coefficient (at most W^n), so the n-th power is a single CPython bignum
+    pow and the coefficients are read back from the byte slots."""
+    weights, total = integer_bag_weights(box_def)
+    denominator = total**num_draws
+    slot_bytes = denominator.bit_length() // 8 + 1
+    slot_bits = slot_bytes * 8
+
+    packed = sum(weight << (slot_bits * val) for val, weight in weights)
+    max_sum = max(val for val, weight in weights) * num_draws
+    raw = pow(packed, num_draws).to_bytes((max_sum + 1) * slot_bytes, "little")
+    coefficients = [
+        int.from_bytes(raw[total_sum * slot_bytes : (total_sum + 1) * slot_bytes], "little")
+        for total_sum in range(max_sum + 1)
+    ]
+    return coefficients, denominator
+
+
+def calculate_rational_tail(box1_def, box2_def, draws_box1, draws_box2, target_sum):
+    """Exact P(S >= target_sum) and P(S = target_sum) as Fractions, with no
+    float rounding anywhere. Each bag's power is computed on its own (two
+    smaller bignum powers are much cheaper than one packed product of both),
+    then combined with integer tail sums of the Bag II coefficients."""
+    coefficients1, denominator1 = integer_power_coefficients(box1_def, draws_box1)
+    coefficients2, denominator2 = integer_power_coefficients(box2_def, draws_box2)
+
+    tails2 = [0] * (len(coefficients2) + 1)  # tails2[k] = sum of coefficients2[k:]
+    for total_sum in range(len(coefficients2) - 1, -1, -1):
+        tails2[total_sum] = tails2[total_sum + 1] + coefficients2[total_sum]
+
+    tail = 0
+    exact = 0
+    for sum1, coefficient1 in enumerate(coefficients1):
+        needed = target_sum - sum1
+        tail += coefficient1 * tails2[min(max(needed, 0), len(coefficients2))]
+        if 0 <= needed < len(coefficients2):
+            exact += coefficient1 * coefficients2[needed]
+
+    denominator = denominator1 * denominator2
+    return Fraction(tail, denominator), Fraction(exact, denominator)
+
+
+def tilted_bag(box_def, theta):
+    # Exponentially tilted definition p_v * e^(theta v) / M(theta), and the
+    # cumulant K(theta) = log M(theta). Computed in log space so large theta
+    # does not overflow.
+    values = np.array([val for val, prob in box_def], dtype=float)
+    log_weights = np.log([prob for val, prob in box_def]) + theta * values
+    shift = log_weights.max()
+    scaled = np.exp(log_weights - shift)
+    total = scaled.sum()
+    return values, scaled / total, shift + math.log(total)
+
+
+def solve_tilt(box1_def, box2_def, draws_box1, draws_box2, target_sum):
+    # theta >= 0 whose tilted mean n1 K1'(theta) + n2 K2'(theta) equals the
+    # target, so about half the tilted samples land at or above it.
+    def tilted_mean(theta):
+        values1, probs1, _ = tilted_bag(box1_def, theta)
+        values2, probs2, _ = tilted_bag(box2_def, theta)
+        return draws_box1 * values1 @ probs1 + draws_box2 * values2 @ probs2
+
+    if tilted_mean(0.0) >= target_sum:
+        return 0.0
+    high = 0.01
+    while tilted_mean(high) < target_sum:
+        high *= 2
+    low = 0.0
+    for _ in range(60):
+        middle = (low + high) / 2
+        if tilted_mean(middle) < target_sum:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+def run_importance_sampling(
+    box1_def, box2_def, draws_box1, draws_box2, target_sum, num_samples, seed=None
+):
+    """Estimate P(S >= target_sum) by sampling from exponentially tilted bag
+    definitions and reweighting each sample by its likelihood ratio
+    exp(-theta S + n1 K1(theta) + n2 K2(theta)). Accurate for probabilities far
+    too small for plain Monte Carlo. Returns (estimate, standard_error)."""
+    box1_def = normalize_bag_definition(box1_def)
+    box2_def = normalize_bag_definition(box2_def)
+    min_sum = min(v for v, p in box1_def) * draws_box1 + min(v for v, p in box2_def) * draws_box2
+    max_sum = max(v for v, p in box1_def) * draws_box1 + max(v for v, p in box2_def) * draws_box2
+    if target_sum <= min_sum:
+        return 1.0, 0.0
+    if target_sum > max_sum:
+        return 0.0, 0.0
+    if target_sum == max_sum:
+        # Only every bag at its top value reaches it: exact.
+        top1 = sum(p for v, p in box1_def if v == max(val for val, _ in box1_def))
+        top2 = sum(p for v, p in box2_def if v == max(val for val, _ in box2_def))
+        return top1**draws_box1 * top2**draws_box2, 0.0
+
+    theta = solve_tilt(box1_def, box2_def, draws_box1, draws_box2, target_sum)
+    values1, probs1, cumulant1 = tilted_bag(box1_def, theta)
+    values2, probs2, cumulant2 = tilted_bag(box2_def, theta)
+
+    rng = np.random.default_rng(seed)
+    sums = (
+        rng.multinomial(draws_box1, probs1, size=num_samples) @ values1
+        + rng.multinomial(draws_box2, probs2, size=num_samples) @ values2
+    )
+    log_weights = -theta * sums + draws_box1 * cumulant1 + draws_box2 * cumulant2
+    log_weights = np.where(sums >= target_sum, log_weights, -np.inf)
+    shift = log_weights.max()
+    if not np.isfinite(shift):
+        return 0.0, 0.0
+    # Scale by the largest weight so tiny probabilities stay representable
+    # until the final multiplication.
+    scaled = np.exp(log_weights - shift)
+    scale = math.exp(shift)
+    estimate = scale * scaled.mean()
+    standard_error = scale * scaled.std(ddof=1) / math.sqrt(num_samples)
+    return float(estimate), float(standard_error)
+
+
+def simulate_sum_counts(
+    box1_def, box2_def, draws_box1, draws_box2, num_simulations, seed_sequence,
+    batch_size=100_000,
+):
+    """One Monte Carlo worker: draws num_simulations totals from its own
+    SeedSequence stream and returns them as a histogram (offset, counts), with
+    counts[i] the number of totals equal to offset + i. Histograms from
+    several workers are merged with merge_sum_counts."""
+    box1_def = normalize_bag_definition(box1_def)
+    box2_def = normalize_bag_definition(box2_def)
+    values1 = np.array([val for val, prob in box1_def], dtype=np.int64)
+    values2 = np.array([val for val, prob in box2_def], dtype=np.int64)
+    probs1 = np.array([prob for val, prob in box1_def])
+    probs2 = np.array([prob for val, prob in box2_def])
+
+    rng = np.random.default_rng(seed_sequence)
+    # A bag's total only depends on how often each value came up, so one
+    # multinomial draw replaces draws_box1 categorical draws.
+    batches = []
+    remaining = num_simulations
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        batches.append(
+            rng.multinomial(draws_box1, probs1, size=size) @ values1
+            + rng.multinomial(draws_box2, probs2, size=size) @ values2
+        )
+        remaining -= size
+    sums = np.concatenate(batches)
+    offset = int(sums.min())
+    return offset, np.bincount(sums - offset)
+
+
+def start_calc_pool(max_workers):
+    """ProcessPoolExecutor for the CPU-heavy engines, with every worker forked
+    before this returns. Forking a process that already runs threads (the
+    event loop's executor, aiohttp, sqlite) can copy a lock another thread
+    holds, so the pool must not fork lazily on its first task. "fork" rather
+    than "spawn": main.py starts the bot at import time, so workers must not
+    re-import it."""
+    pool = ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("fork")
+    )
+    # With "fork", the first submit starts all max_workers processes.
+    pool.submit(int).result()
+    return pool
+
+
+def merge_sum_counts(histograms):
+    # Returns {total: count} over all worker histograms.
+    merged = collections.Counter()
+    for offset, counts in histograms:
+        for index in np.flatnonzero(counts):
+            merged[offset + int(index)] += int(counts[index])
+    return merged
@@ -2,11 +2,28 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import asyncio
+import bisect
 import collections
 import math
 import numpy as np
 import logging
-from collections import Counter
+import decimal
+from statistics import NormalDist
+from shared_state import shared_cooldown
+from embed_cache import profile_version
+from loop_monitor import TimeSlice
+from calc_helpers import (
+    calculate_draws_until_goal,
+    summarize_draws_until,
+    combined_tail_probability,
+    normal_tail_probability,
+    find_cheapest_mix,
+    calculate_rational_tail,
+    run_importance_sampling,
+    simulate_sum_counts,
+    merge_sum_counts,
+    normalize_bag_definition,
+)
 
 logger = logging.getLogger("discord_bot")
 
@@ -17,9 +34,10 @@ logger = logging.getLogger("discord_bot")
 
 # Helper functions for calculations (can be in a separate 'calc_helpers.py' if complex)
 async def calculate_exact_probabilities(box_def, num_draws):
+    time_slice = TimeSlice("Exact distribution")
     current_probabilities = {0: 1.0}
     for _ in range(num_draws):
-        await asyncio.sleep(0)  # Yield control
+        await time_slice.checkpoint()
         next_probabilities = collections.defaultdict(float)
         for prev_sum, prev_prob in current_probabilities.items():
             for value, prob_of_value in box_def:
@@ -30,61 +48,215 @@ async def calculate_exact_probabilities(box_def, num_draws):
     return current_probabilities
 
 
-async def run_exact_calculation(box1_def, box2_def, draws_box1, draws_box2, target_sum):
+async def build_combined_distribution(box1_def, box2_def, draws_box1, draws_box2):
     box1_sums_probs = await calculate_exact_probabilities(box1_def, draws_box1)
     box2_sums_probs = await calculate_exact_probabilities(box2_def, draws_box2)
 
+    time_slice = TimeSlice("Exact combination")
     combined_sums_probs = collections.defaultdict(float)
     for sum1, prob1 in box1_sums_probs.items():
-        await asyncio.sleep(0)  # Yield control
+        await time_slice.checkpoint()
         for sum2, prob2 in box2_sums_probs.items():
             combined_sums_probs[sum1 + sum2] += prob1 * prob2
+    return combined_sums_probs
 
-    prob_at_least_target = sum(
-        prob for s, prob in combined_sums_probs.items() if s >= target_sum
+
+def tail_probabilities(combined_sums_probs):
+    # Sorted sums plus tail_probs[i] = P(S >= sorted_sums[i]), from one pass.
+    sorted_sums = sorted(combined_sums_probs)
+    tail_probs = [0.0] * (len(sorted_sums) + 1)
+    for i in range(len(sorted_sums) - 1, -1, -1):
+        tail_probs[i] = tail_probs[i + 1] + combined_sums_probs[sorted_sums[i]]
+    return sorted_sums, tail_probs
+
+
+def summarize_targets(combined_sums_probs, target_sums, tails=None):
+    # P(S >= s) for every sum is known after one pass, so any number of
+    # targets is answered from the same distribution.
+    sorted_sums, tail_probs = tails or tail_probabilities(combined_sums_probs)
+
+    target_results = []
+    for target_sum in target_sums:
+        prob_at_least_target = tail_probs[bisect.bisect_left(sorted_sums, target_sum)]
+        prob_exact_target = combined_sums_probs.get(target_sum, 0.0)
+        target_results.append(
+            (target_sum, min(prob_at_least_target, 1.0) * 100, prob_exact_target * 100)
+        )
+    return target_results
+
+
+def summarize_quantiles(combined_sums_probs, percentiles, tails=None):
+    # For each percentile p: the largest total X with P(S >= X) >= p%, i.e.
+    # "p% of the time you get at least X". tail_probs is non-increasing, so
+    # this is a binary search over the cumulative sums.
+    sorted_sums, tail_probs = tails or tail_probabilities(combined_sums_probs)
+    descending_tails = [-p for p in tail_probs[:-1]]
+
+    quantile_results = []
+    for percentile in percentiles:
+        level = percentile / 100 - 1e-12  # tolerate float rounding in the sums
+        index = bisect.bisect_right(descending_tails, -level) - 1
+        quantile_results.append((percentile, sorted_sums[max(index, 0)]))
+    return quantile_results
+
+
+async def run_exact_calculation(
+    box1_def, box2_def, draws_box1, draws_box2, target_sums, percentiles=()
+):
+    combined_sums_probs = await build_combined_distribution(
+        box1_def, box2_def, draws_box1, draws_box2
     )
-    prob_exact_target = combined_sums_probs.get(target_sum, 0.0)
+    tails = tail_probabilities(combined_sums_probs)
+    target_results = summarize_targets(combined_sums_probs, target_sums, tails)
+    quantile_results = summarize_quantiles(combined_sums_probs, percentiles, tails)
 
     sorted_sums = sorted(
         combined_sums_probs.items(), key=lambda item: item[1], reverse=True
     )
     top_3_sums_with_probs = [(s, p) for s, p in sorted_sums[:3]]
-    return (prob_at_least_target * 100, top_3_sums_with_probs, prob_exact_target * 100)
+    return (target_results, top_3_sums_with_probs, quantile_results, [])
 
 
-def simulate_single_bag_draws(box_def, num_draws):
-    if not box_def or num_draws == 0:
-        return 0
-    values = np.array([val for val, prob in box_def])
-    probabilities = np.array([prob for val, prob in box_def])
-    probabilities /= probabilities.sum()
-    total_sum = np.random.choice(values, size=num_draws, p=probabilities).sum()
-    return int(total_sum)
+SIMULATION_CHUNKS = 16  # Monte Carlo work units; at least the usual core count
 
 
 async def run_monte_carlo_simulation(
-    box1_def, box2_def, draws_box1, draws_box2, target_sum, num_simulations
+    bot_instance,
+    box1_def,
+    box2_def,
+    draws_box1,
+    draws_box2,
+    target_sums,
+    num_simulations,
+    percentiles=(),
+    seed=None,
+):
+    # The simulations are split into a fixed number of chunks, each with an
+    # independent stream spawned from one SeedSequence, and the pool runs the
+    # chunks: a given seed reproduces the result whatever CALC_WORKERS is.
+    chunk_count = max(1, min(SIMULATION_CHUNKS, num_simulations))
+    seed_sequences = np.random.SeedSequence(seed).spawn(chunk_count)
+    chunk, remainder = divmod(num_simulations, chunk_count)
+
+    loop = asyncio.get_running_loop()
+    histograms = await asyncio.gather(
+        *(
+            loop.run_in_executor(
+                bot_instance.calc_pool,
+                simulate_sum_counts,
+                box1_def,
+                box2_def,
+                draws_box1,
+                draws_box2,
+                chunk + (1 if index < remainder else 0),
+                seed_sequence,
+            )
+            for index, seed_sequence in enumerate(seed_sequences)
+        )
+    )
+    sum_counts = merge_sum_counts(histograms)
+    combined_sums_probs = {
+        total: count / num_simulations for total, count in sum_counts.items()
+    }
+
+    tails = tail_probabilities(combined_sums_probs)
+    target_results = [
+        (ss, prob_at_least_target, None)
+        for ss, prob_at_least_target, _ in summarize_targets(
+            combined_sums_probs, target_sums, tails
+        )
+    ]
+    quantile_results = summarize_quantiles(combined_sums_probs, percentiles, tails)
+
+    # Wilson score interval: stays sensible when no simulation hit the target.
+    z = 1.96
+    confidence_intervals = []
+    for _, prob_at_least_target, _ in target_results:
+        p = prob_at_least_target / 100
+        denominator = 1 + z**2 / num_simulations
+        center = (p + z**2 / (2 * num_simulations)) / denominator
+        half_width = (
+            z
+            * math.sqrt(
+                p * (1 - p) / num_simulations + z**2 / (4 * num_simulations**2)
+            )
+            / denominator
+        )
+        confidence_intervals.append(
+            (max(center - half_width, 0.0) * 100, min(center + half_width, 1.0) * 100)
+        )
+    return target_results, [], quantile_results, confidence_intervals
+
+
+def run_table_calculation(
+    cache, box1_def, box2_def, draws_box1, draws_box2, target_sums, percentiles=()
+):
+    # Same results as run_exact_calculation, from the per-bag arrays that the
+    # memory-mapped distribution table serves without computing them.
+    dist1 = cache.fold(box1_def, draws_box1)
+    dist2 = cache.fold(box2_def, draws_box2)
+    survival2 = cache.survival(box2_def, draws_box2)
+
+    target_results = []
+    for target_sum in target_sums:
+        prob_at_least_target = combined_tail_probability(dist1, survival2, target_sum)
+        # P(S = t) = sum of dist1[i] * dist2[t - i] over the overlapping range.
+        low = max(0, target_sum - len(dist2) + 1)
+        high = min(len(dist1), target_sum + 1)
+        prob_exact_target = 0.0
+        if low < high:
+            prob_exact_target = float(
+                np.dot(
+                    dist1[low:high],
+                    dist2[target_sum - high + 1 : target_sum - low + 1][::-1],
+                )
+            )
+        target_results.append(
+            (target_sum, prob_at_least_target * 100, prob_exact_target * 100)
+        )
+
+    # Top sums and percentiles need the whole combined distribution.
+    combined = np.convolve(dist1, dist2)
+    quantile_results = array_quantiles(combined, percentiles)
+    return (target_results, array_top_sums(combined), quantile_results, [])
+
+
+def run_combined_calculation(
+    combined_cache, box1_def, box2_def, draws_box1, draws_box2, target_sums, percentiles=()
 ):
-    successful_outcomes = 0
-    combined_sums_for_stats = []
+    # Same results again, for the result buttons: each goal is a lookup in
+    # the cached survival array of the combined distribution, which a one-draw
+    # step updates with a single shift-and-add.
+    combined, survival = combined_cache.get(box1_def, box2_def, draws_box1, draws_box2)
+    target_results = [
+        (
+            target_sum,
+            float(survival[min(target_sum, len(combined))]) * 100,
+            float(combined[target_sum]) * 100 if target_sum < len(combined) else 0.0,
+        )
+        for target_sum in target_sums
+    ]
+    quantile_results = array_quantiles(combined, percentiles)
+    return (target_results, array_top_sums(combined), quantile_results, [])
+
 
-    batch_size = max(1, num_simulations // 1000)
+def array_top_sums(combined):
+    top_indices = np.argsort(-combined, kind="stable")[:3]
+    return [
+        (int(index), float(combined[index])) for index in top_indices if combined[index] > 0
+    ]
 
-    for i in range(num_simulations):
-        if i % batch_size == 0:
-            await asyncio.sleep(0)
-        sum1 = simulate_single_bag_draws(box1_def, draws_box1)
-        sum2 = simulate_single_bag_draws(box2_def, draws_box2)
-        total_sum = sum1 + sum2
-        combined_sums_for_stats.append(total_sum)
-        if total_sum >= target_sum:
-            successful_outcomes += 1
 
-    prob_at_least_target = (successful_outcomes / num_simulations) * 100
-    sum_counts = Counter(combined_sums_for_stats)
-    top_3_raw = sum_counts.most_common(3)
-    top_3_sums_with_probs = [(s, count / num_simulations) for s, count in top_3_raw]
-    return prob_at_least_target, top_3_sums_with_probs
+def array_quantiles(combined, percentiles):
+    # summarize_quantiles for a dense distribution indexed by the total.
+    tails = np.cumsum(combined[::-1])[::-1]
+    quantile_results = []
+    for percentile in percentiles:
+        level = percentile / 100 - 1e-12  # tolerate float rounding in the sums
+        # tails is non-increasing: the answer is the last index still >= level.
+        quantile_sum = int(np.searchsorted(-tails, -level, side="right")) - 1
+        quantile_results.append((percentile, max(quantile_sum, 0)))
+    return quantile_results
 
 
 def get_bag_stats(box_def):
@@ -104,7 +276,13 @@ def get_bag_stats(box_def):
 
 
 def run_normal_approximation(
-    box1_def, box2_def, draws_box1, draws_box2, target_sum, scipy_available
+    box1_def,
+    box2_def,
+    draws_box1,
+    draws_box2,
+    target_sums,
+    scipy_available,
+    percentiles=(),
 ):
     if not scipy_available:
         # This check is crucial if you are calling this function directly.
@@ -118,15 +296,72 @@ def run_normal_approximation(
     total_variance = (var1 * draws_box1) + (var2 * draws_box2)
     total_std_dev = math.sqrt(total_variance)
 
-    if total_std_dev == 0:
-        return (100.0, []) if target_sum <= total_mean else (0.0, [])
+    target_results = []
+    for target_sum in target_sums:
+        if total_std_dev == 0:
+            prob_at_least_target = 100.0 if target_sum <= total_mean else 0.0
+        else:
+            z_score = (target_sum - 0.5 - total_mean) / total_std_dev
+            prob_at_least_target = (1 - norm.cdf(z_score)) * 100
+        # No meaningful point probability from the approximation.
+        target_results.append((target_sum, prob_at_least_target, None))
+
+    # Inverse CDF with the same continuity correction as above: the largest X
+    # with 1 - cdf((X - 0.5 - mean) / sd) >= p.
+    quantile_results = []
+    for percentile in percentiles:
+        if total_std_dev == 0:
+            quantile_sum = math.floor(total_mean)
+        else:
+            quantile_sum = math.floor(
+                total_mean + 0.5 + total_std_dev * norm.ppf(1 - percentile / 100)
+            )
+        quantile_results.append((percentile, max(quantile_sum, 0)))
+    return target_results, [], quantile_results, []
+
 
-    z_score = (target_sum - 0.5 - total_mean) / total_std_dev
-    prob_at_least_target = (1 - norm.cdf(z_score)) * 100
-    return prob_at_least_target, []
+async def run_tail_sampling(
+    bot_instance, box1_def, box2_def, draws_box1, draws_box2, target_sums
+):
+    # One importance-sampling run per target (each needs its own tilt), spread
+    # over the calculation worker pool.
+    loop = asyncio.get_running_loop()
+    estimates = await asyncio.gather(
+        *(
+            loop.run_in_executor(
+                bot_instance.calc_pool,
+                run_importance_sampling,
+                box1_def,
+                box2_def,
+                draws_box1,
+                draws_box2,
+                target_sum,
+                bot_instance.TAIL_SAMPLES,
+            )
+            for target_sum in target_sums
+        )
+    )
+    target_results = []
+    confidence_intervals = []
+    for target_sum, (estimate, standard_error) in zip(target_sums, estimates):
+        target_results.append((target_sum, estimate * 100, None))
+        confidence_intervals.append(
+            (
+                max(estimate - 1.96 * standard_error, 0.0) * 100,
+                min(estimate + 1.96 * standard_error, 1.0) * 100,
+            )
+        )
+    return target_results, confidence_intervals
 
 
-async def async_parser(bot_instance, num_draws_box1, num_draws_box2, target_sum_value):
+async def async_parser(
+    bot_instance,
+    num_draws_box1,
+    num_draws_box2,
+    target_sums,
+    percentiles=(),
+    seed=None,
+):
     # Access definitions and thresholds from bot_instance
     box1_def_normalized = [
         (val, prob / sum(p for v, p in bot_instance.BAG_I_DEFINITION))
@@ -137,7 +372,24 @@ async def async_parser(bot_instance, num_draws_box1, num_draws_box2, target_sum_
         for val, prob in bot_instance.BAG_II_DEFINITION
     ]
 
+    table = bot_instance.distribution_cache.table
     if (
+        table is not None
+        and table.covers(box1_def_normalized, num_draws_box1)
+        and table.covers(box2_def_normalized, num_draws_box2)
+    ):
+        result_data = await asyncio.to_thread(
+            run_table_calculation,
+            bot_instance.distribution_cache,
+            box1_def_normalized,
+            box2_def_normalized,
+            num_draws_box1,
+            num_draws_box2,
+            target_sums,
+            percentiles,
+        )
+        method = "exact"
+    elif (
         num_draws_box1 <= bot_instance.EXACT_CALC_THRESHOLD_BOX1
         and num_draws_box2 <= bot_instance.EXACT_CALC_THRESHOLD_BOX2
     ):
@@ -146,7 +398,8 @@ async def async_parser(bot_instance, num_draws_box1, num_draws_box2, target_sum_
             box2_def_normalized,
             num_draws_box1,
             num_draws_box2,
-            target_sum_value,
+            target_sums,
+            percentiles,
         )
         method = "exact"
     elif bot_instance.SCIPY_AVAILABLE:
@@ -155,24 +408,171 @@ async def async_parser(bot_instance, num_draws_box1, num_draws_box2, target_sum_
             box2_def_normalized,
             num_draws_box1,
             num_draws_box2,
-            target_sum_value,
+            target_sums,
             bot_instance.SCIPY_AVAILABLE,  # Pass this explicitly
-        )
-        result_data = (
-            result_data[0],
-            result_data[1],
-            0.0,
+            percentiles,
         )
         method = "normal_approx"
+        # The normal approximation is unreliable far out in the tail, where it
+        # returns ~0%. Those targets (only those) are estimated by importance
+        # sampling instead; the others keep their normal value and get a
+        # (None, None) interval.
+        tail_targets = [
+            ss
+            for ss, prob, _ in result_data[0]
+            if prob < bot_instance.TAIL_SAMPLING_THRESHOLD * 100
+        ]
+        if tail_targets:
+            sampled_results, sampled_intervals = await run_tail_sampling(
+                bot_instance,
+                box1_def_normalized,
+                box2_def_normalized,
+                num_draws_box1,
+                num_draws_box2,
+                tail_targets,
+            )
+            sampled = {
+                result[0]: (result, interval)
+                for result, interval in zip(sampled_results, sampled_intervals)
+            }
+            target_results = []
+            confidence_intervals = []
+            for result in result_data[0]:
+                result, interval = sampled.get(result[0], (result, (None, None)))
+                target_results.append(result)
+                confidence_intervals.append(interval)
+            result_data = (target_results, [], result_data[2], confidence_intervals)
+            method = "importance_sampling"
     else:
-        raise ValueError(
-            "Inputs are too large for exact calculation, and the SciPy library is not available for approximation. Please contact the bot owner if you believe this is an error or need SciPy installed."
+        result_data = await run_monte_carlo_simulation(
+            bot_instance,
+            box1_def_normalized,
+            box2_def_normalized,
+            num_draws_box1,
+            num_draws_box2,
+            target_sums,
+            bot_instance.MONTE_CARLO_SIMULATIONS,
+            percentiles,
+            seed,
         )
+        method = "monte_carlo"
     return result_data, method
 
 
+def target_method(method, interval):
+    # With importance sampling only the targets with an interval were sampled;
+    # the rest are the normal approximation.
+    if method == "importance_sampling" and interval[0] is None:
+        return "normal_approx"
+    return method
+
+
+def result_records(result_data, method):
+    # async_parser's per-target results as plain JSON-ready dicts, keyed by
+    # target (for calc_cli.py and the HTTP API).
+    target_results, _, _, confidence_intervals = result_data
+    intervals = confidence_intervals or [(None, None)] * len(target_results)
+    records = {}
+    for (ss, prob_at_least_target, prob_exact_target), (low, high) in zip(
+        target_results, intervals
+    ):
+        records[ss] = {
+            "probability": float(prob_at_least_target),
+            "exact": None if prob_exact_target is None else float(prob_exact_target),
+            "ci_low": low,
+            "ci_high": high,
+            "method": target_method(method, (low, high)),
+        }
+    return records
+
+
+def parse_targets(text):
+    # Accepts "500", "500 800 1000" or "500, 800, 1000".
+    parts = text.replace(",", " ").split()
+    if not parts:
+        raise ValueError("Please give at least one soulstones goal.")
+    try:
+        target_sums = [int(part) for part in parts]
+    except ValueError:
+        raise ValueError(
+            "Soulstone goals must be whole numbers separated by spaces or commas."
+        )
+    return target_sums
+
+
+def parse_percentiles(text):
+    # Accepts "90", "10 50 90 99", "10%, 50%" ... each strictly between 0 and 100.
+    parts = text.replace(",", " ").replace("%", " ").split()
+    try:
+        percentiles = [float(part) for part in parts]
+    except ValueError:
+        raise ValueError("Percentiles must be numbers such as `10 50 90 99`.")
+    if any(not 0 < percentile < 100 for percentile in percentiles):
+        raise ValueError("Percentiles must be between 0 and 100 (exclusive).")
+    return percentiles
+
+
+SS_SUGGESTION_LEVELS = (50, 75, 90, 99)
+
+
+def suggest_targets(bot_instance, bag1, bag2, levels=SS_SUGGESTION_LEVELS):
+    """(level, goal) pairs, goal being the largest total reached with at least
+    `level`% probability. Autocomplete calls this on every keystroke, so it
+    never computes a distribution: exact from the memory-mapped table when it
+    has both bags, otherwise the O(1) normal approximation."""
+    box1_def = bot_instance.BAG_I_DEFINITION
+    box2_def = bot_instance.BAG_II_DEFINITION
+    table = bot_instance.distribution_cache.table
+    if table is None or not (table.covers(box1_def, bag1) and table.covers(box2_def, bag2)):
+        mean1, var1 = get_bag_stats(box1_def)
+        mean2, var2 = get_bag_stats(box2_def)
+        return normal_quantiles(mean1 * bag1 + mean2 * bag2, var1 * bag1 + var2 * bag2, levels)
+
+    dist1 = table.get("fold", box1_def, bag1)
+    survival2 = table.get("survival", box2_def, bag2)
+    suggestions = []
+    for level in levels:
+        # P(S >= t) is non-increasing in t: binary search for the last t
+        # still at the level, one dot product per step.
+        low, high = 0, len(dist1) + len(survival2) - 2
+        while low < high:
+            middle = (low + high + 1) // 2
+            if combined_tail_probability(dist1, survival2, middle) >= level / 100 - 1e-12:
+                low = middle
+            else:
+                high = middle - 1
+        suggestions.append((level, low))
+    return suggestions
+
+
+def format_percentile(percentile):
+    return f"{percentile:g}%"
+
+
+def format_probability(percent):
+    # Fixed 4 decimals, switching to scientific notation for tiny values.
+    if percent == 0 or percent >= 0.0001:
+        return f"{percent:.4f}"
+    return f"{percent:.3e}"
+
+
 # Embed generation functions for this cog
 async def create_baginfo_embed(bot_instance: commands.Bot):
+    # Static content: served from the embed cache, rebuilt only when the bag
+    # definitions, thresholds or bot profile change.
+    version = (
+        profile_version(bot_instance),
+        tuple(bot_instance.BAG_I_DEFINITION),
+        tuple(bot_instance.BAG_II_DEFINITION),
+        bot_instance.EXACT_CALC_THRESHOLD_BOX1,
+        bot_instance.EXACT_CALC_THRESHOLD_BOX2,
+    )
+    return await bot_instance.embed_cache.get(
+        "baginfo", version, lambda: build_baginfo_embed(bot_instance)
+    )
+
+
+async def build_baginfo_embed(bot_instance: commands.Bot):
     bag1_exp, _ = get_bag_stats(bot_instance.BAG_I_DEFINITION)
     bag2_exp, _ = get_bag_stats(bot_instance.BAG_II_DEFINITION)
 
@@ -223,25 +623,28 @@ async def create_bags_embed(
     bot_instance,
     bag1,
     bag2,
-    ss,
-    prob_at_least_target,
+    target_results,
     top_sums,
     method_used,
-    prob_exact_target=None,
+    quantile_results=(),
+    confidence_intervals=(),
 ):
     embed = discord.Embed(
         title="📊 Soulstone Probability Results",
         description="Here are the calculation results for your bag draws:",
         color=(
-            discord.Color.green() if prob_at_least_target > 0 else discord.Color.red()
+            discord.Color.green()
+            if any(prob > 0 for _, prob, _ in target_results)
+            else discord.Color.red()
         ),
     )
     if bot_instance.user and bot_instance.user.display_avatar:
         embed.set_thumbnail(url=bot_instance.user.display_avatar.url)
 
+    targets_text = ", ".join(f"`{ss}`" for ss, _, _ in target_results)
     embed.add_field(
         name="🔢 Input Parameters",
-        value=f"**Bag I Draws:** `{bag1}`\n**Bag II Draws:** `{bag2}`\n**Target Soulstones (at least):** `{ss}`",
+        value=f"**Bag I Draws:** `{bag1}`\n**Bag II Draws:** `{bag2}`\n**Target Soulstones (at least):** {targets_text}",
         inline=False,
     )
 
@@ -261,10 +664,37 @@ async def create_bags_embed(
         )
     elif method_used == "exact":
         calculation_method_note = "\n*(Result is exact)*"
-
-    prob_result_text = f"**Probability of Soulstones being at least `{ss}`:** `{prob_at_least_target:.4f}%`"
-    if method_used == "exact" and prob_exact_target is not None:
-        prob_result_text += f"\n**Probability of Soulstones being exactly `{ss}`:** `{prob_exact_target:.4f}%`"
+    elif method_used == "importance_sampling":
+        if all(low is not None for low, _ in confidence_intervals):
+            calculation_method_note = "\n*(Extreme-tail result estimated by importance sampling, with 95% confidence intervals)*"
+        else:
+            calculation_method_note = "\n*(Approximation based on Normal Distribution; goals with a 95% confidence interval are extreme tails estimated by importance sampling)*"
+    elif method_used == "monte_carlo":
+        calculation_method_note = f"\n*(Result estimated from `{bot_instance.MONTE_CARLO_SIMULATIONS:,}` simulations, with 95% confidence intervals)*"
+
+    if confidence_intervals:
+        prob_lines = []
+        for (ss, prob_at_least_target, _), (low, high) in zip(
+            target_results, confidence_intervals
+        ):
+            line = f"**At least `{ss}`:** `{format_probability(prob_at_least_target)}%`"
+            if low is not None:  # None: a normal-approximation target
+                line += f" (95% CI: `{format_probability(low)}%` – `{format_probability(high)}%`)"
+            prob_lines.append(line)
+        prob_result_text = "\n".join(prob_lines)
+    elif len(target_results) == 1:
+        ss, prob_at_least_target, prob_exact_target = target_results[0]
+        prob_result_text = f"**Probability of Soulstones being at least `{ss}`:** `{prob_at_least_target:.4f}%`"
+        if method_used == "exact" and prob_exact_target is not None:
+            prob_result_text += f"\n**Probability of Soulstones being exactly `{ss}`:** `{prob_exact_target:.4f}%`"
+    else:
+        prob_lines = []
+        for ss, prob_at_least_target, prob_exact_target in target_results:
+            line = f"**At least `{ss}`:** `{prob_at_least_target:.4f}%`"
+            if method_used == "exact" and prob_exact_target is not None:
+                line += f" (exactly: `{prob_exact_target:.4f}%`)"
+            prob_lines.append(line)
+        prob_result_text = "\n".join(prob_lines)
 
     prob_result_text += f"{calculation_method_note}\n"
     prob_result_text += f"*Calculation Method: {method_used.replace('_', ' ').title()}*"
@@ -302,6 +732,21 @@ async def create_bags_embed(
             inline=False,
         )
 
+    if quantile_results:
+        quantile_lines = [
+            f"**{format_percentile(percentile)}** of the time you get at least `{quantile_sum}`"
+            for percentile, quantile_sum in quantile_results
+        ]
+        if method_used in ("normal_approx", "importance_sampling"):
+            quantile_lines.append("*(Approximated from the Normal Distribution)*")
+        elif method_used == "monte_carlo":
+            quantile_lines.append("*(Estimated from the simulations)*")
+        embed.add_field(
+            name="🎯 Soulstone Percentiles",
+            value="\n".join(quantile_lines),
+            inline=False,
+        )
+
     # Access the OWNER_DISPLAY_NAME from the bot_instance
     owner_name = getattr(
         bot_instance, "OWNER_DISPLAY_NAME", "Bot Owner"
@@ -312,207 +757,1543 @@ async def create_bags_embed(
     return embed
 
 
-class Bags(commands.Cog):
-    def __init__(self, bot):
-        self.bot = bot
+# Buttons under a /bags result that rerun it with one bag more or less, or
+# with every goal moved by SS_BUTTON_STEP. They are DynamicItems: the inputs
+# live in the custom_id, so they keep working across restarts and no
+# per-message state is stored. Within the exact thresholds a press is served
+# from bot.combined_cache, costing one shift-and-add or less.
+SS_BUTTON_STEP = 10
+ADJUST_BUTTONS = (
+    ("bag1", -1, 0),
+    ("bag1", +1, 0),
+    ("bag2", -1, 0),
+    ("bag2", +1, 0),
+    ("ss", -SS_BUTTON_STEP, 1),
+    ("ss", +SS_BUTTON_STEP, 1),
+)
+ADJUST_LABELS = {"bag1": "Bag I", "bag2": "Bag II", "ss": "SS"}
+
+
+def adjust_custom_id(field, delta, bag1, bag2, target_sums, percentiles):
+    custom_id = f"bags_adjust:{field}:{delta:+d}:{bag1}:{bag2}:" + ",".join(
+        str(target_sum) for target_sum in target_sums
+    )
+    if percentiles:
+        custom_id += ":" + ",".join(f"{percentile:g}" for percentile in percentiles)
+    return custom_id
 
-    @commands.command(name="bags", aliases=["bag", "sscalc", "calculate"])
-    async def bags_prefix(self, ctx, bag1: int, bag2: int, ss: int):
-        logger.info(
-            f"Prefix command 'bags' called by {ctx.author} ({ctx.author.id}) with args: bag1={bag1}, bag2={bag2}, ss={ss}"
-        )
-        # Access cooldowns from bot_instance
-        bucket = self.bot.prefix_cooldowns.get_bucket(ctx.message)
-        retry_after = bucket.update_rate_limit()
-        if retry_after:
-            embed = discord.Embed(
-                title="⚠️ Cooldown Active",
-                description=f"This command is on cooldown. Please try again after `{retry_after:.2f}` seconds.",
-                color=discord.Color.orange(),
-            )
-            await ctx.send(embed=embed)
-            logger.info(f"User {ctx.author.id} hit cooldown for 'bags' prefix command.")
-            return
 
-        if bag1 < 0 or bag2 < 0 or ss < 0:
-            bucket.reset()
-            embed = discord.Embed(
-                title="❌ Invalid Input",
-                description="Numbers of bags and soulstones goal must be non-negative integers.",
-                color=discord.Color.red(),
-            )
-            await ctx.send(embed=embed)
-            logger.warning(
-                f"Invalid input from {ctx.author.id} for 'bags' prefix command: Negative numbers."
-            )
-            return
+def adjusted_inputs(field, delta, bag1, bag2, target_sums):
+    if field == "bag1":
+        return bag1 + delta, bag2, list(target_sums)
+    if field == "bag2":
+        return bag1, bag2 + delta, list(target_sums)
+    return bag1, bag2, [target_sum + delta for target_sum in target_sums]
 
-        calculation_method_display = "Calculating..."
-        if (
-            bag1 <= self.bot.EXACT_CALC_THRESHOLD_BOX1
-            and bag2 <= self.bot.EXACT_CALC_THRESHOLD_BOX2
-        ):
-            calculation_method_display = "Calculating (Exact Method)..."
-        elif self.bot.SCIPY_AVAILABLE:
-            calculation_method_display = "Calculating (Normal Approximation)..."
-        else:
-            calculation_method_display = "Inputs too large; approximation library (SciPy) not available. Calculation may fail."
 
-        initial_message = await ctx.send(
-            f"{calculation_method_display} This might take a moment. Please wait..."
+class BagsAdjustButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=(
+        r"bags_adjust:(?P<field>bag1|bag2|ss):(?P<delta>[+-]\d+):(?P<bag1>\d+):"
+        r"(?P<bag2>\d+):(?P<targets>\d+(?:,\d+)*)(?::(?P<percentiles>[0-9.e+,-]+))?"
+    ),
+):
+    def __init__(self, field, delta, bag1, bag2, target_sums, percentiles=(), row=None):
+        new_bag1, new_bag2, new_targets = adjusted_inputs(
+            field, delta, bag1, bag2, target_sums
+        )
+        super().__init__(
+            discord.ui.Button(
+                label=f"{ADJUST_LABELS[field]} {delta:+d}",
+                style=discord.ButtonStyle.secondary,
+                custom_id=adjust_custom_id(field, delta, bag1, bag2, target_sums, percentiles),
+                disabled=min(new_bag1, new_bag2, *new_targets) < 0,
+            ),
+            row=row,
+        )
+        self.field = field
+        self.delta = delta
+        self.bag1 = bag1
+        self.bag2 = bag2
+        self.target_sums = target_sums
+        self.percentiles = percentiles
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        percentiles = match["percentiles"]
+        return cls(
+            match["field"],
+            int(match["delta"]),
+            int(match["bag1"]),
+            int(match["bag2"]),
+            parse_targets(match["targets"]),
+            parse_percentiles(percentiles) if percentiles else [],
         )
 
+    async def callback(self, interaction: discord.Interaction):
+        bot_instance = interaction.client
+        bag1, bag2, target_sums = adjusted_inputs(
+            self.field, self.delta, self.bag1, self.bag2, self.target_sums
+        )
+        logger.info(
+            f"User {interaction.user.id} pressed '{self.item.label}' on a bags result: bag1={bag1}, bag2={bag2}, ss={target_sums}"
+        )
         try:
+            if not within_exact_thresholds(bot_instance, bag1, bag2):
+                # Outside the thresholds a press is a full calculation.
+                bucket = bot_instance.prefix_cooldowns.get_user_bucket(interaction.user.id)
+                retry_after = await bucket.update_rate_limit()
+                if retry_after:
+                    embed = discord.Embed(
+                        title="⚠️ Cooldown Active",
+                        description=f"Please try again after `{retry_after:.2f}` seconds.",
+                        color=discord.Color.orange(),
+                    )
+                    await interaction.response.send_message(embed=embed, ephemeral=True)
+                    return
+                await interaction.response.defer()
+
             result_data, method_used = await asyncio.wait_for(
-                async_parser(self.bot, bag1, bag2, ss),
-                timeout=self.bot.CALCULATION_TIMEOUT,
+                run_adjusted_bags(bot_instance, bag1, bag2, target_sums, self.percentiles),
+                timeout=bot_instance.CALCULATION_TIMEOUT,
             )
-            prob_at_least_target, top_sums, prob_exact_target = result_data
-            logger.info(
-                f"Calculation for {ctx.author.id} successful (method: {method_used})."
+            target_results, top_sums, quantile_results, confidence_intervals = result_data
+            embed = await create_bags_embed(
+                bot_instance,
+                bag1,
+                bag2,
+                target_results,
+                top_sums,
+                method_used,
+                quantile_results,
+                confidence_intervals,
             )
+            view = create_adjust_view(bag1, bag2, target_sums, self.percentiles)
+            if interaction.response.is_done():
+                await interaction.edit_original_response(embed=embed, view=view)
+            else:
+                await interaction.response.edit_message(embed=embed, view=view)
         except asyncio.TimeoutError:
-            bucket.reset()
-            embed = discord.Embed(
-                title="⏰ Calculation Timeout",
-                description=f"The calculation took too long (more than `{self.bot.CALCULATION_TIMEOUT}` seconds) and was cancelled. Please try with smaller bag numbers.",
-                color=discord.Color.orange(),
-            )
-            await initial_message.edit(content=None, embed=embed)
-            logger.warning(
-                f"Calculation for {ctx.author.id} timed out for 'bags' prefix command."
-            )
-            return
-        except ValueError as e:
-            bucket.reset()
-            embed = discord.Embed(
-                title="❌ Calculation Error",
-                description=f"Input error: {e}",
-                color=discord.Color.red(),
-            )
-            await initial_message.edit(content=None, embed=embed)
-            logger.error(
-                f"Value error for {ctx.author.id} in 'bags' prefix command: {e}"
-            )
-            return
+            # Presses inside the exact thresholds are not deferred.
+            message = f"The calculation took too long (more than `{bot_instance.CALCULATION_TIMEOUT}` seconds) and was cancelled."
+            if not interaction.response.is_done():
+                await interaction.response.send_message(message, ephemeral=True)
+            else:
+                await interaction.followup.send(message, ephemeral=True)
         except Exception as e:
-            bucket.reset()
-            embed = discord.Embed(
-                title="⚠️ Unexpected Error",
-                description=f"An unexpected error occurred during calculation: `{e}`",
-                color=discord.Color.red(),
-            )
-            await initial_message.edit(content=None, embed=embed)
-            logger.exception(
-                f"Unexpected error for {ctx.author.id} in 'bags' prefix command."
+            logger.error(
+                f"UNCAUGHT ERROR during bags button press (custom_id: {self.item.custom_id}): {e}",
+                exc_info=True,
             )
-            return
+            message = "An unexpected error occurred while processing your request."
+            if not interaction.response.is_done():
+                await interaction.response.send_message(message, ephemeral=True)
+            else:
+                await interaction.followup.send(message, ephemeral=True)
+
+
+def create_adjust_view(bag1, bag2, target_sums, percentiles=()):
+    """The buttons for a /bags result, or None when the inputs do not fit in a
+    custom_id (100 characters)."""
+    buttons = [
+        BagsAdjustButton(field, delta, bag1, bag2, target_sums, percentiles, row=row)
+        for field, delta, row in ADJUST_BUTTONS
+    ]
+    if any(len(button.custom_id) > 100 for button in buttons):
+        return None
+    view = discord.ui.View(timeout=None)
+    for button in buttons:
+        view.add_item(button)
+    # Only sent as components; presses are dispatched to BagsAdjustButton.
+    view.stop()
+    return view
+
+
+def within_exact_thresholds(bot_instance, bag1, bag2):
+    return (
+        bag1 <= bot_instance.EXACT_CALC_THRESHOLD_BOX1
+        and bag2 <= bot_instance.EXACT_CALC_THRESHOLD_BOX2
+    )
 
-        final_embed = await create_bags_embed(
-            self.bot,
+
+async def run_adjusted_bags(bot_instance, bag1, bag2, target_sums, percentiles=()):
+    # A button press: the combined-distribution cache within the thresholds,
+    # the same engines as /bags beyond them.
+    if within_exact_thresholds(bot_instance, bag1, bag2):
+        result_data = await asyncio.to_thread(
+            run_combined_calculation,
+            bot_instance.combined_cache,
+            normalize_bag_definition(bot_instance.BAG_I_DEFINITION),
+            normalize_bag_definition(bot_instance.BAG_II_DEFINITION),
             bag1,
             bag2,
-            ss,
-            prob_at_least_target,
-            top_sums,
-            method_used,
-            prob_exact_target,
+            target_sums,
+            percentiles,
         )
-        await initial_message.edit(content=None, embed=final_embed)
+        return result_data, "exact"
+    return await async_parser(bot_instance, bag1, bag2, target_sums, percentiles)
 
-    @bags_prefix.error
-    async def bags_prefix_error(self, ctx, error):
-        logger.error(f"Error in 'bags' prefix command by {ctx.author.id}: {error}")
-        if isinstance(error, commands.MissingRequiredArgument):
-            embed = discord.Embed(
-                title="❌ Missing Arguments",
-                description="You're missing some information! Please use the command like this:",
-                color=discord.Color.red(),
-            )
-            embed.add_field(
-                name="Usage:",
-                value="`!bags <number of bags I> <number of bags II> <soulstones goal>`\n"
-                "Example: `!bags 10 5 200`",
-                inline=False,
-            )
-            await ctx.send(embed=embed)
-        elif isinstance(error, commands.BadArgument):
-            embed = discord.Embed(
-                title="❌ Invalid Input Type",
-                description="Please ensure bag numbers and soulstone goal are valid **integers**.",
-                color=discord.Color.red(),
-            )
-            await ctx.send(embed=embed)
-        else:
-            embed = discord.Embed(
-                title="⚠️ Error",
-                description=f"An unexpected error occurred: `{error}`",
-                color=discord.Color.red(),
-            )
-            await ctx.send(embed=embed)
 
-    @app_commands.command(
-        name="bags", description="Calculates soulstone probabilities."
+async def create_bagsuntil_embed(bot_instance, bag_label, ss, mean_draws, quantiles):
+    embed = discord.Embed(
+        title="🎒 Bags Needed to Reach Your Goal",
+        description=f"Opening **{bag_label}** one at a time until you have at least `{ss}` soulstones:",
+        color=discord.Color.green(),
     )
-    @app_commands.describe(
-        bag1="Number of Bag I draws",
-        bag2="Number of Bag II draws",
-        ss="Target soulstones (at least)",
+    if bot_instance.user and bot_instance.user.display_avatar:
+        embed.set_thumbnail(url=bot_instance.user.display_avatar.url)
+
+    result_lines = [f"**Expected number of bags:** `{mean_draws:.2f}`"]
+    for percentile, draws in quantiles:
+        label = "Median" if percentile == 50 else f"{format_percentile(percentile)} of the time within"
+        result_lines.append(f"**{label}:** `{draws}` bags")
+    embed.add_field(
+        name="✅ Result",
+        value="\n".join(result_lines) + "\n*(Result is exact)*",
+        inline=False,
     )
-    @app_commands.checks.cooldown(1, 10.0, key=lambda i: (i.guild_id, i.user.id))
-    async def bags_slash(
-        self, interaction: discord.Interaction, bag1: int, bag2: int, ss: int
-    ):
-        logger.info(
-            f"Slash command 'bags' called by {interaction.user} ({interaction.user.id}) with args: bag1={bag1}, bag2={bag2}, ss={ss}"
-        )
 
-        if bag1 < 0 or bag2 < 0 or ss < 0:
-            embed = discord.Embed(
-                title="❌ Invalid Input",
-                description="Numbers of bags and soulstones goal must be non-negative integers.",
-                color=discord.Color.red(),
-            )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
-            logger.warning(
-                f"Invalid input from {interaction.user.id} for 'bags' slash command: Negative numbers."
-            )
-            return
+    owner_name = getattr(bot_instance, "OWNER_DISPLAY_NAME", "Bot Owner")
+    embed.set_footer(
+        text=f"Calculated by {bot_instance.user.name} • {discord.utils.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')} | Made by {owner_name}"
+    )
+    return embed
 
-        await interaction.response.defer(ephemeral=False)
 
-        calculation_method_display = "Calculating..."
-        if (
-            bag1 <= self.bot.EXACT_CALC_THRESHOLD_BOX1
-            and bag2 <= self.bot.EXACT_CALC_THRESHOLD_BOX2
-        ):
-            calculation_method_display = "Calculating (Exact Method)..."
-        elif self.bot.SCIPY_AVAILABLE:
-            calculation_method_display = "Calculating (Normal Approximation)..."
-        else:
-            calculation_method_display = "Inputs too large; approximation library (SciPy) not available. Calculation may fail."
+async def run_bagsuntil(bot_instance, bag, ss):
+    # bag is 1 or 2; returns (bag_label, mean_draws, quantiles)
+    if bag == 1:
+        bag_label, box_def = "Bag I", bot_instance.BAG_I_DEFINITION
+    elif bag == 2:
+        bag_label, box_def = "Bag II", bot_instance.BAG_II_DEFINITION
+    else:
+        raise ValueError("Bag must be `1` (Bag I) or `2` (Bag II).")
+    stop_probs = await calculate_draws_until_goal(box_def, ss)
+    mean_draws, quantiles = summarize_draws_until(stop_probs, (50, 90))
+    return bag_label, mean_draws, quantiles
+
+
+def run_bagsplan(bot_instance, price1, price2, target_sum, required_percent):
+    # Per-point probability: exact from the cached per-bag distributions within
+    # the exact thresholds (one dot product), normal approximation beyond. The
+    # two disagree slightly at the boundary, so the probability is not monotone
+    # across it and one staircase walk could stop on the wrong side: each
+    # region is searched on its own and the cheaper result wins.
+    cache = bot_instance.distribution_cache
+    box1_def = bot_instance.BAG_I_DEFINITION
+    box2_def = bot_instance.BAG_II_DEFINITION
+    mean1, var1 = get_bag_stats(box1_def)
+    mean2, var2 = get_bag_stats(box2_def)
+    max_exact1 = min(bot_instance.EXACT_CALC_THRESHOLD_BOX1, bot_instance.PLAN_MAX_BAGS)
+    max_exact2 = min(bot_instance.EXACT_CALC_THRESHOLD_BOX2, bot_instance.PLAN_MAX_BAGS)
 
-        try:
-            result_data, method_used = await asyncio.wait_for(
-                async_parser(self.bot, bag1, bag2, ss),
-                timeout=self.bot.CALCULATION_TIMEOUT,
-            )
-            prob_at_least_target, top_sums, prob_exact_target = result_data
-            logger.info(
-                f"Calculation for {interaction.user.id} successful (method: {method_used})."
-            )
+    def exact_probability(bag1, bag2):
+        return combined_tail_probability(
+            cache.fold(box1_def, bag1), cache.survival(box2_def, bag2), target_sum
+        )
 
-            final_embed = await create_bags_embed(
-                self.bot,
-                bag1,
+    def normal_probability(bag1, bag2):
+        # Zero inside the exact region, which keeps it non-decreasing.
+        if bag1 <= max_exact1 and bag2 <= max_exact2:
+            return 0.0
+        return normal_tail_probability(
+            mean1 * bag1 + mean2 * bag2, var1 * bag1 + var2 * bag2, target_sum
+        )
+
+    required_prob = required_percent / 100
+    exact_best, exact_bag1, exact_bag2, exact_evaluations = find_cheapest_mix(
+        exact_probability, price1, price2, required_prob, max_exact1, max_exact2
+    )
+    normal_best, normal_bag1, normal_bag2, normal_evaluations = find_cheapest_mix(
+        normal_probability,
+        price1,
+        price2,
+        required_prob,
+        bot_instance.PLAN_MAX_BAGS,
+        bot_instance.PLAN_MAX_BAGS,
+    )
+    logger.info(
+        f"Bag plan for ss={target_sum} at {required_percent}% took {exact_evaluations + normal_evaluations} probability evaluations."
+    )
+
+    candidates = [
+        (result, method)
+        for result, method in ((exact_best, "exact"), (normal_best, "normal_approx"))
+        if result is not None
+    ]
+    if candidates:
+        # min keeps the first on ties, so an exact mix wins over an equal-cost estimate.
+        best, method = min(
+            candidates, key=lambda candidate: price1 * candidate[0][0] + price2 * candidate[0][1]
+        )
+    else:
+        best, method = None, "normal_approx"
+    bag1_alone = exact_bag1 if exact_bag1 is not None else normal_bag1
+    bag2_alone = exact_bag2 if exact_bag2 is not None else normal_bag2
+    return best, bag1_alone, bag2_alone, method
+
+
+async def create_bagsplan_embed(
+    bot_instance,
+    price1,
+    price2,
+    ss,
+    required_percent,
+    best,
+    bag1_alone,
+    bag2_alone,
+    method_used,
+):
+    embed = discord.Embed(
+        title="💰 Cheapest Bag Plan",
+        description=f"Cheapest mix of bags that reaches at least `{ss}` soulstones with a probability of at least `{required_percent:g}%`:",
+        color=discord.Color.green() if best else discord.Color.red(),
+    )
+    if bot_instance.user and bot_instance.user.display_avatar:
+        embed.set_thumbnail(url=bot_instance.user.display_avatar.url)
+
+    embed.add_field(
+        name="🔢 Input Parameters",
+        value=f"**Bag I Price:** `{price1:g}`\n**Bag II Price:** `{price2:g}`\n**Target Soulstones (at least):** `{ss}`\n**Required Probability:** `{required_percent:g}%`",
+        inline=False,
+    )
+
+    if best:
+        bag1, bag2, prob = best
+        method_note = (
+            "*(Result is exact)*"
+            if method_used == "exact"
+            else "*(Result is an approximation based on Normal Distribution)*"
+        )
+        embed.add_field(
+            name="✅ Best Plan",
+            value=(
+                f"**Bag I:** `{bag1}`\n**Bag II:** `{bag2}`\n"
+                f"**Total Cost:** `{price1 * bag1 + price2 * bag2:g}`\n"
+                f"**Probability:** `{prob * 100:.4f}%`\n{method_note}"
+            ),
+            inline=False,
+        )
+    else:
+        embed.add_field(
+            name="❌ No Plan Found",
+            value=f"No mix of up to `{bot_instance.PLAN_MAX_BAGS}` bags of each type reaches that probability.",
+            inline=False,
+        )
+
+    alternatives = []
+    if bag1_alone is not None:
+        alternatives.append(
+            f"**Only Bag I:** `{bag1_alone}` bags (cost `{price1 * bag1_alone:g}`)"
+        )
+    if bag2_alone is not None:
+        alternatives.append(
+            f"**Only Bag II:** `{bag2_alone}` bags (cost `{price2 * bag2_alone:g}`)"
+        )
+    if alternatives:
+        embed.add_field(
+            name="🔁 Single-Bag Alternatives",
+            value="\n".join(alternatives),
+            inline=False,
+        )
+
+    owner_name = getattr(bot_instance, "OWNER_DISPLAY_NAME", "Bot Owner")
+    embed.set_footer(
+        text=f"Calculated by {bot_instance.user.name} • {discord.utils.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')} | Made by {owner_name}"
+    )
+    return embed
+
+
+COMPARE_PERCENTILES = (10, 50, 90)
+
+
+def parse_mixes(parts):
+    # Mixes are written "60+10" (Bag I + Bag II); several may be separated by
+    # spaces, commas or semicolons.
+    mixes = []
+    for part in " ".join(parts).replace(",", " ").replace(";", " ").split():
+        bag1, plus, bag2 = part.partition("+")
+        try:
+            if not plus:
+                raise ValueError
+            mixes.append((int(bag1), int(bag2)))
+        except ValueError:
+            raise ValueError(
+                f"`{part}` is not a mix. Write mixes as `<Bag I>+<Bag II>`, e.g. `60+10 0+20`."
+            )
+    return mixes
+
+
+def validate_bagscompare_input(bot_instance, mixes, ss):
+    # Returns an error message, or None if the input is usable.
+    if not 2 <= len(mixes) <= bot_instance.MAX_COMPARE_MIXES:
+        return f"Please give between `2` and `{bot_instance.MAX_COMPARE_MIXES}` mixes to compare."
+    if ss < 0 or any(bag1 < 0 or bag2 < 0 for bag1, bag2 in mixes):
+        return "Numbers of bags and soulstones goal must be non-negative integers."
+    if any(max(bag1, bag2) > bot_instance.PLAN_MAX_BAGS for bag1, bag2 in mixes):
+        return f"Each mix may have at most `{bot_instance.PLAN_MAX_BAGS}` bags of each type."
+    return None
+
+
+def run_bagscompare(bot_instance, mixes, target_sum, percentiles=COMPARE_PERCENTILES):
+    """Compares the mixes [(bag1, bag2), ...] in one pass. Returns
+    (mix_results, head_to_head, method): mix_results has (prob_at_least,
+    expected, quantile_results) per mix, head_to_head (i, j, P(mix i > mix j),
+    P(tie)) per pair. Exact from the cached per-bag distributions when every
+    mix is within the exact thresholds, normal approximation otherwise."""
+    cache = bot_instance.distribution_cache
+    box1_def = bot_instance.BAG_I_DEFINITION
+    box2_def = bot_instance.BAG_II_DEFINITION
+    mean1, var1 = get_bag_stats(box1_def)
+    mean2, var2 = get_bag_stats(box2_def)
+    means = [mean1 * bag1 + mean2 * bag2 for bag1, bag2 in mixes]
+    variances = [var1 * bag1 + var2 * bag2 for bag1, bag2 in mixes]
+
+    exact = all(
+        bag1 <= bot_instance.EXACT_CALC_THRESHOLD_BOX1
+        and bag2 <= bot_instance.EXACT_CALC_THRESHOLD_BOX2
+        for bag1, bag2 in mixes
+    )
+    mix_results = []
+    head_to_head = []
+    if exact:
+        # Each per-bag fold comes from the cache, so a count shared by several
+        # mixes is built once; identical mixes share one convolution.
+        combined_by_mix = {}
+        for bag1, bag2 in mixes:
+            if (bag1, bag2) not in combined_by_mix:
+                combined_by_mix[(bag1, bag2)] = np.convolve(
+                    cache.fold(box1_def, bag1), cache.fold(box2_def, bag2)
+                )
+        distributions = [combined_by_mix[mix] for mix in mixes]
+        for dist, mean in zip(distributions, means):
+            prob_at_least = float(min(dist[target_sum:].sum(), 1.0))
+            mix_results.append((prob_at_least, mean, array_quantiles(dist, percentiles)))
+        for i in range(len(mixes)):
+            for j in range(i + 1, len(mixes)):
+                dist_i, dist_j = distributions[i], distributions[j]
+                # below_j[x] = P(S_j <= x - 1), and 1 beyond S_j's range.
+                below_j = np.concatenate(([0.0], np.cumsum(dist_j)))
+                indices = np.minimum(np.arange(len(dist_i)), len(dist_j))
+                beats = float(np.dot(dist_i, below_j[indices]))
+                overlap = min(len(dist_i), len(dist_j))
+                tie = float(np.dot(dist_i[:overlap], dist_j[:overlap]))
+                head_to_head.append((i, j, min(beats, 1.0), tie))
+        return mix_results, head_to_head, "exact"
+
+    for mean, variance in zip(means, variances):
+        prob_at_least = normal_tail_probability(mean, variance, target_sum)
+        mix_results.append(
+            (prob_at_least, mean, normal_quantiles(mean, variance, percentiles))
+        )
+    for i in range(len(mixes)):
+        for j in range(i + 1, len(mixes)):
+            # S_i - S_j is approximately normal; "beats" means a difference >= 1.
+            difference_mean = means[i] - means[j]
+            difference_variance = variances[i] + variances[j]
+            beats = normal_tail_probability(difference_mean, difference_variance, 1)
+            tie = normal_tail_probability(difference_mean, difference_variance, 0) - beats
+            head_to_head.append((i, j, beats, tie))
+    return mix_results, head_to_head, "normal_approx"
+
+
+def normal_quantiles(mean, variance, percentiles):
+    # Same continuity-corrected inverse as run_normal_approximation, via the
+    # standard library so it does not need SciPy.
+    quantile_results = []
+    for percentile in percentiles:
+        if variance == 0:
+            quantile_sum = math.floor(mean)
+        else:
+            quantile_sum = math.floor(
+                mean
+                + 0.5
+                + math.sqrt(variance) * NormalDist().inv_cdf(1 - percentile / 100)
+            )
+        quantile_results.append((percentile, max(quantile_sum, 0)))
+    return quantile_results
+
+
+def format_mix(bag1, bag2):
+    return f"{bag1} × Bag I + {bag2} × Bag II"
+
+
+async def create_bagscompare_embed(
+    bot_instance, mixes, ss, mix_results, head_to_head, method_used
+):
+    embed = discord.Embed(
+        title="⚖️ Bag Mix Comparison",
+        description=f"How each mix does against a goal of at least `{ss}` soulstones:",
+        color=discord.Color.blue(),
+    )
+    if bot_instance.user and bot_instance.user.display_avatar:
+        embed.set_thumbnail(url=bot_instance.user.display_avatar.url)
+
+    best_index = max(range(len(mixes)), key=lambda index: mix_results[index][0])
+    for index, ((bag1, bag2), (prob, expected, quantiles)) in enumerate(
+        zip(mixes, mix_results)
+    ):
+        quantile_text = ", ".join(
+            f"`{quantile_sum}` ({format_percentile(percentile)} of the time)"
+            for percentile, quantile_sum in quantiles
+        )
+        embed.add_field(
+            name=f"{'🏆' if index == best_index else '🎒'} Mix {index + 1}: {format_mix(bag1, bag2)}",
+            value=(
+                f"**Probability (at least `{ss}`):** `{prob * 100:.4f}%`\n"
+                f"**Expected Soulstones:** `{expected:.2f}`\n"
+                f"**You get at least:** {quantile_text}"
+            ),
+            inline=False,
+        )
+
+    head_to_head_lines = [
+        f"**Mix {i + 1}** beats **Mix {j + 1}**: `{beats * 100:.2f}%` · "
+        f"**Mix {j + 1}** beats **Mix {i + 1}**: `{max(1 - beats - tie, 0.0) * 100:.2f}%` · "
+        f"tie: `{tie * 100:.2f}%`"
+        for i, j, beats, tie in head_to_head
+    ]
+    embed.add_field(
+        name="🥊 Head to Head",
+        value="\n".join(head_to_head_lines),
+        inline=False,
+    )
+
+    method_note = (
+        "*(Results are exact)*"
+        if method_used == "exact"
+        else "*(Results are approximations based on Normal Distribution)*"
+    )
+    embed.add_field(name="ℹ️ Method", value=method_note, inline=False)
+
+    owner_name = getattr(bot_instance, "OWNER_DISPLAY_NAME", "Bot Owner")
+    embed.set_footer(
+        text=f"Calculated by {bot_instance.user.name} • {discord.utils.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')} | Made by {owner_name}"
+    )
+    return embed
+
+
+def run_luck_percentile(bot_instance, bag1, bag2, got):
+    # Share of outcomes below `got`, counting ties as half (mid-rank), from
+    # the cached survival arrays within the exact thresholds and the normal
+    # approximation beyond them. 50% is exactly average luck.
+    box1_def = bot_instance.BAG_I_DEFINITION
+    box2_def = bot_instance.BAG_II_DEFINITION
+    if (
+        bag1 <= bot_instance.EXACT_CALC_THRESHOLD_BOX1
+        and bag2 <= bot_instance.EXACT_CALC_THRESHOLD_BOX2
+    ):
+        cache = bot_instance.distribution_cache
+        dist1 = cache.fold(box1_def, bag1)
+        survival2 = cache.survival(box2_def, bag2)
+        at_least = combined_tail_probability(dist1, survival2, got)
+        above = combined_tail_probability(dist1, survival2, got + 1)
+        method = "exact"
+    else:
+        mean1, var1 = get_bag_stats(box1_def)
+        mean2, var2 = get_bag_stats(box2_def)
+        mean = mean1 * bag1 + mean2 * bag2
+        variance = var1 * bag1 + var2 * bag2
+        at_least = normal_tail_probability(mean, variance, got)
+        above = normal_tail_probability(mean, variance, got + 1)
+        method = "normal_approx"
+    return (1 - (at_least + above) / 2) * 100, method
+
+
+def validate_bagslog_input(bot_instance, bag1, bag2, got):
+    # Returns an error message, or None if the input is usable.
+    if bag1 < 0 or bag2 < 0 or got < 0:
+        return "Numbers of bags and soulstones must be non-negative integers."
+    if bag1 == 0 and bag2 == 0:
+        return "Please log at least one opened bag."
+    if max(bag1, bag2) > bot_instance.PLAN_MAX_BAGS:
+        return f"Please log at most `{bot_instance.PLAN_MAX_BAGS}` bags of each type at once."
+    box1_values = [val for val, prob in bot_instance.BAG_I_DEFINITION]
+    box2_values = [val for val, prob in bot_instance.BAG_II_DEFINITION]
+    lowest = bag1 * min(box1_values) + bag2 * min(box2_values)
+    highest = bag1 * max(box1_values) + bag2 * max(box2_values)
+    if not lowest <= got <= highest:
+        return f"With these bags you can get between `{lowest}` and `{highest}` soulstones."
+    return None
+
+
+def describe_luck(percentile):
+    if percentile >= 90:
+        return "🍀 Very lucky"
+    if percentile >= 60:
+        return "😊 Lucky"
+    if percentile > 40:
+        return "😐 About average"
+    if percentile > 10:
+        return "😕 Unlucky"
+    return "💀 Very unlucky"
+
+
+def format_history_lines(rows):
+    return [
+        f"<t:{int(created_at)}:d> `{bag1}` + `{bag2}` bags → `{got}` ({percentile:.1f}%)"
+        for bag1, bag2, got, percentile, created_at in rows
+    ]
+
+
+async def create_bagslog_embed(
+    bot_instance, user, bag1, bag2, got, percentile, method_used, rows, summary
+):
+    embed = discord.Embed(
+        title="📝 Pull Logged",
+        description=f"{describe_luck(percentile)}: you did better than `{percentile:.1f}%` of players who open the same bags.",
+        color=discord.Color.green() if percentile >= 50 else discord.Color.orange(),
+    )
+    if bot_instance.user and bot_instance.user.display_avatar:
+        embed.set_thumbnail(url=bot_instance.user.display_avatar.url)
+
+    box1_exp_val, _ = get_bag_stats(bot_instance.BAG_I_DEFINITION)
+    box2_exp_val, _ = get_bag_stats(bot_instance.BAG_II_DEFINITION)
+    method_note = (
+        "*(Result is exact)*"
+        if method_used == "exact"
+        else "*(Result is an approximation based on Normal Distribution)*"
+    )
+    embed.add_field(
+        name="🔢 Your Pull",
+        value=(
+            f"**Bag I:** `{bag1}`\n**Bag II:** `{bag2}`\n**Soulstones:** `{got}`\n"
+            f"**Expected Average:** `{box1_exp_val * bag1 + box2_exp_val * bag2:.2f}`\n{method_note}"
+        ),
+        inline=False,
+    )
+    add_history_fields(embed, rows, summary)
+
+    owner_name = getattr(bot_instance, "OWNER_DISPLAY_NAME", "Bot Owner")
+    embed.set_footer(
+        text=f"Logged for {user.name} • {discord.utils.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')} | Made by {owner_name}"
+    )
+    return embed
+
+
+def add_history_fields(embed, rows, summary):
+    count, average = summary
+    if not count:
+        embed.add_field(
+            name="📜 History",
+            value="Nothing logged yet. Use `/bagslog` after opening your bags.",
+            inline=False,
+        )
+        return
+    embed.add_field(
+        name=f"📜 Recent Pulls ({len(rows)} of {count})",
+        value="\n".join(format_history_lines(rows)),
+        inline=False,
+    )
+    embed.add_field(
+        name="📊 Overall Luck",
+        value=f"{describe_luck(average)}: average percentile `{average:.1f}%` over `{count}` logged pulls.",
+        inline=False,
+    )
+
+
+async def create_bagshistory_embed(bot_instance, user, rows, summary):
+    embed = discord.Embed(
+        title=f"📜 Pull History of {user.display_name}",
+        description="Where each logged pull fell in the distribution (50% is average luck):",
+        color=discord.Color.blue(),
+    )
+    if bot_instance.user and bot_instance.user.display_avatar:
+        embed.set_thumbnail(url=bot_instance.user.display_avatar.url)
+    add_history_fields(embed, rows, summary)
+    owner_name = getattr(bot_instance, "OWNER_DISPLAY_NAME", "Bot Owner")
+    embed.set_footer(
+        text=f"Requested by {user.name} • {discord.utils.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')} | Made by {owner_name}"
+    )
+    return embed
+
+
+async def run_rational_calculation(bot_instance, bag1, bag2, ss):
+    # Big-integer work holds the GIL for long stretches, so it runs in the
+    # calculation worker pool instead of on the event loop.
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        bot_instance.calc_pool,
+        calculate_rational_tail,
+        bot_instance.BAG_I_DEFINITION,
+        bot_instance.BAG_II_DEFINITION,
+        bag1,
+        bag2,
+        ss,
+    )
+
+
+def format_fraction_percent(fraction, digits=30):
+    with decimal.localcontext() as context:
+        context.prec = digits + 10
+        value = decimal.Decimal(fraction.numerator) * 100 / fraction.denominator
+        return format(value, f".{digits}g")
+
+
+async def create_bagsexact_embed(bot_instance, bag1, bag2, ss, prob_at_least, prob_exact):
+    embed = discord.Embed(
+        title="🧮 Exact Rational Probability",
+        description="Computed with exact integer arithmetic: no floating-point rounding.",
+        color=discord.Color.green() if prob_at_least > 0 else discord.Color.red(),
+    )
+    if bot_instance.user and bot_instance.user.display_avatar:
+        embed.set_thumbnail(url=bot_instance.user.display_avatar.url)
+
+    embed.add_field(
+        name="🔢 Input Parameters",
+        value=f"**Bag I Draws:** `{bag1}`\n**Bag II Draws:** `{bag2}`\n**Target Soulstones (at least):** `{ss}`",
+        inline=False,
+    )
+    embed.add_field(
+        name="✅ Probability Result (30 significant digits)",
+        value=(
+            f"**At least `{ss}`:** `{format_fraction_percent(prob_at_least)}%`\n"
+            f"**Exactly `{ss}`:** `{format_fraction_percent(prob_exact)}%`"
+        ),
+        inline=False,
+    )
+    fraction_text = f"`{prob_at_least.numerator}/{prob_at_least.denominator}`"
+    if len(fraction_text) > 1000:
+        fraction_text = f"*(Too long to show: the reduced denominator has {len(str(prob_at_least.denominator))} digits.)*"
+    embed.add_field(
+        name="📐 P(at least) as a Fraction",
+        value=fraction_text,
+        inline=False,
+    )
+
+    owner_name = getattr(bot_instance, "OWNER_DISPLAY_NAME", "Bot Owner")
+    embed.set_footer(
+        text=f"Calculated by {bot_instance.user.name} • {discord.utils.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')} | Made by {owner_name}"
+    )
+    return embed
+
+
+def validate_bagsuntil_input(bot_instance, ss):
+    # Returns an error message, or None if the goal is usable.
+    if ss < 0:
+        return "The soulstones goal must be a non-negative integer."
+    if ss > bot_instance.BAGSUNTIL_MAX_SS:
+        return f"The soulstones goal may be at most `{bot_instance.BAGSUNTIL_MAX_SS}`."
+    return None
+
+
+def validate_bagsexact_input(bot_instance, bag1, bag2, ss):
+    # Returns an error message, or None if the input is usable.
+    if bag1 < 0 or bag2 < 0 or ss < 0:
+        return "Numbers of bags and soulstones goal must be non-negative integers."
+    if (
+        bag1 > bot_instance.EXACT_CALC_THRESHOLD_BOX1
+        or bag2 > bot_instance.EXACT_CALC_THRESHOLD_BOX2
+    ):
+        return f"Exact rational results are available up to `{bot_instance.EXACT_CALC_THRESHOLD_BOX1}` Bag I and `{bot_instance.EXACT_CALC_THRESHOLD_BOX2}` Bag II draws."
+    return None
+
+
+def validate_bagsplan_input(price1, price2, ss, probability):
+    # Returns an error message, or None if the input is usable.
+    if price1 < 0 or price2 < 0 or (price1 == 0 and price2 == 0):
+        return "Prices must be non-negative and at least one must be above zero."
+    if ss < 0:
+        return "The soulstones goal must be a non-negative integer."
+    if not 0 < probability < 100:
+        return "The required probability must be between 0 and 100 (exclusive)."
+    return None
+
+
+class Bags(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_load(self):
+        # A (re)load may change how the bag embeds are rendered.
+        self.bot.embed_cache.invalidate()
+        self.bot.add_dynamic_items(BagsAdjustButton)
+
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(BagsAdjustButton)
+
+    @commands.command(name="bags", aliases=["bag", "sscalc", "calculate"])
+    async def bags_prefix(self, ctx, bag1: int, bag2: int, ss: int, *more_args: str):
+        # Extra arguments are more goals ("300") or percentiles ("90%").
+        target_sums = [ss]
+        percentiles = []
+        for arg in more_args:
+            try:
+                if arg.endswith("%"):
+                    percentiles.extend(parse_percentiles(arg))
+                else:
+                    target_sums.append(int(arg))
+            except ValueError:
+                embed = discord.Embed(
+                    title="❌ Invalid Input Type",
+                    description=f"`{arg}` is neither a soulstone goal (integer) nor a percentile (e.g. `90%`).",
+                    color=discord.Color.red(),
+                )
+                await ctx.send(embed=embed)
+                return
+        logger.info(
+            f"Prefix command 'bags' called by {ctx.author} ({ctx.author.id}) with args: bag1={bag1}, bag2={bag2}, ss={target_sums}, percentiles={percentiles}"
+        )
+        # Access cooldowns from bot_instance
+        bucket = self.bot.prefix_cooldowns.get_bucket(ctx.message)
+        retry_after = await bucket.update_rate_limit()
+        if retry_after:
+            embed = discord.Embed(
+                title="⚠️ Cooldown Active",
+                description=f"This command is on cooldown. Please try again after `{retry_after:.2f}` seconds.",
+                color=discord.Color.orange(),
+            )
+            await ctx.send(embed=embed)
+            logger.info(f"User {ctx.author.id} hit cooldown for 'bags' prefix command.")
+            return
+
+        if bag1 < 0 or bag2 < 0 or min(target_sums) < 0:
+            await bucket.reset()
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description="Numbers of bags and soulstones goal must be non-negative integers.",
+                color=discord.Color.red(),
+            )
+            await ctx.send(embed=embed)
+            logger.warning(
+                f"Invalid input from {ctx.author.id} for 'bags' prefix command: Negative numbers."
+            )
+            return
+
+        if (
+            len(target_sums) > self.bot.MAX_TARGETS_PER_QUERY
+            or len(percentiles) > self.bot.MAX_TARGETS_PER_QUERY
+        ):
+            await bucket.reset()
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description=f"Please give at most `{self.bot.MAX_TARGETS_PER_QUERY}` soulstone goals and `{self.bot.MAX_TARGETS_PER_QUERY}` percentiles at once.",
+                color=discord.Color.red(),
+            )
+            await ctx.send(embed=embed)
+            return
+
+        calculation_method_display = "Calculating..."
+        if (
+            bag1 <= self.bot.EXACT_CALC_THRESHOLD_BOX1
+            and bag2 <= self.bot.EXACT_CALC_THRESHOLD_BOX2
+        ):
+            calculation_method_display = "Calculating (Exact Method)..."
+        elif self.bot.SCIPY_AVAILABLE:
+            calculation_method_display = "Calculating (Normal Approximation)..."
+        else:
+            calculation_method_display = "Calculating (Monte Carlo Simulation)..."
+
+        initial_message = await ctx.send(
+            f"{calculation_method_display} This might take a moment. Please wait..."
+        )
+
+        try:
+            result_data, method_used = await asyncio.wait_for(
+                async_parser(self.bot, bag1, bag2, target_sums, percentiles),
+                timeout=self.bot.CALCULATION_TIMEOUT,
+            )
+            target_results, top_sums, quantile_results, confidence_intervals = (
+                result_data
+            )
+            logger.info(
+                f"Calculation for {ctx.author.id} successful (method: {method_used})."
+            )
+        except asyncio.TimeoutError:
+            await bucket.reset()
+            embed = discord.Embed(
+                title="⏰ Calculation Timeout",
+                description=f"The calculation took too long (more than `{self.bot.CALCULATION_TIMEOUT}` seconds) and was cancelled. Please try with smaller bag numbers.",
+                color=discord.Color.orange(),
+            )
+            await initial_message.edit(content=None, embed=embed)
+            logger.warning(
+                f"Calculation for {ctx.author.id} timed out for 'bags' prefix command."
+            )
+            return
+        except ValueError as e:
+            await bucket.reset()
+            embed = discord.Embed(
+                title="❌ Calculation Error",
+                description=f"Input error: {e}",
+                color=discord.Color.red(),
+            )
+            await initial_message.edit(content=None, embed=embed)
+            logger.error(
+                f"Value error for {ctx.author.id} in 'bags' prefix command: {e}"
+            )
+            return
+        except Exception as e:
+            await bucket.reset()
+            embed = discord.Embed(
+                title="⚠️ Unexpected Error",
+                description=f"An unexpected error occurred during calculation: `{e}`",
+                color=discord.Color.red(),
+            )
+            await initial_message.edit(content=None, embed=embed)
+            logger.exception(
+                f"Unexpected error for {ctx.author.id} in 'bags' prefix command."
+            )
+            return
+
+        final_embed = await create_bags_embed(
+            self.bot,
+            bag1,
+            bag2,
+            target_results,
+            top_sums,
+            method_used,
+            quantile_results,
+            confidence_intervals,
+        )
+        await initial_message.edit(
+            content=None,
+            embed=final_embed,
+            view=create_adjust_view(bag1, bag2, target_sums, percentiles),
+        )
+
+    @bags_prefix.error
+    async def bags_prefix_error(self, ctx, error):
+        logger.error(f"Error in 'bags' prefix command by {ctx.author.id}: {error}")
+        if isinstance(error, commands.MissingRequiredArgument):
+            embed = discord.Embed(
+                title="❌ Missing Arguments",
+                description="You're missing some information! Please use the command like this:",
+                color=discord.Color.red(),
+            )
+            embed.add_field(
+                name="Usage:",
+                value="`!bags <number of bags I> <number of bags II> <soulstones goal> [more goals...] [percentiles...]`\n"
+                "Example: `!bags 10 5 200` or `!bags 10 5 200 300 50% 90%`",
+                inline=False,
+            )
+            await ctx.send(embed=embed)
+        elif isinstance(error, commands.BadArgument):
+            embed = discord.Embed(
+                title="❌ Invalid Input Type",
+                description="Please ensure bag numbers and soulstone goals are valid **integers**.",
+                color=discord.Color.red(),
+            )
+            await ctx.send(embed=embed)
+        else:
+            embed = discord.Embed(
+                title="⚠️ Error",
+                description=f"An unexpected error occurred: `{error}`",
+                color=discord.Color.red(),
+            )
+            await ctx.send(embed=embed)
+
+    @app_commands.command(
+        name="bags", description="Calculates soulstone probabilities."
+    )
+    @app_commands.describe(
+        bag1="Number of Bag I draws",
+        bag2="Number of Bag II draws",
+        ss="Target soulstones (at least); separate several goals with spaces or commas",
+        percentiles="Optional percentiles to report, e.g. 10 50 90 99",
+        seed="Optional random seed, makes simulated results reproducible",
+    )
+    @shared_cooldown(1, 10.0, key=lambda i: (i.guild_id, i.user.id))
+    async def bags_slash(
+        self,
+        interaction: discord.Interaction,
+        bag1: int,
+        bag2: int,
+        ss: str,
+        percentiles: str = None,
+        seed: app_commands.Range[int, 0] = None,
+    ):
+        logger.info(
+            f"Slash command 'bags' called by {interaction.user} ({interaction.user.id}) with args: bag1={bag1}, bag2={bag2}, ss={ss}"
+        )
+
+        try:
+            target_sums = parse_targets(ss)
+            percentile_list = parse_percentiles(percentiles) if percentiles else []
+        except ValueError as e:
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description=str(e),
+                color=discord.Color.red(),
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        if (
+            len(target_sums) > self.bot.MAX_TARGETS_PER_QUERY
+            or len(percentile_list) > self.bot.MAX_TARGETS_PER_QUERY
+        ):
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description=f"Please give at most `{self.bot.MAX_TARGETS_PER_QUERY}` soulstone goals and `{self.bot.MAX_TARGETS_PER_QUERY}` percentiles at once.",
+                color=discord.Color.red(),
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        if bag1 < 0 or bag2 < 0 or min(target_sums) < 0:
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description="Numbers of bags and soulstones goal must be non-negative integers.",
+                color=discord.Color.red(),
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            logger.warning(
+                f"Invalid input from {interaction.user.id} for 'bags' slash command: Negative numbers."
+            )
+            return
+
+        await interaction.response.defer(ephemeral=False)
+
+        calculation_method_display = "Calculating..."
+        if (
+            bag1 <= self.bot.EXACT_CALC_THRESHOLD_BOX1
+            and bag2 <= self.bot.EXACT_CALC_THRESHOLD_BOX2
+        ):
+            calculation_method_display = "Calculating (Exact Method)..."
+        elif self.bot.SCIPY_AVAILABLE:
+            calculation_method_display = "Calculating (Normal Approximation)..."
+        else:
+            calculation_method_display = "Calculating (Monte Carlo Simulation)..."
+
+        try:
+            result_data, method_used = await asyncio.wait_for(
+                async_parser(
+                    self.bot, bag1, bag2, target_sums, percentile_list, seed
+                ),
+                timeout=self.bot.CALCULATION_TIMEOUT,
+            )
+            target_results, top_sums, quantile_results, confidence_intervals = (
+                result_data
+            )
+            logger.info(
+                f"Calculation for {interaction.user.id} successful (method: {method_used})."
+            )
+
+            final_embed = await create_bags_embed(
+                self.bot,
+                bag1,
                 bag2,
-                ss,
-                prob_at_least_target,
+                target_results,
                 top_sums,
                 method_used,
-                prob_exact_target,
+                quantile_results,
+                confidence_intervals,
+            )
+            await interaction.edit_original_response(
+                content=None,
+                embed=final_embed,
+                view=create_adjust_view(bag1, bag2, target_sums, percentile_list),
+            )
+        except asyncio.TimeoutError:
+            embed = discord.Embed(
+                title="⏰ Calculation Timeout",
+                description=f"The calculation took too long (more than `{self.bot.CALCULATION_TIMEOUT}` seconds) and was cancelled. Please try with smaller bag numbers.",
+                color=discord.Color.orange(),
+            )
+            await interaction.edit_original_response(content=None, embed=embed)
+            logger.warning(
+                f"Calculation for {interaction.user.id} timed out for 'bags' slash command."
+            )
+            return
+        except ValueError as e:
+            embed = discord.Embed(
+                title="❌ Calculation Error",
+                description=f"Input error: {e}",
+                color=discord.Color.red(),
+            )
+            await interaction.edit_original_response(content=None, embed=embed)
+            logger.error(
+                f"Value error for {interaction.user.id} in 'bags' slash command: {e}"
+            )
+            return
+        except Exception as e:
+            embed = discord.Embed(
+                title="⚠️ Unexpected Error",
+                description=f"An unexpected error occurred during calculation: `{e}`",
+                color=discord.Color.red(),
+            )
+            await interaction.edit_original_response(content=None, embed=embed)
+            logger.exception(
+                f"Unexpected error for {interaction.user.id} in 'bags' slash command."
+            )
+            return
+
+    @bags_slash.autocomplete("ss")
+    async def bags_ss_autocomplete(self, interaction: discord.Interaction, current: str):
+        # Goals at fixed probability levels for the bag counts typed so far.
+        # Earlier goals in a list ("500, 8") are kept in front of each choice.
+        bag1 = interaction.namespace.bag1
+        bag2 = interaction.namespace.bag2
+        if not isinstance(bag1, int) or not isinstance(bag2, int):
+            return []
+        if bag1 < 0 or bag2 < 0 or (bag1 == 0 and bag2 == 0):
+            return []
+        separator = max(current.rfind(","), current.rfind(" "))
+        typed_goals = current[: separator + 1]
+        return [
+            app_commands.Choice(
+                name=f"{typed_goals}{goal} ({level}% chance or better)"[:100],
+                value=f"{typed_goals}{goal}"[:100],
+            )
+            for level, goal in suggest_targets(self.bot, bag1, bag2)
+        ]
+
+    @commands.command(
+        name="baginfo",
+        aliases=["bagdetails"],
+        description="Displays information about Bag I and Bag II contents and their average values.",
+    )
+    async def baginfo_prefix(self, ctx):
+        logger.info(
+            f"Prefix command 'baginfo' called by {ctx.author} ({ctx.author.id})."
+        )
+        async with ctx.typing():
+            embed = await create_baginfo_embed(self.bot)
+            await ctx.send(embed=embed)
+            logger.info(f"Sent baginfo response to {ctx.author.id}.")
+
+    @app_commands.command(
+        name="baginfo", description="Displays information about Bag I and Bag II."
+    )
+    async def baginfo_slash(self, interaction: discord.Interaction):
+        logger.info(
+            f"Slash command 'baginfo' called by {interaction.user} ({interaction.user.id})."
+        )
+        if not interaction.response.is_done():
+            await interaction.response.defer(ephemeral=False, thinking=True)
+        embed = await create_baginfo_embed(self.bot)
+        await interaction.followup.send(embed=embed)
+        logger.info(f"Sent baginfo response to {interaction.user.id}.")
+
+
+    @commands.command(name="bagsuntil", aliases=["until"])
+    async def bagsuntil_prefix(self, ctx, bag: int, ss: int):
+        logger.info(
+            f"Prefix command 'bagsuntil' called by {ctx.author} ({ctx.author.id}) with args: bag={bag}, ss={ss}"
+        )
+        bucket = self.bot.prefix_cooldowns.get_bucket(ctx.message)
+        retry_after = await bucket.update_rate_limit()
+        if retry_after:
+            embed = discord.Embed(
+                title="⚠️ Cooldown Active",
+                description=f"This command is on cooldown. Please try again after `{retry_after:.2f}` seconds.",
+                color=discord.Color.orange(),
+            )
+            await ctx.send(embed=embed)
+            return
+
+        error_message = validate_bagsuntil_input(self.bot, ss)
+        if error_message:
+            await bucket.reset()
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description=error_message,
+                color=discord.Color.red(),
+            )
+            await ctx.send(embed=embed)
+            return
+
+        try:
+            bag_label, mean_draws, quantiles = await asyncio.wait_for(
+                run_bagsuntil(self.bot, bag, ss),
+                timeout=self.bot.CALCULATION_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            await bucket.reset()
+            embed = discord.Embed(
+                title="⏰ Calculation Timeout",
+                description=f"The calculation took too long (more than `{self.bot.CALCULATION_TIMEOUT}` seconds) and was cancelled. Please try a smaller goal.",
+                color=discord.Color.orange(),
+            )
+            await ctx.send(embed=embed)
+            return
+        except ValueError as e:
+            await bucket.reset()
+            embed = discord.Embed(
+                title="❌ Calculation Error",
+                description=f"Input error: {e}",
+                color=discord.Color.red(),
+            )
+            await ctx.send(embed=embed)
+            return
+
+        embed = await create_bagsuntil_embed(
+            self.bot, bag_label, ss, mean_draws, quantiles
+        )
+        await ctx.send(embed=embed)
+
+    @bagsuntil_prefix.error
+    async def bagsuntil_prefix_error(self, ctx, error):
+        logger.error(f"Error in 'bagsuntil' prefix command by {ctx.author.id}: {error}")
+        if isinstance(error, (commands.MissingRequiredArgument, commands.BadArgument)):
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description="Usage: `!bagsuntil <1 or 2> <soulstones goal>`\nExample: `!bagsuntil 2 500`",
+                color=discord.Color.red(),
+            )
+        else:
+            embed = discord.Embed(
+                title="⚠️ Error",
+                description=f"An unexpected error occurred: `{error}`",
+                color=discord.Color.red(),
+            )
+        await ctx.send(embed=embed)
+
+    @app_commands.command(
+        name="bagsuntil",
+        description="How many bags you need to open to reach a soulstone goal.",
+    )
+    @app_commands.describe(
+        bag="Which bag you open one at a time",
+        ss="Target soulstones (at least)",
+    )
+    @app_commands.choices(
+        bag=[
+            app_commands.Choice(name="Bag I", value=1),
+            app_commands.Choice(name="Bag II", value=2),
+        ]
+    )
+    @shared_cooldown(1, 10.0, key=lambda i: (i.guild_id, i.user.id))
+    async def bagsuntil_slash(
+        self,
+        interaction: discord.Interaction,
+        bag: app_commands.Choice[int],
+        ss: int,
+    ):
+        logger.info(
+            f"Slash command 'bagsuntil' called by {interaction.user} ({interaction.user.id}) with args: bag={bag.value}, ss={ss}"
+        )
+        error_message = validate_bagsuntil_input(self.bot, ss)
+        if error_message:
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description=error_message,
+                color=discord.Color.red(),
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=False)
+        try:
+            bag_label, mean_draws, quantiles = await asyncio.wait_for(
+                run_bagsuntil(self.bot, bag.value, ss),
+                timeout=self.bot.CALCULATION_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            embed = discord.Embed(
+                title="⏰ Calculation Timeout",
+                description=f"The calculation took too long (more than `{self.bot.CALCULATION_TIMEOUT}` seconds) and was cancelled. Please try a smaller goal.",
+                color=discord.Color.orange(),
+            )
+            await interaction.edit_original_response(content=None, embed=embed)
+            return
+        except ValueError as e:
+            embed = discord.Embed(
+                title="❌ Calculation Error",
+                description=f"Input error: {e}",
+                color=discord.Color.red(),
+            )
+            await interaction.edit_original_response(content=None, embed=embed)
+            logger.error(
+                f"Value error for {interaction.user.id} in 'bagsuntil' slash command: {e}"
+            )
+            return
+        except Exception as e:
+            embed = discord.Embed(
+                title="⚠️ Unexpected Error",
+                description=f"An unexpected error occurred during calculation: `{e}`",
+                color=discord.Color.red(),
+            )
+            await interaction.edit_original_response(content=None, embed=embed)
+            logger.exception(
+                f"Unexpected error for {interaction.user.id} in 'bagsuntil' slash command."
+            )
+            return
+
+        embed = await create_bagsuntil_embed(
+            self.bot, bag_label, ss, mean_draws, quantiles
+        )
+        await interaction.edit_original_response(content=None, embed=embed)
+
+
+    @commands.command(name="bagsplan", aliases=["plan"])
+    async def bagsplan_prefix(
+        self, ctx, price1: float, price2: float, ss: int, probability: float
+    ):
+        logger.info(
+            f"Prefix command 'bagsplan' called by {ctx.author} ({ctx.author.id}) with args: price1={price1}, price2={price2}, ss={ss}, probability={probability}"
+        )
+        bucket = self.bot.prefix_cooldowns.get_bucket(ctx.message)
+        retry_after = await bucket.update_rate_limit()
+        if retry_after:
+            embed = discord.Embed(
+                title="⚠️ Cooldown Active",
+                description=f"This command is on cooldown. Please try again after `{retry_after:.2f}` seconds.",
+                color=discord.Color.orange(),
+            )
+            await ctx.send(embed=embed)
+            return
+
+        error_message = validate_bagsplan_input(price1, price2, ss, probability)
+        if error_message:
+            await bucket.reset()
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description=error_message,
+                color=discord.Color.red(),
+            )
+            await ctx.send(embed=embed)
+            return
+
+        async with ctx.typing():
+            try:
+                best, bag1_alone, bag2_alone, method_used = await asyncio.wait_for(
+                    asyncio.to_thread(run_bagsplan, self.bot, price1, price2, ss, probability),
+                    timeout=self.bot.CALCULATION_TIMEOUT,
+                )
+            except asyncio.TimeoutError:
+                await bucket.reset()
+                embed = discord.Embed(
+                    title="⏰ Calculation Timeout",
+                    description=f"The calculation took too long (more than `{self.bot.CALCULATION_TIMEOUT}` seconds) and was cancelled. Please try a smaller goal.",
+                    color=discord.Color.orange(),
+                )
+                await ctx.send(embed=embed)
+                return
+            except ValueError as e:
+                await bucket.reset()
+                embed = discord.Embed(
+                    title="❌ Calculation Error",
+                    description=f"Input error: {e}",
+                    color=discord.Color.red(),
+                )
+                await ctx.send(embed=embed)
+                return
+            embed = await create_bagsplan_embed(
+                self.bot,
+                price1,
+                price2,
+                ss,
+                probability,
+                best,
+                bag1_alone,
+                bag2_alone,
+                method_used,
+            )
+            await ctx.send(embed=embed)
+
+    @bagsplan_prefix.error
+    async def bagsplan_prefix_error(self, ctx, error):
+        logger.error(f"Error in 'bagsplan' prefix command by {ctx.author.id}: {error}")
+        if isinstance(error, (commands.MissingRequiredArgument, commands.BadArgument)):
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description="Usage: `!bagsplan <Bag I price> <Bag II price> <soulstones goal> <probability %>`\nExample: `!bagsplan 100 450 800 90`",
+                color=discord.Color.red(),
+            )
+        else:
+            embed = discord.Embed(
+                title="⚠️ Error",
+                description=f"An unexpected error occurred: `{error}`",
+                color=discord.Color.red(),
+            )
+        await ctx.send(embed=embed)
+
+    @app_commands.command(
+        name="bagsplan",
+        description="Finds the cheapest Bag I / Bag II mix that reaches a goal with a given probability.",
+    )
+    @app_commands.describe(
+        price1="Price of one Bag I",
+        price2="Price of one Bag II",
+        ss="Target soulstones (at least)",
+        probability="Required probability in percent, e.g. 90",
+    )
+    @shared_cooldown(1, 10.0, key=lambda i: (i.guild_id, i.user.id))
+    async def bagsplan_slash(
+        self,
+        interaction: discord.Interaction,
+        price1: float,
+        price2: float,
+        ss: int,
+        probability: float,
+    ):
+        logger.info(
+            f"Slash command 'bagsplan' called by {interaction.user} ({interaction.user.id}) with args: price1={price1}, price2={price2}, ss={ss}, probability={probability}"
+        )
+        error_message = validate_bagsplan_input(price1, price2, ss, probability)
+        if error_message:
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description=error_message,
+                color=discord.Color.red(),
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=False)
+        try:
+            best, bag1_alone, bag2_alone, method_used = await asyncio.wait_for(
+                asyncio.to_thread(run_bagsplan, self.bot, price1, price2, ss, probability),
+                timeout=self.bot.CALCULATION_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            embed = discord.Embed(
+                title="⏰ Calculation Timeout",
+                description=f"The calculation took too long (more than `{self.bot.CALCULATION_TIMEOUT}` seconds) and was cancelled. Please try a smaller goal.",
+                color=discord.Color.orange(),
+            )
+            await interaction.edit_original_response(content=None, embed=embed)
+            return
+        except ValueError as e:
+            embed = discord.Embed(
+                title="❌ Calculation Error",
+                description=f"Input error: {e}",
+                color=discord.Color.red(),
+            )
+            await interaction.edit_original_response(content=None, embed=embed)
+            logger.error(
+                f"Value error for {interaction.user.id} in 'bagsplan' slash command: {e}"
+            )
+            return
+        except Exception as e:
+            embed = discord.Embed(
+                title="⚠️ Unexpected Error",
+                description=f"An unexpected error occurred during calculation: `{e}`",
+                color=discord.Color.red(),
+            )
+            await interaction.edit_original_response(content=None, embed=embed)
+            logger.exception(
+                f"Unexpected error for {interaction.user.id} in 'bagsplan' slash command."
+            )
+            return
+        embed = await create_bagsplan_embed(
+            self.bot,
+            price1,
+            price2,
+            ss,
+            probability,
+            best,
+            bag1_alone,
+            bag2_alone,
+            method_used,
+        )
+        await interaction.edit_original_response(content=None, embed=embed)
+
+
+    @commands.command(name="bagscompare", aliases=["compare"])
+    async def bagscompare_prefix(self, ctx, ss: int, *mixes: str):
+        logger.info(
+            f"Prefix command 'bagscompare' called by {ctx.author} ({ctx.author.id}) with args: ss={ss}, mixes={mixes}"
+        )
+        bucket = self.bot.prefix_cooldowns.get_bucket(ctx.message)
+        retry_after = await bucket.update_rate_limit()
+        if retry_after:
+            embed = discord.Embed(
+                title="⚠️ Cooldown Active",
+                description=f"This command is on cooldown. Please try again after `{retry_after:.2f}` seconds.",
+                color=discord.Color.orange(),
+            )
+            await ctx.send(embed=embed)
+            return
+
+        try:
+            mix_list = parse_mixes(mixes)
+            error_message = validate_bagscompare_input(self.bot, mix_list, ss)
+        except ValueError as e:
+            error_message = str(e)
+        if error_message:
+            await bucket.reset()
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description=f"{error_message}\nUsage: `!bagscompare <soulstones goal> <mix> <mix> [more mixes...]`\nExample: `!bagscompare 1500 60+10 0+20`",
+                color=discord.Color.red(),
+            )
+            await ctx.send(embed=embed)
+            return
+
+        async with ctx.typing():
+            try:
+                mix_results, head_to_head, method_used = await asyncio.wait_for(
+                    asyncio.to_thread(run_bagscompare, self.bot, mix_list, ss),
+                    timeout=self.bot.CALCULATION_TIMEOUT,
+                )
+            except asyncio.TimeoutError:
+                await bucket.reset()
+                embed = discord.Embed(
+                    title="⏰ Calculation Timeout",
+                    description=f"The calculation took too long (more than `{self.bot.CALCULATION_TIMEOUT}` seconds) and was cancelled. Please try with smaller bag numbers.",
+                    color=discord.Color.orange(),
+                )
+                await ctx.send(embed=embed)
+                return
+            except ValueError as e:
+                await bucket.reset()
+                embed = discord.Embed(
+                    title="❌ Calculation Error",
+                    description=f"Input error: {e}",
+                    color=discord.Color.red(),
+                )
+                await ctx.send(embed=embed)
+                return
+            embed = await create_bagscompare_embed(
+                self.bot, mix_list, ss, mix_results, head_to_head, method_used
+            )
+            await ctx.send(embed=embed)
+
+    @bagscompare_prefix.error
+    async def bagscompare_prefix_error(self, ctx, error):
+        logger.error(f"Error in 'bagscompare' prefix command by {ctx.author.id}: {error}")
+        if isinstance(error, (commands.MissingRequiredArgument, commands.BadArgument)):
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description="Usage: `!bagscompare <soulstones goal> <mix> <mix> [more mixes...]`\nExample: `!bagscompare 1500 60+10 0+20`",
+                color=discord.Color.red(),
+            )
+        else:
+            embed = discord.Embed(
+                title="⚠️ Error",
+                description=f"An unexpected error occurred: `{error}`",
+                color=discord.Color.red(),
+            )
+        await ctx.send(embed=embed)
+
+    @app_commands.command(
+        name="bagscompare",
+        description="Compares two or more Bag I / Bag II mixes against a soulstone goal.",
+    )
+    @app_commands.describe(
+        ss="Target soulstones (at least)",
+        mixes="Mixes as <Bag I>+<Bag II>, separated by spaces, e.g. 60+10 0+20",
+    )
+    @shared_cooldown(1, 10.0, key=lambda i: (i.guild_id, i.user.id))
+    async def bagscompare_slash(
+        self, interaction: discord.Interaction, ss: int, mixes: str
+    ):
+        logger.info(
+            f"Slash command 'bagscompare' called by {interaction.user} ({interaction.user.id}) with args: ss={ss}, mixes={mixes}"
+        )
+        try:
+            mix_list = parse_mixes([mixes])
+            error_message = validate_bagscompare_input(self.bot, mix_list, ss)
+        except ValueError as e:
+            error_message = str(e)
+        if error_message:
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description=error_message,
+                color=discord.Color.red(),
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=False)
+        try:
+            mix_results, head_to_head, method_used = await asyncio.wait_for(
+                asyncio.to_thread(run_bagscompare, self.bot, mix_list, ss),
+                timeout=self.bot.CALCULATION_TIMEOUT,
             )
-            await interaction.edit_original_response(content=None, embed=final_embed)
         except asyncio.TimeoutError:
             embed = discord.Embed(
                 title="⏰ Calculation Timeout",
@@ -520,9 +2301,6 @@ class Bags(commands.Cog):
                 color=discord.Color.orange(),
             )
             await interaction.edit_original_response(content=None, embed=embed)
-            logger.warning(
-                f"Calculation for {interaction.user.id} timed out for 'bags' slash command."
-            )
             return
         except ValueError as e:
             embed = discord.Embed(
@@ -532,7 +2310,7 @@ class Bags(commands.Cog):
             )
             await interaction.edit_original_response(content=None, embed=embed)
             logger.error(
-                f"Value error for {interaction.user.id} in 'bags' slash command: {e}"
+                f"Value error for {interaction.user.id} in 'bagscompare' slash command: {e}"
             )
             return
         except Exception as e:
@@ -543,36 +2321,321 @@ class Bags(commands.Cog):
             )
             await interaction.edit_original_response(content=None, embed=embed)
             logger.exception(
-                f"Unexpected error for {interaction.user.id} in 'bags' slash command."
+                f"Unexpected error for {interaction.user.id} in 'bagscompare' slash command."
             )
             return
+        embed = await create_bagscompare_embed(
+            self.bot, mix_list, ss, mix_results, head_to_head, method_used
+        )
+        await interaction.edit_original_response(content=None, embed=embed)
 
-    @commands.command(
-        name="baginfo",
-        aliases=["bagdetails"],
-        description="Displays information about Bag I and Bag II contents and their average values.",
+    @commands.command(name="bagslog", aliases=["logpull"])
+    async def bagslog_prefix(self, ctx, bag1: int, bag2: int, got: int):
+        logger.info(
+            f"Prefix command 'bagslog' called by {ctx.author} ({ctx.author.id}) with args: bag1={bag1}, bag2={bag2}, got={got}"
+        )
+        bucket = self.bot.prefix_cooldowns.get_bucket(ctx.message)
+        retry_after = await bucket.update_rate_limit()
+        if retry_after:
+            embed = discord.Embed(
+                title="⚠️ Cooldown Active",
+                description=f"This command is on cooldown. Please try again after `{retry_after:.2f}` seconds.",
+                color=discord.Color.orange(),
+            )
+            await ctx.send(embed=embed)
+            return
+
+        error_message = validate_bagslog_input(self.bot, bag1, bag2, got)
+        if error_message:
+            await bucket.reset()
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description=error_message,
+                color=discord.Color.red(),
+            )
+            await ctx.send(embed=embed)
+            return
+
+        async with ctx.typing():
+            try:
+                percentile, method_used = await asyncio.wait_for(
+                    asyncio.to_thread(run_luck_percentile, self.bot, bag1, bag2, got),
+                    timeout=self.bot.CALCULATION_TIMEOUT,
+                )
+            except asyncio.TimeoutError:
+                await bucket.reset()
+                embed = discord.Embed(
+                    title="⏰ Calculation Timeout",
+                    description=f"The calculation took too long (more than `{self.bot.CALCULATION_TIMEOUT}` seconds) and was cancelled. Nothing was logged.",
+                    color=discord.Color.orange(),
+                )
+                await ctx.send(embed=embed)
+                return
+            except ValueError as e:
+                await bucket.reset()
+                embed = discord.Embed(
+                    title="❌ Calculation Error",
+                    description=f"Input error: {e}",
+                    color=discord.Color.red(),
+                )
+                await ctx.send(embed=embed)
+                return
+            self.bot.pull_history.log(ctx.author.id, bag1, bag2, got, percentile)
+            rows, summary = await self.bot.pull_history.history(ctx.author.id, limit=5)
+            embed = await create_bagslog_embed(
+                self.bot, ctx.author, bag1, bag2, got, percentile, method_used, rows, summary
+            )
+            await ctx.send(embed=embed)
+
+    @bagslog_prefix.error
+    async def bagslog_prefix_error(self, ctx, error):
+        logger.error(f"Error in 'bagslog' prefix command by {ctx.author.id}: {error}")
+        if isinstance(error, (commands.MissingRequiredArgument, commands.BadArgument)):
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description="Usage: `!bagslog <Bag I count> <Bag II count> <soulstones you got>`\nExample: `!bagslog 60 10 450`",
+                color=discord.Color.red(),
+            )
+        else:
+            embed = discord.Embed(
+                title="⚠️ Error",
+                description=f"An unexpected error occurred: `{error}`",
+                color=discord.Color.red(),
+            )
+        await ctx.send(embed=embed)
+
+    @app_commands.command(
+        name="bagslog",
+        description="Logs the soulstones you got from your bags and shows how lucky it was.",
     )
-    async def baginfo_prefix(self, ctx):
+    @app_commands.describe(
+        bag1="Number of Bag I you opened",
+        bag2="Number of Bag II you opened",
+        got="Soulstones you got in total",
+    )
+    @shared_cooldown(1, 10.0, key=lambda i: (i.guild_id, i.user.id))
+    async def bagslog_slash(
+        self, interaction: discord.Interaction, bag1: int, bag2: int, got: int
+    ):
         logger.info(
-            f"Prefix command 'baginfo' called by {ctx.author} ({ctx.author.id})."
+            f"Slash command 'bagslog' called by {interaction.user} ({interaction.user.id}) with args: bag1={bag1}, bag2={bag2}, got={got}"
+        )
+        error_message = validate_bagslog_input(self.bot, bag1, bag2, got)
+        if error_message:
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description=error_message,
+                color=discord.Color.red(),
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=False)
+        try:
+            percentile, method_used = await asyncio.wait_for(
+                asyncio.to_thread(run_luck_percentile, self.bot, bag1, bag2, got),
+                timeout=self.bot.CALCULATION_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            embed = discord.Embed(
+                title="⏰ Calculation Timeout",
+                description=f"The calculation took too long (more than `{self.bot.CALCULATION_TIMEOUT}` seconds) and was cancelled. Nothing was logged.",
+                color=discord.Color.orange(),
+            )
+            await interaction.edit_original_response(content=None, embed=embed)
+            return
+        except ValueError as e:
+            embed = discord.Embed(
+                title="❌ Calculation Error",
+                description=f"Input error: {e}",
+                color=discord.Color.red(),
+            )
+            await interaction.edit_original_response(content=None, embed=embed)
+            logger.error(
+                f"Value error for {interaction.user.id} in 'bagslog' slash command: {e}"
+            )
+            return
+        except Exception as e:
+            embed = discord.Embed(
+                title="⚠️ Unexpected Error",
+                description=f"An unexpected error occurred during calculation: `{e}`",
+                color=discord.Color.red(),
+            )
+            await interaction.edit_original_response(content=None, embed=embed)
+            logger.exception(
+                f"Unexpected error for {interaction.user.id} in 'bagslog' slash command."
+            )
+            return
+        self.bot.pull_history.log(interaction.user.id, bag1, bag2, got, percentile)
+        rows, summary = await self.bot.pull_history.history(interaction.user.id, limit=5)
+        embed = await create_bagslog_embed(
+            self.bot, interaction.user, bag1, bag2, got, percentile, method_used, rows, summary
+        )
+        await interaction.edit_original_response(content=None, embed=embed)
+
+    @commands.command(name="bagshistory", aliases=["history"])
+    async def bagshistory_prefix(self, ctx):
+        logger.info(
+            f"Prefix command 'bagshistory' called by {ctx.author} ({ctx.author.id})."
         )
         async with ctx.typing():
-            embed = await create_baginfo_embed(self.bot)
+            rows, summary = await self.bot.pull_history.history(ctx.author.id)
+            embed = await create_bagshistory_embed(self.bot, ctx.author, rows, summary)
             await ctx.send(embed=embed)
-            logger.info(f"Sent baginfo response to {ctx.author.id}.")
 
     @app_commands.command(
-        name="baginfo", description="Displays information about Bag I and Bag II."
+        name="bagshistory", description="Shows your logged pulls and overall luck."
     )
-    async def baginfo_slash(self, interaction: discord.Interaction):
+    async def bagshistory_slash(self, interaction: discord.Interaction):
         logger.info(
-            f"Slash command 'baginfo' called by {interaction.user} ({interaction.user.id})."
+            f"Slash command 'bagshistory' called by {interaction.user} ({interaction.user.id})."
         )
         if not interaction.response.is_done():
             await interaction.response.defer(ephemeral=False, thinking=True)
-        embed = await create_baginfo_embed(self.bot)
+        rows, summary = await self.bot.pull_history.history(interaction.user.id)
+        embed = await create_bagshistory_embed(self.bot, interaction.user, rows, summary)
         await interaction.followup.send(embed=embed)
-        logger.info(f"Sent baginfo response to {interaction.user.id}.")
+
+    @commands.command(name="bagsexact", aliases=["exact"])
+    async def bagsexact_prefix(self, ctx, bag1: int, bag2: int, ss: int):
+        logger.info(
+            f"Prefix command 'bagsexact' called by {ctx.author} ({ctx.author.id}) with args: bag1={bag1}, bag2={bag2}, ss={ss}"
+        )
+        bucket = self.bot.prefix_cooldowns.get_bucket(ctx.message)
+        retry_after = await bucket.update_rate_limit()
+        if retry_after:
+            embed = discord.Embed(
+                title="⚠️ Cooldown Active",
+                description=f"This command is on cooldown. Please try again after `{retry_after:.2f}` seconds.",
+                color=discord.Color.orange(),
+            )
+            await ctx.send(embed=embed)
+            return
+
+        error_message = validate_bagsexact_input(self.bot, bag1, bag2, ss)
+        if error_message:
+            await bucket.reset()
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description=error_message,
+                color=discord.Color.red(),
+            )
+            await ctx.send(embed=embed)
+            return
+
+        async with ctx.typing():
+            try:
+                prob_at_least, prob_exact = await asyncio.wait_for(
+                    run_rational_calculation(self.bot, bag1, bag2, ss),
+                    timeout=self.bot.CALCULATION_TIMEOUT,
+                )
+            except asyncio.TimeoutError:
+                await bucket.reset()
+                embed = discord.Embed(
+                    title="⏰ Calculation Timeout",
+                    description=f"The calculation took too long (more than `{self.bot.CALCULATION_TIMEOUT}` seconds) and was cancelled. Please try with smaller bag numbers.",
+                    color=discord.Color.orange(),
+                )
+                await ctx.send(embed=embed)
+                return
+            except ValueError as e:
+                await bucket.reset()
+                embed = discord.Embed(
+                    title="❌ Calculation Error",
+                    description=f"Input error: {e}",
+                    color=discord.Color.red(),
+                )
+                await ctx.send(embed=embed)
+                return
+            embed = await create_bagsexact_embed(
+                self.bot, bag1, bag2, ss, prob_at_least, prob_exact
+            )
+            await ctx.send(embed=embed)
+
+    @bagsexact_prefix.error
+    async def bagsexact_prefix_error(self, ctx, error):
+        logger.error(f"Error in 'bagsexact' prefix command by {ctx.author.id}: {error}")
+        if isinstance(error, (commands.MissingRequiredArgument, commands.BadArgument)):
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description="Usage: `!bagsexact <Bag I count> <Bag II count> <soulstones goal>`\nExample: `!bagsexact 60 10 500`",
+                color=discord.Color.red(),
+            )
+        else:
+            embed = discord.Embed(
+                title="⚠️ Error",
+                description=f"An unexpected error occurred: `{error}`",
+                color=discord.Color.red(),
+            )
+        await ctx.send(embed=embed)
+
+    @app_commands.command(
+        name="bagsexact",
+        description="Exact rational soulstone probability, without rounding error.",
+    )
+    @app_commands.describe(
+        bag1="Number of Bag I draws",
+        bag2="Number of Bag II draws",
+        ss="Target soulstones (at least)",
+    )
+    @shared_cooldown(1, 10.0, key=lambda i: (i.guild_id, i.user.id))
+    async def bagsexact_slash(
+        self, interaction: discord.Interaction, bag1: int, bag2: int, ss: int
+    ):
+        logger.info(
+            f"Slash command 'bagsexact' called by {interaction.user} ({interaction.user.id}) with args: bag1={bag1}, bag2={bag2}, ss={ss}"
+        )
+        error_message = validate_bagsexact_input(self.bot, bag1, bag2, ss)
+        if error_message:
+            embed = discord.Embed(
+                title="❌ Invalid Input",
+                description=error_message,
+                color=discord.Color.red(),
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=False)
+        try:
+            prob_at_least, prob_exact = await asyncio.wait_for(
+                run_rational_calculation(self.bot, bag1, bag2, ss),
+                timeout=self.bot.CALCULATION_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            embed = discord.Embed(
+                title="⏰ Calculation Timeout",
+                description=f"The calculation took too long (more than `{self.bot.CALCULATION_TIMEOUT}` seconds) and was cancelled. Please try with smaller bag numbers.",
+                color=discord.Color.orange(),
+            )
+            await interaction.edit_original_response(content=None, embed=embed)
+            return
+        except ValueError as e:
+            embed = discord.Embed(
+                title="❌ Calculation Error",
+                description=f"Input error: {e}",
+                color=discord.Color.red(),
+            )
+            await interaction.edit_original_response(content=None, embed=embed)
+            logger.error(
+                f"Value error for {interaction.user.id} in 'bagsexact' slash command: {e}"
+            )
+            return
+        except Exception as e:
+            embed = discord.Embed(
+                title="⚠️ Unexpected Error",
+                description=f"An unexpected error occurred during calculation: `{e}`",
+                color=discord.Color.red(),
+            )
+            await interaction.edit_original_response(content=None, embed=embed)
+            logger.exception(
+                f"Unexpected error for {interaction.user.id} in 'bagsexact' slash command."
+            )
+            return
+
+        embed = await create_bagsexact_embed(
+            self.bot, bag1, bag2, ss, prob_at_least, prob_exact
+        )
+        await interaction.edit_original_response(content=None, embed=embed)
 
 
 async def setup(bot):
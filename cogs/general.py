@@ -1,9 +1,11 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+import asyncio
 import collections
 import logging
 import datetime
+from embed_cache import profile_version
 
 logger = logging.getLogger("discord_bot")
 
@@ -12,11 +14,53 @@ logger = logging.getLogger("discord_bot")
 COMMAND_MENU = {
     "bags": {
         "description": "Calculates soulstone probabilities from bag draws.",
-        "usage_prefix": "`!bags <bag I count> <bag II count> <target soulstones>`",
-        "usage_slash": "`/bags bag1:<count> bag2:<count> ss:<target>`",
+        "usage_prefix": "`!bags <bag I count> <bag II count> <target soulstones> [more targets...] [percentiles, e.g. 90%]`",
+        "usage_slash": "`/bags bag1:<count> bag2:<count> ss:<target> [more targets...] [percentiles:<10 50 90>]`",
         "emoji": "💎",
         "has_args": True,
     },
+    "bagsuntil": {
+        "description": "Shows how many Bag I or Bag II opens you need to reach a soulstone goal.",
+        "usage_prefix": "`!bagsuntil <1 or 2> <target soulstones>`",
+        "usage_slash": "`/bagsuntil bag:<Bag I|Bag II> ss:<target>`",
+        "emoji": "🎒",
+        "has_args": True,
+    },
+    "bagsplan": {
+        "description": "Finds the cheapest mix of Bag I and Bag II that reaches a goal with a given probability.",
+        "usage_prefix": "`!bagsplan <Bag I price> <Bag II price> <target soulstones> <probability %>`",
+        "usage_slash": "`/bagsplan price1:<price> price2:<price> ss:<target> probability:<percent>`",
+        "emoji": "💰",
+        "has_args": True,
+    },
+    "bagscompare": {
+        "description": "Compares two or more Bag I / Bag II mixes: probabilities, averages and which mix wins.",
+        "usage_prefix": "`!bagscompare <target soulstones> <mix> <mix> [more mixes...]` (mix: `<Bag I>+<Bag II>`)",
+        "usage_slash": "`/bagscompare ss:<target> mixes:<60+10 0+20>`",
+        "emoji": "⚖️",
+        "has_args": True,
+    },
+    "bagslog": {
+        "description": "Logs what you got from your bags and shows how lucky it was (luck percentile).",
+        "usage_prefix": "`!bagslog <Bag I count> <Bag II count> <soulstones you got>`",
+        "usage_slash": "`/bagslog bag1:<count> bag2:<count> got:<soulstones>`",
+        "emoji": "📝",
+        "has_args": True,
+    },
+    "bagshistory": {
+        "description": "Shows your logged pulls and your overall luck.",
+        "usage_prefix": "`!bagshistory`",
+        "usage_slash": "`/bagshistory`",
+        "emoji": "📜",
+        "has_args": False,
+    },
+    "bagsexact": {
+        "description": "Exact rational probability (no rounding error) for up to 100 of each bag.",
+        "usage_prefix": "`!bagsexact <Bag I count> <Bag II count> <target soulstones>`",
+        "usage_slash": "`/bagsexact bag1:<count> bag2:<count> ss:<target>`",
+        "emoji": "🧮",
+        "has_args": True,
+    },
     "baginfo": {
         "description": "Displays information about Bag I and Bag II contents and their average values.",
         "usage_prefix": "`!baginfo`",
@@ -52,14 +96,10 @@ COMMAND_MENU = {
 async def create_info_embed(bot_instance: commands.Bot):
     owner_name = bot_instance.OWNER_DISPLAY_NAME
     if bot_instance.owner_id:
-        try:
-            owner = await bot_instance.fetch_user(bot_instance.owner_id)
-            if owner:
-                owner_name = owner.display_name
-        except discord.NotFound:
-            logger.warning(f"Owner with ID {bot_instance.owner_id} not found.")
-        except discord.HTTPException as e:
-            logger.error(f"Failed to fetch owner user: {e}")
+        # Cache-only read; a stale entry is refreshed in the background.
+        owner = bot_instance.lookup_cache.get_user(bot_instance.owner_id)
+        if owner:
+            owner_name = owner.display_name
 
     uptime_display = "Not available"
     if bot_instance.bot_online_since:
@@ -87,8 +127,18 @@ async def create_info_embed(bot_instance: commands.Bot):
         name="Latency", value=f"{bot_instance.latency * 1000:.2f}ms", inline=True
     )
     embed.add_field(name="Uptime", value=uptime_display, inline=True)
-    embed.add_field(name="Guilds", value=len(bot_instance.guilds), inline=True)
-    embed.add_field(name="Users", value=len(bot_instance.users), inline=True)
+    # Summed over every shard cluster; falls back to this process's view.
+    # In a worker thread: another cluster may hold the database write lock.
+    guild_count = await asyncio.to_thread(
+        bot_instance.shared_store.sum_stats, "guilds:"
+    ) or len(bot_instance.guilds)
+    embed.add_field(name="Guilds", value=guild_count, inline=True)
+    # Approximate: summed guild member counts (users in several guilds count
+    # more than once), which needs no member or user cache.
+    user_count = await asyncio.to_thread(
+        bot_instance.shared_store.sum_stats, "members:"
+    ) or sum(g.member_count or 0 for g in bot_instance.guilds)
+    embed.add_field(name="Users (approx.)", value=user_count, inline=True)
     embed.add_field(
         name="Source Code",
         value="[View on GitHub](https://github.com/eve718/ccBot/commits/main/)",
@@ -105,15 +155,24 @@ async def create_info_embed(bot_instance: commands.Bot):
 
 async def create_ping_embed(bot_instance: commands.Bot):
     latency_ms = round(bot_instance.latency * 1000)
+    # How long this process's event loop was blocked, over the last minute.
+    lag = bot_instance.loop_monitor.summary()
     embed = discord.Embed(
         title="🏓 Pong!",
-        description=f"Latency: {latency_ms}ms",
+        description=(
+            f"Latency: {latency_ms}ms\n"
+            f"Event-loop lag: p99 {lag['p99_ms']:.1f}ms, max {lag['max_ms']:.1f}ms"
+        ),
         color=discord.Color.green(),
     )
     return embed
 
 
-async def create_welcome_embed():
+async def create_welcome_embed(bot_instance: commands.Bot):
+    return await bot_instance.embed_cache.get("welcome", None, build_welcome_embed)
+
+
+async def build_welcome_embed():
     embed = discord.Embed(
         title="Welcome to rngBot!",
         description="Select a command from the menu below to learn more or perform an action.",
@@ -122,7 +181,25 @@ async def create_welcome_embed():
     return embed
 
 
+def prefix_usage(bot_instance: commands.Bot, usage):
+    # In slash-only mode prefix usage is hidden, or shown as a bot mention
+    # when the mention fallback is enabled.
+    if not bot_instance.SLASH_ONLY:
+        return usage
+    if bot_instance.MENTION_PREFIX_FALLBACK and bot_instance.user:
+        return usage.replace("`!", f"`@{bot_instance.user.name} ")
+    return None
+
+
 async def create_menu_embed(bot_instance: commands.Bot):
+    return await bot_instance.embed_cache.get(
+        "menu",
+        profile_version(bot_instance),
+        lambda: build_menu_embed(bot_instance),
+    )
+
+
+async def build_menu_embed(bot_instance: commands.Bot):
     embed = discord.Embed(
         title="📚 Bot Commands Menu",
         description="Click a button below to learn more about a command or run it directly (if it has no arguments).",
@@ -133,7 +210,9 @@ async def create_menu_embed(bot_instance: commands.Bot):
 
     for cmd_name, cmd_details in COMMAND_MENU.items():
         description = cmd_details.get("description", "No description available.")
-        usage_prefix = cmd_details.get("usage_prefix", "N/A")
+        usage_prefix = prefix_usage(
+            bot_instance, cmd_details.get("usage_prefix", "N/A")
+        )
         usage_slash = cmd_details.get("usage_slash", "N/A")
         emoji = cmd_details.get("emoji", "")
 
@@ -141,8 +220,8 @@ async def create_menu_embed(bot_instance: commands.Bot):
             name=f"{emoji} {cmd_name.capitalize()} Command",
             value=(
                 f"{description}\n"
-                f"**Prefix Usage:** {usage_prefix}\n"
-                f"**Slash Usage:** {usage_slash}"
+                + (f"**Prefix Usage:** {usage_prefix}\n" if usage_prefix else "")
+                + f"**Slash Usage:** {usage_slash}"
             ),
             inline=False,
         )
@@ -153,11 +232,36 @@ async def create_menu_embed(bot_instance: commands.Bot):
     return embed
 
 
+async def create_bags_usage_embed(bot_instance: commands.Bot):
+    return discord.Embed(
+        title="Usage for /bags",
+        description="The `/bags` command requires arguments. Please type `/bags` and follow the prompts.",
+        color=discord.Color.yellow(),
+    )
+
+
+async def create_menu_baginfo_embed(bot_instance: commands.Bot):
+    # Imported lazily: cogs.bags can be reloaded independently of this cog.
+    from cogs.bags import create_baginfo_embed
+
+    return await create_baginfo_embed(bot_instance)
+
+
+MENU_EMBED_BUILDERS = {
+    "menu_button_info": create_info_embed,
+    "menu_button_baginfo": create_menu_baginfo_embed,
+    "menu_button_bags": create_bags_usage_embed,
+    "menu_button_ping": create_ping_embed,
+}
+
+
+# Persistent view: one instance is registered with bot.add_view in
+# General.cog_load and handles clicks on every menu message by custom_id, so
+# menus never expire and no per-message view or timeout edit is kept around.
 class CommandMenuView(discord.ui.View):
-    def __init__(self, bot_instance: commands.Bot, timeout=300):
-        super().__init__(timeout=timeout)
+    def __init__(self, bot_instance: commands.Bot):
+        super().__init__(timeout=None)
         self.bot_instance = bot_instance
-        self.message = None
 
     @discord.ui.button(
         label="Info", custom_id="menu_button_info", style=discord.ButtonStyle.primary
@@ -202,37 +306,10 @@ class CommandMenuView(discord.ui.View):
             command_name = button.custom_id.replace("menu_button_", "")
             logger.info(f"User {interaction.user.id} clicked '{command_name}' button.")
 
-            content_embed = None
-            current_view = self
-
-            # Dynamically fetch commands using bot.get_command or bot.tree.get_command
-            # This makes the menu robust even if commands are unloaded.
-            if command_name == "info":
-                content_embed = await create_info_embed(self.bot_instance)
-            elif command_name == "ping":
-                content_embed = await create_ping_embed(self.bot_instance)
-            elif command_name == "baginfo":
-                # Need to import/access baginfo_embed function. This implies
-                # embed helpers should be central or passed explicitly.
-                # For simplicity, I'm assuming it's available or moved to a common helper.
-                # If baginfo_embed is in bags.py, it needs to be imported or refactored.
-                # For this example, let's assume all embed creators are available here or imported.
-                # A cleaner way: pass a dictionary of embed creators to the view.
-                # For now, let's just make `create_baginfo_embed` available in this scope.
-                # We will need to make this function available from 'bags.py'
-                # For the sake of this example, we'll refactor baginfo_embed into general.py if it's generic enough.
-                # OR, the menu itself would be a class that has access to all command methods.
-                # For now, if the menu directly creates embeds, it needs access to the data/funcs.
-                # The create_baginfo_embed relies on BAG_I_DEFINITION etc. which are now on bot.
-                from cogs.bags import create_baginfo_embed
-
-                content_embed = await create_baginfo_embed(self.bot_instance)
-            elif command_name == "bags":
-                content_embed = discord.Embed(
-                    title=f"Usage for /{command_name}",
-                    description=f"The `/{command_name}` command requires arguments. Please type `/{command_name}` and follow the prompts.",
-                    color=discord.Color.yellow(),
-                )
+            # Dispatch on custom_id; the same view instance serves every menu message.
+            embed_builder = MENU_EMBED_BUILDERS.get(button.custom_id)
+            if embed_builder:
+                content_embed = await embed_builder(self.bot_instance)
             else:
                 content_embed = discord.Embed(
                     title="Command Not Found",
@@ -240,20 +317,13 @@ class CommandMenuView(discord.ui.View):
                     color=discord.Color.red(),
                 )
 
-            # If the interaction hasn't been responded to yet, we use edit_message.
-            # This simultaneously acknowledges the interaction AND edits the original message.
+            # The view is left out of the edit: the message keeps its buttons, and
+            # passing it would make discord.py track the view per message again.
             if not interaction.response.is_done():
-                await interaction.response.edit_message(
-                    embed=content_embed, view=current_view
-                )
+                await interaction.response.edit_message(embed=content_embed)
                 logger.info(f"Edited menu message for command '{command_name}'.")
             else:
-                # This case should ideally not happen if this is the first response to the button click.
-                # However, as a fallback (e.g., if defer was somehow manually called elsewhere for this interaction)
-                # we'd edit the existing response.
-                await interaction.edit_original_response(
-                    embed=content_embed, view=current_view
-                )
+                await interaction.edit_original_response(embed=content_embed)
                 logger.info(f"Edited original response for command '{command_name}'.")
 
         except Exception as e:
@@ -272,28 +342,24 @@ class CommandMenuView(discord.ui.View):
                     ephemeral=True,
                 )
 
-    async def on_timeout(self):
-        for item in self.children:
-            item.disabled = True
-        if self.message:
-            try:
-                await self.message.edit(view=self)
-                logger.info("Menu view timed out and buttons disabled.")
-            except discord.NotFound:
-                logger.warning(
-                    "Tried to edit timed-out menu message, but it was not found."
-                )
-            except Exception as e:
-                logger.error(f"Error editing timed-out menu message: {e}")
-        else:
-            logger.warning(
-                "Menu view timed out but message attribute was not set, cannot disable buttons."
-            )
-
 
 class General(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.menu_view = None
+        self.menu_components = None
+
+    async def cog_load(self):
+        self.bot.embed_cache.invalidate()
+        self.menu_view = CommandMenuView(bot_instance=self.bot)
+        self.bot.add_view(self.menu_view)
+        # Sent with each menu message. It is stopped, so discord.py does not
+        # store it per message; clicks go to the persistent view above.
+        self.menu_components = CommandMenuView(bot_instance=self.bot)
+        self.menu_components.stop()
+
+    async def cog_unload(self):
+        self.menu_view.stop()
 
     @commands.command(name="ping", description="Checks the bot's latency.")
     async def ping_prefix(self, ctx):
@@ -341,10 +407,8 @@ class General(commands.Cog):
     async def menu_prefix(self, ctx):
         logger.info(f"Prefix command 'menu' called by {ctx.author} ({ctx.author.id}).")
         async with ctx.typing():
-            initial_embed = await create_welcome_embed()
-            view = CommandMenuView(bot_instance=self.bot)
-            message = await ctx.send(embed=initial_embed, view=view)
-            view.message = message
+            initial_embed = await create_welcome_embed(self.bot)
+            await ctx.send(embed=initial_embed, view=self.menu_components)
             logger.info(f"Sent menu response to {ctx.author.id}.")
 
     @app_commands.command(
@@ -356,10 +420,8 @@ class General(commands.Cog):
         )
         if not interaction.response.is_done():
             await interaction.response.defer(ephemeral=False, thinking=True)
-        initial_embed = await create_welcome_embed()
-        view = CommandMenuView(bot_instance=self.bot)
-        message = await interaction.followup.send(embed=initial_embed, view=view)
-        view.message = message
+        initial_embed = await create_welcome_embed(self.bot)
+        await interaction.followup.send(embed=initial_embed, view=self.menu_components)
         logger.info(f"Sent menu response to {interaction.user.id}.")
 
 
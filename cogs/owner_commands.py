@@ -2,6 +2,8 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import logging
+from command_sync import sync_command_tree
+from graceful_shutdown import graceful_shutdown
 
 logger = logging.getLogger("discord_bot")
 
@@ -18,8 +20,8 @@ class OwnerCommands(commands.Cog):
             await self.bot.load_extension(f"cogs.{extension}")
             await ctx.send(f"Cog `{extension}` loaded successfully.")
             logger.info(f"Successfully loaded cog: {extension}")
-            # Consider syncing slash commands after loading if new ones are added
-            # await self.bot.tree.sync()
+            # Only calls the API if the command tree changed
+            await sync_command_tree(self.bot)
         except commands.ExtensionAlreadyLoaded:
             await ctx.send(f"Cog `{extension}` is already loaded.")
             logger.warning(f"Attempted to load already loaded cog: {extension}")
@@ -38,8 +40,8 @@ class OwnerCommands(commands.Cog):
             await self.bot.unload_extension(f"cogs.{extension}")
             await ctx.send(f"Cog `{extension}` unloaded successfully.")
             logger.info(f"Successfully unloaded cog: {extension}")
-            # Consider syncing slash commands after unloading if some were removed
-            # await self.bot.tree.sync()
+            # Only calls the API if the command tree changed
+            await sync_command_tree(self.bot)
         except commands.ExtensionNotLoaded:
             await ctx.send(f"Cog `{extension}` is not loaded.")
             logger.warning(f"Attempted to unload not loaded cog: {extension}")
@@ -55,8 +57,8 @@ class OwnerCommands(commands.Cog):
             await self.bot.reload_extension(f"cogs.{extension}")
             await ctx.send(f"Cog `{extension}` reloaded successfully.")
             logger.info(f"Successfully reloaded cog: {extension}")
-            # Always sync slash commands after reload as they might have changed
-            await self.bot.tree.sync()
+            # Sync slash commands only if the reload changed them
+            await sync_command_tree(self.bot)
         except commands.ExtensionNotFound:
             await ctx.send(
                 f"Cog `{extension}` not found. (Perhaps it was never loaded?)"
@@ -83,7 +85,7 @@ class OwnerCommands(commands.Cog):
                 f"Cog `{extension}` loaded successfully.", ephemeral=True
             )
             logger.info(f"Successfully loaded cog (slash): {extension}")
-            await self.bot.tree.sync()  # Sync after loading new commands
+            await sync_command_tree(self.bot)  # Sync if new commands were added
         except commands.ExtensionAlreadyLoaded:
             await interaction.followup.send(
                 f"Cog `{extension}` is already loaded.", ephemeral=True
@@ -116,7 +118,7 @@ class OwnerCommands(commands.Cog):
                 f"Cog `{extension}` unloaded successfully.", ephemeral=True
             )
             logger.info(f"Successfully unloaded cog (slash): {extension}")
-            await self.bot.tree.sync()  # Sync after unloading commands
+            await sync_command_tree(self.bot)  # Sync if commands were removed
         except commands.ExtensionNotLoaded:
             await interaction.followup.send(
                 f"Cog `{extension}` is not loaded.", ephemeral=True
@@ -146,7 +148,7 @@ class OwnerCommands(commands.Cog):
                 f"Cog `{extension}` reloaded successfully.", ephemeral=True
             )
             logger.info(f"Successfully reloaded cog (slash): {extension}")
-            await self.bot.tree.sync()  # Sync after reload
+            await sync_command_tree(self.bot)  # Sync if the reload changed them
         except commands.ExtensionNotFound:
             await interaction.followup.send(
                 f"Cog `{extension}` not found. (Perhaps it was never loaded?)",
@@ -162,14 +164,14 @@ class OwnerCommands(commands.Cog):
             )
 
     @commands.command(
-        name="sync", description="[Owner Only] Syncs slash commands globally."
+        name="sync", description="[Owner Only] Force-syncs slash commands."
     )
     @commands.is_owner()
     async def sync_prefix(self, ctx):
         logger.info(f"Owner {ctx.author.id} called 'sync' prefix command.")
-        await ctx.send("Syncing slash commands globally. This may take a moment...")
+        await ctx.send("Syncing slash commands. This may take a moment...")
         try:
-            await self.bot.tree.sync()
+            await sync_command_tree(self.bot, force=True)
             await ctx.send("Slash commands synced successfully!")
             logger.info("Slash commands synced via owner prefix command.")
         except Exception as e:
@@ -177,14 +179,14 @@ class OwnerCommands(commands.Cog):
             logger.error(f"Failed to sync slash commands via owner prefix command: {e}")
 
     @app_commands.command(
-        name="sync", description="[Owner Only] Syncs slash commands globally."
+        name="sync", description="[Owner Only] Force-syncs slash commands."
     )
     @commands.is_owner()
     async def sync_slash(self, interaction: discord.Interaction):
         logger.info(f"Owner {interaction.user.id} called 'sync' slash command.")
         await interaction.response.defer(ephemeral=True)
         try:
-            await self.bot.tree.sync()
+            await sync_command_tree(self.bot, force=True)
             await interaction.followup.send(
                 "Slash commands synced successfully!", ephemeral=True
             )
@@ -199,8 +201,10 @@ class OwnerCommands(commands.Cog):
     @commands.is_owner()
     async def shutdown_prefix(self, ctx):
         logger.warning(f"Owner {ctx.author.id} initiated bot shutdown.")
-        await ctx.send("Shutting down the bot. Goodbye!")
-        await self.bot.close()
+        await ctx.send(
+            "Shutting down the bot once running commands have finished. Goodbye!"
+        )
+        await graceful_shutdown(self.bot)
 
     @app_commands.command(
         name="shutdown", description="[Owner Only] Shuts down the bot."
@@ -211,9 +215,10 @@ class OwnerCommands(commands.Cog):
             f"Owner {interaction.user.id} initiated bot shutdown via slash command."
         )
         await interaction.response.send_message(
-            "Shutting down the bot. Goodbye!", ephemeral=True
+            "Shutting down the bot once running commands have finished. Goodbye!",
+            ephemeral=True,
         )
-        await self.bot.close()
+        await graceful_shutdown(self.bot)
 
 
 async def setup(bot):
@@ -0,0 +1,62 @@
+import os
+import json
+import hashlib
+import logging
+import discord
+
+logger = logging.getLogger("discord_bot")
+
+
+# bot.tree.sync() hits a heavily rate-limited endpoint, so we only call it when
+# the command tree actually changed since the last successful sync. The
+# fingerprint of each sync scope (global or a dev guild) is stored on disk.
+def command_tree_fingerprint(bot_instance, guild=None):
+    payload = {
+        "application_id": bot_instance.application_id,
+        "commands": [
+            command.to_dict(bot_instance.tree)
+            for command in bot_instance.tree.get_commands(guild=guild)
+        ],
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _load_fingerprints(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_fingerprints(path, fingerprints):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(fingerprints, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+async def sync_command_tree(bot_instance, force=False):
+    """Syncs the app command tree if it changed (or force=True). With
+    DEV_GUILD_ID set, commands are copied to and synced on that guild only,
+    which applies instantly. Returns True if a sync request was made."""
+    guild = None
+    scope = "global"
+    if bot_instance.DEV_GUILD_ID:
+        guild = discord.Object(id=bot_instance.DEV_GUILD_ID)
+        bot_instance.tree.copy_global_to(guild=guild)
+        scope = f"guild:{bot_instance.DEV_GUILD_ID}"
+
+    path = bot_instance.COMMAND_SYNC_FINGERPRINT_PATH
+    fingerprints = _load_fingerprints(path)
+    fingerprint = command_tree_fingerprint(bot_instance, guild)
+    if not force and fingerprints.get(scope) == fingerprint:
+        logger.info(f"Command tree unchanged ({scope}); skipping sync.")
+        return False
+
+    await bot_instance.tree.sync(guild=guild)
+    fingerprints[scope] = fingerprint
+    _save_fingerprints(path, fingerprints)
+    logger.info(f"Slash commands synced ({scope}).")
+    return True
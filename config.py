@@ -0,0 +1,70 @@
+import os
+from dotenv import load_dotenv
+
+# Calculation settings and bag data shared by the bot (main.py) and the
+# offline tools (calc_cli.py, bench_engines.py). Kept free of Discord imports
+# so they can be loaded without starting the bot.
+
+load_dotenv()
+
+CALCULATION_TIMEOUT = 15
+EXACT_CALC_THRESHOLD_BOX1 = 100
+EXACT_CALC_THRESHOLD_BOX2 = 100
+PROB_DIFFERENCE_THRESHOLD = 0.001
+MAX_TARGETS_PER_QUERY = 10  # soulstone goals per /bags call
+PLAN_MAX_BAGS = 2000  # search limit per bag type for /bagsplan
+BAGSUNTIL_MAX_SS = 1_000_000  # largest soulstone goal for /bagsuntil
+MAX_COMPARE_MIXES = 4  # mixes per /bagscompare call
+# Beyond the exact thresholds, targets the normal approximation puts below
+# this probability are estimated by importance sampling with TAIL_SAMPLES draws.
+TAIL_SAMPLING_THRESHOLD = 0.001
+TAIL_SAMPLES = 20000
+# Fallback when SciPy is missing; split over the calculation workers.
+MONTE_CARLO_SIMULATIONS = 1_000_000
+# Worker processes for CPU-heavy engines that would otherwise block the event
+# loop (launcher.py divides the cores between clusters).
+CALC_WORKERS = int(os.getenv("CALC_WORKERS", os.cpu_count() or 1))
+# Built by `python distribution_table.py`, or at startup when missing.
+DISTRIBUTION_TABLE_PATH = os.getenv("DISTRIBUTION_TABLE_PATH", "distribution_table.bin")
+
+# --- Global Bag Definitions (Castle Clash Data) ---
+BAG_I_DEFINITION = [
+    (1, 0.36),
+    (2, 0.37),
+    (5, 0.15),
+    (10, 0.07),
+    (20, 0.03),
+    (30, 0.02),
+]
+BAG_II_DEFINITION = [
+    (10, 0.46),
+    (15, 0.27),
+    (20, 0.17),
+    (50, 0.05),
+    (80, 0.03),
+    (100, 0.02),
+]
+
+# What the distribution table covers: each bag up to its exact threshold.
+DISTRIBUTION_TABLE_BAGS = (
+    (BAG_I_DEFINITION, EXACT_CALC_THRESHOLD_BOX1),
+    (BAG_II_DEFINITION, EXACT_CALC_THRESHOLD_BOX2),
+)
+
+# Attributes the calculation code reads from the bot instance.
+ENGINE_SETTINGS = (
+    "CALCULATION_TIMEOUT",
+    "EXACT_CALC_THRESHOLD_BOX1",
+    "EXACT_CALC_THRESHOLD_BOX2",
+    "PROB_DIFFERENCE_THRESHOLD",
+    "MAX_TARGETS_PER_QUERY",
+    "PLAN_MAX_BAGS",
+    "BAGSUNTIL_MAX_SS",
+    "MAX_COMPARE_MIXES",
+    "TAIL_SAMPLING_THRESHOLD",
+    "TAIL_SAMPLES",
+    "MONTE_CARLO_SIMULATIONS",
+    "CALC_WORKERS",
+    "BAG_I_DEFINITION",
+    "BAG_II_DEFINITION",
+)
@@ -0,0 +1,157 @@
+import os
+import json
+import struct
+import hashlib
+import logging
+import argparse
+import numpy as np
+
+from calc_helpers import DistributionCache, normalize_bag_definition
+
+logger = logging.getLogger("discord_bot")
+
+# Precomputed n-fold distributions and survival arrays of each bag for every
+# draw count inside the exact thresholds, in one binary file that the bot
+# memory-maps at startup. Lookups return read-only views into the mapping, so
+# nothing is computed or copied, and all shard processes share the pages
+# through the OS page cache.
+#
+# Build step (rerun after changing the bag definitions or thresholds):
+#   python distribution_table.py [--output distribution_table.bin]
+# The file is not checked in: launcher.py and the bot build it on startup
+# when it is missing or does not cover the current bags (well under a second).
+#
+# Layout: MAGIC, a little-endian uint32 header length, the JSON header, zero
+# padding to 8 bytes, then float64 data. The header maps each bag-definition
+# hash to [offset, length] pairs (in float64 elements) for "fold" and
+# "survival", indexed by draw count. A table built for other definitions
+# simply has no entries for the current ones.
+
+MAGIC = b"CCDTABLE"
+VERSION = 1
+
+
+def bag_definition_hash(box_def):
+    normalized = [[val, prob] for val, prob in normalize_bag_definition(box_def)]
+    return hashlib.sha256(json.dumps(normalized).encode()).hexdigest()
+
+
+class DistributionTable:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a distribution table.")
+            (header_length,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_length))
+        if header.get("version") != VERSION:
+            raise ValueError(f"{path} has unsupported version {header.get('version')}.")
+        self.path = path
+        self._bags = header["bags"]
+        self._hashes = {}  # definition tuple -> hash, to skip rehashing
+        self._data = np.memmap(
+            path, dtype="<f8", mode="r", offset=header["data_offset"]
+        )
+
+    def _section(self, box_def):
+        key = tuple(box_def)
+        definition_hash = self._hashes.get(key)
+        if definition_hash is None:
+            definition_hash = self._hashes[key] = bag_definition_hash(box_def)
+        return self._bags.get(definition_hash)
+
+    def covers(self, box_def, num_draws):
+        section = self._section(box_def)
+        return section is not None and 0 <= num_draws <= section["max_draws"]
+
+    def get(self, kind, box_def, num_draws):
+        # kind is "fold" or "survival"; None when not in the table.
+        section = self._section(box_def)
+        if section is None or not 0 <= num_draws <= section["max_draws"]:
+            return None
+        offset, length = section[kind][num_draws]
+        return self._data[offset : offset + length]
+
+
+def load_distribution_table(path):
+    """The table at `path`, or None (logged) if it is missing or unreadable."""
+    if not path or not os.path.exists(path):
+        logger.info(f"No distribution table at {path}; computing distributions on demand.")
+        return None
+    try:
+        table = DistributionTable(path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring distribution table {path}: {e}")
+        return None
+    logger.info(f"Memory-mapped distribution table {path}.")
+    return table
+
+
+def build_distribution_table(path, bags):
+    """Writes the table for `bags`, a list of (box_def, max_draws)."""
+    cache = DistributionCache(max_entries=4 * sum(max_draws + 1 for _, max_draws in bags))
+    header = {"version": VERSION, "bags": {}}
+    arrays = []
+    offset = 0
+    for box_def, max_draws in bags:
+        section = {"max_draws": max_draws, "fold": [], "survival": []}
+        for num_draws in range(max_draws + 1):
+            for kind, array in (
+                ("fold", cache.fold(box_def, num_draws)),
+                ("survival", cache.survival(box_def, num_draws)),
+            ):
+                section[kind].append([offset, len(array)])
+                arrays.append(array)
+                offset += len(array)
+        header["bags"][bag_definition_hash(box_def)] = section
+
+    # The data offset is part of the header, so size the header with a
+    # placeholder first and pad to keep the floats 8-byte aligned.
+    header["data_offset"] = 0
+    prefix_length = len(MAGIC) + 4 + len(json.dumps(header).encode()) + 16
+    header["data_offset"] = (prefix_length + 7) // 8 * 8
+    encoded = json.dumps(header).encode()
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"  # clusters may build at the same time
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(encoded)))
+        f.write(encoded)
+        f.write(b"\0" * (header["data_offset"] - f.tell()))
+        for array in arrays:
+            f.write(np.asarray(array, dtype="<f8").tobytes())
+    os.replace(tmp_path, path)
+    return offset * 8
+
+
+def ensure_distribution_table(path, bags):
+    """Like load_distribution_table, but first builds the table for `bags` if
+    it is missing, unreadable or does not cover them."""
+    table = load_distribution_table(path) if os.path.exists(path) else None
+    if table is not None and all(
+        table.covers(box_def, max_draws) for box_def, max_draws in bags
+    ):
+        return table
+    logger.warning(f"Distribution table {path} is missing or out of date; building it.")
+    try:
+        build_distribution_table(path, bags)
+    except OSError as e:
+        logger.error(
+            f"Could not build the distribution table {path}: {e}. "
+            "Distributions will be computed on demand."
+        )
+        return None
+    return load_distribution_table(path)
+
+
+def main():
+    import config
+
+    parser = argparse.ArgumentParser(description="Build the distribution table.")
+    parser.add_argument("--output", default=config.DISTRIBUTION_TABLE_PATH)
+    args = parser.parse_args()
+    size = build_distribution_table(args.output, config.DISTRIBUTION_TABLE_BAGS)
+    print(f"Wrote {args.output} ({size / 1e6:.1f} MB of distributions).")
+
+
+if __name__ == "__main__":
+    main()
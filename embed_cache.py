@@ -0,0 +1,38 @@
+import logging
+import discord
+
+logger = logging.getLogger("discord_bot")
+
+
+# Embeds whose content only changes with the bag definitions, the bot's avatar
+# or the owner name are rendered once and stored as payload dicts. Every call
+# gets a fresh copy, so callers may still modify what they receive.
+class EmbedCache:
+    def __init__(self):
+        self._payloads = {}  # name -> (version, embed dict)
+
+    async def get(self, name, version, builder):
+        """Returns a copy of the cached embed `name`, rebuilding it with
+        `await builder()` when nothing is cached or `version` changed."""
+        entry = self._payloads.get(name)
+        if entry is None or entry[0] != version:
+            embed = await builder()
+            entry = (version, embed.to_dict())
+            self._payloads[name] = entry
+            logger.info(f"Rendered static embed '{name}'.")
+        return discord.Embed.from_dict(entry[1])
+
+    def invalidate(self, name=None):
+        if name is None:
+            self._payloads.clear()
+        else:
+            self._payloads.pop(name, None)
+
+
+def profile_version(bot_instance):
+    # Part of every cache version: thumbnails use the bot's avatar and footers
+    # the owner's name, so a profile change renders the embeds again.
+    avatar_url = (
+        bot_instance.user.display_avatar.url if bot_instance.user else None
+    )
+    return (avatar_url, getattr(bot_instance, "OWNER_DISPLAY_NAME", None))
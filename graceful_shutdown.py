@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import discord
+from discord import app_commands
+
+logger = logging.getLogger("discord_bot")
+
+# Shutdown that does not lose work: new commands are refused, commands already
+# running get up to SHUTDOWN_DRAIN_TIMEOUT seconds to finish, and the hot
+# distributions are written to CACHE_SNAPSHOT_PATH so the next start loads
+# them instead of recomputing them on the first requests.
+
+SHUTDOWN_MESSAGE = "The bot is restarting. Please try again in a minute."
+
+
+class ShutdownManager:
+    def __init__(self):
+        self.accepting = True
+        self._in_flight = set()  # tasks running a command
+        self.shutdown_task = None
+
+    def track_current_task(self):
+        # Commands run to completion in the task that passed the check.
+        task = asyncio.current_task()
+        if task is not None and task not in self._in_flight:
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    @property
+    def in_flight(self):
+        return len(self._in_flight)
+
+    async def drain(self, timeout):
+        """Waits up to `timeout` seconds for running commands (other than the
+        caller's own) and returns how many are still running."""
+        current = asyncio.current_task()
+        pending = {task for task in self._in_flight if task is not current}
+        if not pending:
+            return 0
+        _, still_running = await asyncio.wait(pending, timeout=timeout)
+        return len(still_running)
+
+
+class ShutdownAwareTree(app_commands.CommandTree):
+    # Refuses slash commands once shutdown has started and tracks the rest.
+    async def interaction_check(self, interaction):
+        if interaction.type is not discord.InteractionType.application_command:
+            return True  # autocomplete is cheap and cannot be answered this way
+        manager = self.client.shutdown_manager
+        if not manager.accepting:
+            await interaction.response.send_message(SHUTDOWN_MESSAGE, ephemeral=True)
+            return False
+        manager.track_current_task()
+        return True
+
+
+async def process_commands_unless_shutting_down(bot_instance, message):
+    # Prefix-command counterpart of ShutdownAwareTree, used from on_message.
+    if message.author.bot:
+        return
+    ctx = await bot_instance.get_context(message)
+    if ctx.command is None:
+        return
+    manager = bot_instance.shutdown_manager
+    if not manager.accepting:
+        await ctx.send(SHUTDOWN_MESSAGE)
+        return
+    manager.track_current_task()
+    await bot_instance.invoke(ctx)
+
+
+def schedule_graceful_shutdown(bot_instance):
+    # For signal handlers; the reference keeps the task from being collected.
+    manager = bot_instance.shutdown_manager
+    if manager.shutdown_task is None:
+        manager.shutdown_task = asyncio.create_task(graceful_shutdown(bot_instance))
+
+
+async def graceful_shutdown(bot_instance):
+    manager = bot_instance.shutdown_manager
+    if not manager.accepting:
+        return  # already shutting down
+    manager.accepting = False
+    logger.warning(
+        f"Shutting down: refusing new commands, waiting for {manager.in_flight} running ones."
+    )
+    still_running = await manager.drain(bot_instance.SHUTDOWN_DRAIN_TIMEOUT)
+    if still_running:
+        logger.warning(f"{still_running} commands did not finish before the deadline.")
+
+    try:
+        saved = await asyncio.to_thread(
+            bot_instance.distribution_cache.save_snapshot,
+            bot_instance.CACHE_SNAPSHOT_PATH,
+        )
+        logger.info(f"Saved {saved} cached distributions to {bot_instance.CACHE_SNAPSHOT_PATH}.")
+    except Exception as e:
+        logger.error(f"Failed to save the cache snapshot: {e}", exc_info=True)
+
+    await bot_instance.pull_history.close()
+    http_runner = getattr(bot_instance, "http_runner", None)
+    if http_runner is not None:
+        await http_runner.cleanup()
+    bot_instance.calc_pool.shutdown(wait=False, cancel_futures=True)
+    await bot_instance.close()
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+from aiohttp import web
+from discord.ext import commands
+
+from cogs.bags import async_parser, result_records
+
+logger = logging.getLogger("discord_bot")
+
+# Local HTTP endpoint for tools that need the numbers without Discord. It runs
+# on the bot's event loop, so it shares the bot's caches and worker pool.
+#
+#   GET  /      health check (what the old Flask keep-alive served)
+#   GET  /lag   event-loop lag over the last minute: {"p50_ms": .., "p99_ms":
+#               .., "max_ms": .., "samples": ..}
+#   POST /calc  {"bag1": 100, "bag2": 50, "ss": 2000}, "ss" may be a list, or a
+#               JSON array of such queries. Returns one result per query:
+#               {"bag1": .., "bag2": .., "results": [{"ss": .., "probability":
+#               .., ...}]} or {"error": ..}.
+
+MAX_QUERIES_PER_REQUEST = 1000
+MAX_PAIRS_PER_REQUEST = 50  # distinct (bag1, bag2) pairs per request
+MAX_CONCURRENT_PAIRS = 4  # pair calculations running at once, all requests
+KEEPALIVE_TIMEOUT = 75  # seconds an idle keep-alive connection stays open
+
+
+class CalculationBatcher:
+    """Collects queries arriving within `window` seconds and answers all of
+    them for the same (bag1, bag2) with one calculation over the union of
+    their targets. Queries for different pairs are still separate
+    calculations, not one combined computation: the only work they share is
+    the per-bag folds, which bot.distribution_cache already shares. At most
+    `max_concurrent` of them run at a time and the rest wait their turn, so a
+    burst of distinct pairs queues instead of starting one calculation each.
+
+    The timeout only stops waiting: a calculation that timed out keeps its
+    worker thread or pool process busy until it finishes, since neither can
+    be cancelled from the loop. Its semaphore slot is released when the wait
+    ends, so after timeouts more than max_concurrent may be running."""
+
+    def __init__(self, bot_instance, window=0.02, max_concurrent=MAX_CONCURRENT_PAIRS):
+        self.bot = bot_instance
+        self.window = window
+        self._pending = {}  # (bag1, bag2) -> [(targets, future), ...]
+        self._flush_task = None
+        self._running = asyncio.Semaphore(max_concurrent)
+
+    async def submit(self, bag1, bag2, target_sums):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault((bag1, bag2), []).append((target_sums, future))
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+        return await future
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.window)
+        pending, self._pending = self._pending, {}
+        self._flush_task = None
+        await asyncio.gather(
+            *(self._run_pair(pair, waiters) for pair, waiters in pending.items())
+        )
+
+    async def _run_pair(self, pair, waiters):
+        bag1, bag2 = pair
+        all_targets = sorted({ss for targets, _ in waiters for ss in targets})
+        try:
+            async with self._running:
+                result_data, method = await asyncio.wait_for(
+                    async_parser(self.bot, bag1, bag2, all_targets),
+                    timeout=self.bot.CALCULATION_TIMEOUT,
+                )
+            records = result_records(result_data, method)
+        except Exception as e:
+            for _, future in waiters:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for targets, future in waiters:
+            if not future.done():
+                future.set_result([{"ss": ss, **records[ss]} for ss in targets])
+
+
+BOT_KEY = web.AppKey("bot", commands.Bot)
+BATCHER_KEY = web.AppKey("batcher", CalculationBatcher)
+
+
+def parse_query(query, max_targets):
+    if not isinstance(query, dict):
+        raise ValueError("Each query must be an object with bag1, bag2 and ss.")
+    try:
+        bag1 = int(query["bag1"])
+        bag2 = int(query["bag2"])
+        ss = query["ss"]
+        target_sums = [int(s) for s in (ss if isinstance(ss, list) else [ss])]
+    except KeyError as e:
+        raise ValueError(f"Missing field {e}.")
+    except (TypeError, ValueError):
+        raise ValueError("bag1, bag2 and ss must be integers.")
+    if bag1 < 0 or bag2 < 0 or any(s < 0 for s in target_sums):
+        raise ValueError("bag1, bag2 and ss must be non-negative.")
+    if not target_sums or len(target_sums) > max_targets:
+        raise ValueError(f"Give between 1 and {max_targets} ss values per query.")
+    return bag1, bag2, target_sums
+
+
+async def answer_query(batcher, query):
+    try:
+        bag1, bag2, target_sums = parse_query(query, batcher.bot.MAX_TARGETS_PER_QUERY)
+    except ValueError as e:
+        return {"error": str(e)}
+    try:
+        results = await batcher.submit(bag1, bag2, target_sums)
+    except asyncio.TimeoutError:
+        return {"bag1": bag1, "bag2": bag2, "error": "Calculation timed out."}
+    except ValueError as e:
+        return {"bag1": bag1, "bag2": bag2, "error": str(e)}
+    except Exception as e:
+        logger.error(f"HTTP calculation for {bag1}/{bag2} failed: {e}", exc_info=True)
+        return {"bag1": bag1, "bag2": bag2, "error": "Calculation failed."}
+    return {"bag1": bag1, "bag2": bag2, "results": results}
+
+
+async def health(request):
+    return web.Response(text="Bot is running!")
+
+
+async def loop_lag(request):
+    return web.json_response(request.app[BOT_KEY].loop_monitor.summary())
+
+
+async def calculate(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return web.json_response({"error": "Body must be JSON."}, status=400)
+
+    queries = body if isinstance(body, list) else [body]
+    if len(queries) > MAX_QUERIES_PER_REQUEST:
+        return web.json_response(
+            {"error": f"At most {MAX_QUERIES_PER_REQUEST} queries per request."},
+            status=413,
+        )
+    # str(): the fields are not validated yet and may be unhashable.
+    pairs = {
+        (str(query.get("bag1")), str(query.get("bag2")))
+        for query in queries
+        if isinstance(query, dict)
+    }
+    if len(pairs) > MAX_PAIRS_PER_REQUEST:
+        return web.json_response(
+            {"error": f"At most {MAX_PAIRS_PER_REQUEST} different bag1/bag2 pairs per request."},
+            status=413,
+        )
+    batcher = request.app[BATCHER_KEY]
+    answers = await asyncio.gather(*(answer_query(batcher, q) for q in queries))
+    return web.json_response(answers if isinstance(body, list) else answers[0])
+
+
+async def start_http_server(bot_instance, host, port):
+    """Starts the API on the running loop and returns its AppRunner (call
+    `await runner.cleanup()` to stop it)."""
+    app = web.Application(client_max_size=4 * 1024 * 1024)
+    app[BOT_KEY] = bot_instance
+    app[BATCHER_KEY] = CalculationBatcher(bot_instance)
+    app.router.add_get("/", health)
+    app.router.add_get("/lag", loop_lag)
+    app.router.add_post("/calc", calculate)
+
+    runner = web.AppRunner(app, keepalive_timeout=KEEPALIVE_TIMEOUT)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"HTTP API listening on {host}:{port}.")
+    return runner
@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import subprocess
+import urllib.request
+from dotenv import load_dotenv
+
+from shared_state import SharedStore
+from shared_memory_cache import SharedDistributionCache
+from distribution_table import ensure_distribution_table
+import config
+
+# Runs the bot as several shard clusters, each one a separate `main.py` process,
+# so gateway handling and calculations are spread over the host's cores.
+#
+# Usage: python launcher.py
+# Environment:
+#   DISCORD_TOKEN   - bot token (used to ask Discord for the recommended shard count)
+#   SHARD_COUNT     - total shards; defaults to Discord's recommendation
+#   CLUSTER_COUNT   - number of processes; defaults to the number of CPU cores
+#   CALC_WORKERS    - calculation worker processes per cluster; defaults to an
+#                     even share of the cores
+
+load_dotenv()
+TOKEN = os.getenv("DISCORD_TOKEN")
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "shared_state.db")
+RESTART_DELAY = 5
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger("launcher")
+
+
+def fetch_recommended_shard_count():
+    request = urllib.request.Request(
+        "https://discord.com/api/v10/gateway/bot",
+        headers={
+            "Authorization": f"Bot {TOKEN}",
+            "User-Agent": "DiscordBot (https://github.com/eve718/ccBot, 1.0)",
+        },
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.load(response)["shards"]
+
+
+def plan_clusters(shard_count, cluster_count):
+    # Contiguous blocks of shard ids, one block per cluster.
+    cluster_count = max(1, min(cluster_count, shard_count))
+    per_cluster, remainder = divmod(shard_count, cluster_count)
+    clusters = []
+    start = 0
+    for cluster_id in range(cluster_count):
+        size = per_cluster + (1 if cluster_id < remainder else 0)
+        clusters.append(list(range(start, start + size)))
+        start += size
+    return clusters
+
+
+def start_cluster(cluster_id, shard_ids, shard_count, calc_workers):
+    env = dict(os.environ)
+    env["CLUSTER_ID"] = str(cluster_id)
+    env["SHARD_IDS"] = ",".join(str(shard_id) for shard_id in shard_ids)
+    env["SHARD_COUNT"] = str(shard_count)
+    env["SHARED_STATE_PATH"] = SHARED_STATE_PATH
+    env.setdefault("CALC_WORKERS", str(calc_workers))
+    logger.info(f"Starting cluster {cluster_id} with shards {shard_ids}")
+    return subprocess.Popen([sys.executable, "main.py"], env=env)
+
+
+def main():
+    if os.getenv("SHARD_COUNT"):
+        shard_count = int(os.getenv("SHARD_COUNT"))
+    else:
+        shard_count = fetch_recommended_shard_count()
+    cluster_count = int(os.getenv("CLUSTER_COUNT", os.cpu_count() or 1))
+    clusters = plan_clusters(shard_count, cluster_count)
+    calc_workers = max(1, (os.cpu_count() or 1) // len(clusters))
+    logger.info(f"Running {shard_count} shards in {len(clusters)} clusters.")
+
+    # Counts from a previous layout would be summed into /info otherwise, and
+    # shared-memory segments of the previous run are no longer needed.
+    store = SharedStore(SHARED_STATE_PATH)
+    store.clear_stats("guilds:")
+    store.clear_stats("members:")
+    SharedDistributionCache.purge(store)
+    # Built once here, so the clusters map it instead of each building it.
+    ensure_distribution_table(config.DISTRIBUTION_TABLE_PATH, config.DISTRIBUTION_TABLE_BAGS)
+
+    processes = {
+        cluster_id: start_cluster(cluster_id, shard_ids, shard_count, calc_workers)
+        for cluster_id, shard_ids in enumerate(clusters)
+    }
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        logger.info("Stopping all clusters...")
+        for process in processes.values():
+            process.terminate()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while not stopping:
+        time.sleep(1)
+        for cluster_id, process in list(processes.items()):
+            if process.poll() is None or stopping:
+                continue
+            if process.returncode == 0:
+                # A clean exit is the owner's shutdown command, not a crash:
+                # stop the other clusters too instead of restarting it.
+                logger.info(f"Cluster {cluster_id} was shut down.")
+                stop(None, None)
+                break
+            logger.warning(
+                f"Cluster {cluster_id} exited with code {process.returncode}, restarting in {RESTART_DELAY}s."
+            )
+            time.sleep(RESTART_DELAY)
+            processes[cluster_id] = start_cluster(
+                cluster_id, clusters[cluster_id], shard_count, calc_workers
+            )
+
+    for process in processes.values():
+        process.wait()
+
+
+if __name__ == "__main__":
+    main()
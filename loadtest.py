@@ -0,0 +1,396 @@
+import os
+import math
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+from discord import app_commands
+
+import config
+from calc_helpers import CombinedDistributionCache, start_calc_pool
+from distribution_table import ensure_distribution_table
+from embed_cache import EmbedCache
+from loop_monitor import LoopLagMonitor
+from shared_state import SharedStore, SharedCooldownMapping
+from shared_memory_cache import SharedDistributionCache
+from cogs.bags import Bags, get_bag_stats
+from cogs.general import General
+
+# Load test for the bags and general cogs without a Discord connection. The
+# command callbacks run against stand-in Interaction/Context objects whose
+# API calls (defer, send, edit) sleep for a simulated Discord latency, so the
+# numbers include the bot's own awaits but no real network.
+#
+# Usage: python loadtest.py [--requests 2000] [--rate 50] [--api-latency 80]
+#
+# Invocations arrive as a Poisson process at --rate per second, drawn from
+# --mix, with bag counts and goals spread like real /bags usage. Reports
+# throughput, latency percentiles per command, timeouts, errors, cooldowns and
+# event-loop lag.
+
+try:
+    from scipy.stats import norm  # noqa: F401
+
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+DEFAULT_MIX = "bags_slash=40,bags_prefix=25,baginfo=15,menu=20"
+LAG_INTERVAL = 0.01  # seconds between event-loop lag samples
+
+
+class FakeAPI:
+    """Simulated Discord REST latency: lognormal around `mean_ms`."""
+
+    def __init__(self, rng, mean_ms, jitter):
+        self.rng = rng
+        self.mu = math.log(max(mean_ms, 0.001) / 1000) - jitter**2 / 2
+        self.jitter = jitter
+        self.calls = 0
+
+    async def call(self):
+        self.calls += 1
+        await asyncio.sleep(self.rng.lognormvariate(self.mu, self.jitter))
+
+
+class FakeUser:
+    def __init__(self, user_id, name="loadtest"):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.avatar = None
+        self.display_avatar = FakeAsset()
+
+    def __str__(self):
+        return f"{self.name}#{self.id}"
+
+
+class FakeAsset:
+    url = "https://cdn.discordapp.com/embed/avatars/0.png"
+
+
+class Outcome:
+    # The last embed a command sent, used to tell timeouts and errors apart.
+    def __init__(self):
+        self.embed = None
+
+    def record(self, embed):
+        if embed is not None:
+            self.embed = embed
+
+
+class FakeMessage:
+    def __init__(self, api, outcome):
+        self.api = api
+        self.outcome = outcome
+
+    async def edit(self, content=None, embed=None, view=None):
+        await self.api.call()
+        self.outcome.record(embed)
+        return self
+
+
+class FakeTyping:
+    def __init__(self, api):
+        self.api = api
+
+    async def __aenter__(self):
+        await self.api.call()
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class FakeContext:
+    def __init__(self, api, user):
+        self.api = api
+        self.author = user
+        self.message = self  # SharedCooldownMapping only reads message.author
+        self.outcome = Outcome()
+
+    async def send(self, content=None, embed=None, view=None):
+        await self.api.call()
+        self.outcome.record(embed)
+        return FakeMessage(self.api, self.outcome)
+
+    def typing(self):
+        return FakeTyping(self.api)
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def defer(self, ephemeral=False, thinking=False):
+        await self.interaction.api.call()
+        self._done = True
+
+    async def send_message(self, content=None, embed=None, view=None, ephemeral=False):
+        await self.interaction.api.call()
+        self._done = True
+        self.interaction.outcome.record(embed)
+
+    async def edit_message(self, content=None, embed=None, view=None):
+        await self.send_message(content=content, embed=embed)
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, embed=None, view=None, ephemeral=False):
+        await self.interaction.api.call()
+        self.interaction.outcome.record(embed)
+        return FakeMessage(self.interaction.api, self.interaction.outcome)
+
+
+class FakeInteraction:
+    def __init__(self, api, client, command, user, guild_id):
+        self.api = api
+        self.client = client
+        self.command = command
+        self.user = user
+        self.guild_id = guild_id
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.outcome = Outcome()
+
+    async def edit_original_response(self, content=None, embed=None, view=None):
+        await self.api.call()
+        self.outcome.record(embed)
+
+
+class LoadTestBot:
+    """The attributes the cogs read from the bot, without a gateway."""
+
+    def __init__(self, store_path, calc_pool):
+        for setting in config.ENGINE_SETTINGS:
+            setattr(self, setting, getattr(config, setting))
+        self.SCIPY_AVAILABLE = SCIPY_AVAILABLE
+        self.SLASH_ONLY = False
+        self.MENTION_PREFIX_FALLBACK = False
+        self.OWNER_DISPLAY_NAME = "Bot Owner"
+        self.owner_id = None
+        self.user = FakeUser(0, "ccBot")
+        self.latency = 0.0
+        self.guilds = []
+        self.bot_online_since = None
+        self.shared_store = SharedStore(store_path)
+        self.prefix_cooldowns = SharedCooldownMapping(self.shared_store, "bags", 1, 10)
+        self.embed_cache = EmbedCache()
+        # Shared memory like the bot's, so the run includes the index and
+        # segment costs; its store lives in the run's temporary directory.
+        self.distribution_cache = SharedDistributionCache(
+            self.shared_store,
+            table=ensure_distribution_table(
+                config.DISTRIBUTION_TABLE_PATH, config.DISTRIBUTION_TABLE_BAGS
+            ),
+        )
+        self.combined_cache = CombinedDistributionCache(self.distribution_cache)
+        # Samples more often than the bot's and keeps the whole run.
+        self.loop_monitor = LoopLagMonitor(interval=LAG_INTERVAL, window=24 * 3600)
+        self.calc_pool = calc_pool
+
+    def add_view(self, view, message_id=None):
+        pass
+
+    def add_dynamic_items(self, *items):
+        pass
+
+    def remove_dynamic_items(self, *items):
+        pass
+
+
+def random_bags_args(rng, bot):
+    # Most players open a few dozen bags; a long tail opens hundreds or more,
+    # which takes the approximate engines. Goals sit around the expected total.
+    bag1 = min(int(rng.lognormvariate(math.log(40), 1.0)), 5000)
+    bag2 = min(int(rng.lognormvariate(math.log(20), 1.0)), 5000)
+    mean1, var1 = get_bag_stats(bot.BAG_I_DEFINITION)
+    mean2, var2 = get_bag_stats(bot.BAG_II_DEFINITION)
+    mean = mean1 * bag1 + mean2 * bag2
+    std_dev = math.sqrt(var1 * bag1 + var2 * bag2)
+    targets = [max(0, round(mean + rng.gauss(0.5, 1.2) * std_dev))]
+    if rng.random() < 0.2:
+        targets += [
+            max(0, round(mean + rng.gauss(1.0, 1.5) * std_dev))
+            for _ in range(rng.randint(1, 3))
+        ]
+    percentiles = "10 50 90" if rng.random() < 0.15 else None
+    return bag1, bag2, targets, percentiles
+
+
+class LoadTest:
+    def __init__(self, bot, bags_cog, general_cog, api, rng, users):
+        self.bot = bot
+        self.bags_cog = bags_cog
+        self.general_cog = general_cog
+        self.api = api
+        self.rng = rng
+        self.users = users
+        self.results = []  # (command, seconds, status)
+
+    def _user(self):
+        user_id = self.rng.randint(1, self.users)
+        return FakeUser(user_id, f"user{user_id}")
+
+    def _interaction(self, command):
+        return FakeInteraction(
+            self.api, self.bot, command, self._user(), self.rng.randint(1, 50)
+        )
+
+    async def _run_slash(self, command, *args):
+        interaction = self._interaction(command)
+        for check in command.checks:
+            await check(interaction)
+        await command.callback(command.binding, interaction, *args)
+        return interaction.outcome
+
+    async def _run_prefix(self, cog, command, *args):
+        # command.cog is only set once a cog is added to a real bot.
+        ctx = FakeContext(self.api, self._user())
+        await command.callback(cog, ctx, *args)
+        return ctx.outcome
+
+    async def invoke(self, name):
+        if name == "bags_slash":
+            bag1, bag2, targets, percentiles = random_bags_args(self.rng, self.bot)
+            ss = " ".join(str(target) for target in targets)
+            return await self._run_slash(
+                self.bags_cog.bags_slash, bag1, bag2, ss, percentiles, None
+            )
+        if name == "bags_prefix":
+            bag1, bag2, targets, percentiles = random_bags_args(self.rng, self.bot)
+            more_args = [str(target) for target in targets[1:]]
+            if percentiles:
+                more_args += [f"{p}%" for p in percentiles.split()]
+            return await self._run_prefix(
+                self.bags_cog,
+                self.bags_cog.bags_prefix, bag1, bag2, targets[0], *more_args
+            )
+        if name == "baginfo":
+            if self.rng.random() < 0.5:
+                return await self._run_slash(self.bags_cog.baginfo_slash)
+            return await self._run_prefix(self.bags_cog, self.bags_cog.baginfo_prefix)
+        if name == "menu":
+            if self.rng.random() < 0.5:
+                return await self._run_slash(self.general_cog.menu_slash)
+            return await self._run_prefix(self.general_cog, self.general_cog.menu_prefix)
+        raise ValueError(f"Unknown command {name!r} in --mix.")
+
+    async def timed_invoke(self, name, hard_timeout):
+        start = time.perf_counter()
+        try:
+            outcome = await asyncio.wait_for(self.invoke(name), timeout=hard_timeout)
+            title = outcome.embed.title if outcome.embed else ""
+            if title.startswith("⏰"):
+                status = "timeout"
+            elif title.startswith("⚠️ Cooldown"):
+                status = "cooldown"
+            elif title.startswith(("⚠️ Unexpected", "🐛", "❌")):
+                status = "error"
+            else:
+                status = "ok"
+        except app_commands.CommandOnCooldown:
+            status = "cooldown"
+        except asyncio.TimeoutError:
+            status = "timeout"
+        except Exception:
+            status = "error"
+        self.results.append((name, time.perf_counter() - start, status))
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def print_report(results, elapsed, lag_samples, api_calls):
+    print(f"\n{len(results)} invocations in {elapsed:.1f}s "
+          f"({len(results) / elapsed:.1f}/s), {api_calls} simulated API calls")
+    print(f"{'command':<12} {'count':>6} {'ok':>6} {'timeout':>8} {'error':>6} {'cooldown':>9} "
+          f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    names = sorted({name for name, _, _ in results}) + ["all"]
+    for name in names:
+        rows = [r for r in results if name in ("all", r[0])]
+        latencies = sorted(seconds * 1000 for _, seconds, _ in rows)
+        counts = {status: sum(1 for r in rows if r[2] == status)
+                  for status in ("ok", "timeout", "error", "cooldown")}
+        print(f"{name:<12} {len(rows):>6} {counts['ok']:>6} {counts['timeout']:>8} "
+              f"{counts['error']:>6} {counts['cooldown']:>9} {percentile(latencies, 50):>8.1f} "
+              f"{percentile(latencies, 90):>8.1f} {percentile(latencies, 99):>8.1f} "
+              f"{(latencies[-1] if latencies else 0):>8.1f}")
+    lags = sorted(lag * 1000 for lag in lag_samples)
+    print(f"event-loop lag: p50 {percentile(lags, 50):.1f} ms, p99 {percentile(lags, 99):.1f} ms, "
+          f"max {(lags[-1] if lags else 0):.1f} ms")
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    calc_pool = start_calc_pool(args.workers)
+    with tempfile.TemporaryDirectory(prefix="ccbot-loadtest-") as store_dir:
+        bot = LoadTestBot(os.path.join(store_dir, "shared_state.db"), calc_pool)
+        bot.CALC_WORKERS = args.workers
+        try:
+            bags_cog = Bags(bot)
+            general_cog = General(bot)
+            await bags_cog.cog_load()
+            await general_cog.cog_load()
+
+            api = FakeAPI(rng, args.api_latency, args.api_jitter)
+            load_test = LoadTest(bot, bags_cog, general_cog, api, rng, args.users)
+            hard_timeout = bot.CALCULATION_TIMEOUT * 2
+
+            bot.loop_monitor.start()
+
+            names = list(mix)
+            weights = [mix[name] for name in names]
+            start = time.perf_counter()
+            tasks = []
+            for _ in range(args.requests):
+                name = rng.choices(names, weights)[0]
+                tasks.append(asyncio.create_task(load_test.timed_invoke(name, hard_timeout)))
+                await asyncio.sleep(rng.expovariate(args.rate))
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - start
+        finally:
+            bot.loop_monitor.stop()
+            calc_pool.shutdown()
+            # The shared-memory segments outlive the process unless unlinked.
+            bot.distribution_cache.clear()
+            SharedDistributionCache.purge(bot.shared_store)
+    print_report(load_test.results, elapsed, bot.loop_monitor.samples, api.calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the bags and general cogs.")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=50.0, help="arrivals per second")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"default: {DEFAULT_MIX}")
+    parser.add_argument("--users", type=int, default=5000, help="distinct simulated users")
+    parser.add_argument("--api-latency", type=float, default=80.0, help="mean simulated API latency (ms)")
+    parser.add_argument("--api-jitter", type=float, default=0.5, help="lognormal sigma of the latency")
+    parser.add_argument("--workers", type=int, default=config.CALC_WORKERS)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import asyncio
+import time
+import logging
+import discord
+
+logger = logging.getLogger("discord_bot")
+
+
+# Small TTL cache for Discord REST lookups shared by the cogs (bot.lookup_cache).
+# Reads prefer the gateway cache, never block on the network once an entry
+# exists, and stale entries are refreshed by a background task.
+class DiscordLookupCache:
+    def __init__(self, bot_instance, ttl=3600):
+        self.bot_instance = bot_instance
+        self.ttl = ttl
+        self._users = {}  # user_id -> (user or None, fetched_at)
+        self._refreshing = {}  # user_id -> asyncio.Task
+
+    def get_user(self, user_id):
+        """Returns the cached user (or None) without any network call. Missing
+        or expired entries are refreshed in the background."""
+        user = self.bot_instance.get_user(user_id)
+        if user is not None:
+            return user
+        entry = self._users.get(user_id)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            self._schedule_refresh(user_id)
+        return entry[0] if entry else None
+
+    async def fetch_user(self, user_id):
+        """Like get_user, but waits for the REST call if nothing is cached yet."""
+        user = self.get_user(user_id)
+        if user is None and user_id not in self._users:
+            task = self._refreshing.get(user_id)
+            user = await (asyncio.shield(task) if task else self._refresh_user(user_id))
+        return user
+
+    def invalidate(self, user_id):
+        self._users.pop(user_id, None)
+
+    def _schedule_refresh(self, user_id):
+        if user_id not in self._refreshing:
+            self._refreshing[user_id] = asyncio.create_task(
+                self._refresh_user(user_id)
+            )
+
+    async def _refresh_user(self, user_id):
+        try:
+            user = await self.bot_instance.fetch_user(user_id)
+            self._users[user_id] = (user, time.monotonic())
+            return user
+        except discord.NotFound:
+            logger.warning(f"User with ID {user_id} not found.")
+            # Negative entry so unknown ids don't hit the API on every read.
+            self._users[user_id] = (None, time.monotonic())
+            return None
+        except discord.HTTPException as e:
+            logger.error(f"Failed to fetch user {user_id}: {e}")
+            entry = self._users.get(user_id)
+            return entry[0] if entry else None
+        finally:
+            self._refreshing.pop(user_id, None)
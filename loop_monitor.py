@@ -0,0 +1,81 @@
+import time
+import asyncio
+import logging
+import collections
+
+logger = logging.getLogger("discord_bot")
+
+# Event-loop health. LoopLagMonitor samples how late a short sleep wakes up,
+# which is how long something held the loop. TimeSlice makes computations
+# that still run on the loop yield after a time budget instead of once per
+# iteration, so how long they hold it no longer grows with the input size.
+
+SLICE_BUDGET = 0.005  # seconds a computation may hold the loop between yields
+
+
+class LoopLagMonitor:
+    def __init__(self, interval=0.05, window=60.0, warn_after=0.25):
+        self.interval = interval
+        self.warn_after = warn_after
+        self.samples = collections.deque(maxlen=max(1, int(window / interval)))
+        self._task = None
+
+    def start(self):
+        # Call from the running event loop (setup_hook).
+        if self._task is None:
+            self._task = asyncio.create_task(self._sample_loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sample_loop(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - start - self.interval, 0.0)
+            self.samples.append(lag)
+            if lag > self.warn_after:
+                logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms.")
+
+    def summary(self):
+        """p50, p99 and max lag in milliseconds over the sampled window."""
+        lags = sorted(self.samples)
+        if not lags:
+            return {"p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0, "samples": 0}
+
+        def at(percentile):
+            return lags[min(len(lags) - 1, int(percentile / 100 * len(lags)))] * 1000
+
+        return {
+            "p50_ms": round(at(50), 2),
+            "p99_ms": round(at(99), 2),
+            "max_ms": round(lags[-1] * 1000, 2),
+            "samples": len(lags),
+        }
+
+
+class TimeSlice:
+    """`await checkpoint()` once per iteration yields to the loop only when
+    `budget` seconds have passed since the last yield. The check can only
+    happen between iterations, so a slice overshoots by up to one iteration;
+    slices longer than twice the budget, where a single iteration was too
+    long to share the loop well, are logged."""
+
+    def __init__(self, name, budget=SLICE_BUDGET):
+        self.name = name
+        self.budget = budget
+        self._started = time.perf_counter()
+
+    async def checkpoint(self):
+        elapsed = time.perf_counter() - self._started
+        if elapsed < self.budget:
+            return
+        if elapsed > 2 * self.budget:
+            logger.warning(
+                f"{self.name} held the event loop for {elapsed * 1000:.1f} ms "
+                f"(budget {self.budget * 1000:.0f} ms)."
+            )
+        await asyncio.sleep(0)
+        self._started = time.perf_counter()
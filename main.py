@@ -6,6 +6,7 @@ from discord import app_commands
 from dotenv import load_dotenv
 import logging
 import datetime
+import signal
 
 # Conditional import for scipy (remains in main as it's a global dependency check)
 try:
@@ -16,26 +17,129 @@ except ImportError:
     SCIPY_AVAILABLE = False
     print("SciPy not found. Normal approximation will not be available.")
 
-from keep_alive import keep_alive  # Assuming this is for replit/uptime
+from shared_state import SharedStore, SharedCooldownMapping
+from lookup_cache import DiscordLookupCache
+from command_sync import sync_command_tree
+from embed_cache import EmbedCache
+from shared_memory_cache import SharedDistributionCache
+from http_api import start_http_server
+from pull_history import PullHistory
+from distribution_table import ensure_distribution_table
+from calc_helpers import CombinedDistributionCache, start_calc_pool
+from loop_monitor import LoopLagMonitor
+from graceful_shutdown import (
+    ShutdownManager,
+    ShutdownAwareTree,
+    schedule_graceful_shutdown,
+    process_commands_unless_shutting_down,
+)
+import config
 
 load_dotenv()
 TOKEN = os.getenv("DISCORD_TOKEN")
 OWNER = os.getenv("OWNER_ID")  # Keep OWNER for the owner commands cog
 
-keep_alive()
+# --- Sharding ---
+# SHARD_IDS/SHARD_COUNT/CLUSTER_ID are set by launcher.py for each cluster
+# process. AUTO_SHARD=1 runs a single process with Discord's recommended count.
+SHARD_IDS = os.getenv("SHARD_IDS")
+SHARD_COUNT = os.getenv("SHARD_COUNT")
+CLUSTER_ID = int(os.getenv("CLUSTER_ID", "0"))
+AUTO_SHARD = os.getenv("AUTO_SHARD", "0").lower() in ("1", "true", "yes")
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "shared_state.db")
+# Per-user /bagslog entries; one SQLite file shared by all clusters.
+PULL_HISTORY_PATH = os.getenv("PULL_HISTORY_PATH", "pull_history.db")
+# Total size of the shared-memory distribution cache across all processes.
+SHARED_CACHE_MB = int(os.getenv("SHARED_CACHE_MB", "256"))
+# Hot distributions saved on shutdown and loaded on the next start; one file
+# per cluster, since each saves what its own processes used.
+CACHE_SNAPSHOT_PATH = os.getenv(
+    "CACHE_SNAPSHOT_PATH",
+    f"cache_snapshot.cluster{CLUSTER_ID}.npz" if SHARD_IDS else "cache_snapshot.npz",
+)
+# How long shutdown waits for running commands before closing anyway.
+SHUTDOWN_DRAIN_TIMEOUT = float(
+    os.getenv("SHUTDOWN_DRAIN_TIMEOUT", str(config.CALCULATION_TIMEOUT + 5))
+)
+
+# Set DEV_GUILD_ID to sync commands to a single guild (applies instantly).
+DEV_GUILD_ID = int(os.getenv("DEV_GUILD_ID")) if os.getenv("DEV_GUILD_ID") else None
+COMMAND_SYNC_FINGERPRINT_PATH = os.getenv(
+    "COMMAND_SYNC_FINGERPRINT_PATH", "command_tree.fingerprint.json"
+)
+
+# Health check and calculation API (see http_api.py). Only one process may
+# bind the port, so it runs on cluster 0. It has no authentication, so it only
+# listens locally unless HTTP_HOST says otherwise (e.g. 0.0.0.0 for a
+# hosting platform's health check).
+HTTP_HOST = os.getenv("HTTP_HOST", "127.0.0.1")
+HTTP_PORT = int(os.getenv("HTTP_PORT", "8080"))
+
+# --- Low-memory gateway profile ---
+# LOW_MEMORY_MODE=1 drops gateway events the bot never uses, caches no members,
+# skips guild chunking and keeps a small message cache (MESSAGE_CACHE_SIZE,
+# 0 disables it), so memory stays flat as the guild count grows.
+LOW_MEMORY_MODE = os.getenv("LOW_MEMORY_MODE", "0").lower() in ("1", "true", "yes")
+MESSAGE_CACHE_SIZE = int(os.getenv("MESSAGE_CACHE_SIZE", "100"))
+
+# --- Slash-only mode ---
+# SLASH_ONLY=1 drops the privileged message-content intent and prefix commands;
+# everything is served through app commands. MENTION_PREFIX_FALLBACK=1 keeps
+# prefix commands reachable as "@Bot bags 10 5 200" (Discord still delivers the
+# content of messages that mention the bot). Without the fallback, message
+# events are not subscribed to at all.
+SLASH_ONLY = os.getenv("SLASH_ONLY", "0").lower() in ("1", "true", "yes")
+MENTION_PREFIX_FALLBACK = os.getenv("MENTION_PREFIX_FALLBACK", "0").lower() in (
+    "1",
+    "true",
+    "yes",
+)
 
 intents = discord.Intents.default()
-intents.message_content = True
+intents.message_content = not SLASH_ONLY
+command_prefix = "!"
+if SLASH_ONLY:
+    command_prefix = commands.when_mentioned
+    if not MENTION_PREFIX_FALLBACK:
+        intents.guild_messages = False
+        intents.dm_messages = False
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+bot_options = {}
+if LOW_MEMORY_MODE:
+    intents.typing = False
+    intents.reactions = False
+    intents.voice_states = False
+    intents.invites = False
+    intents.integrations = False
+    intents.webhooks = False
+    intents.emojis_and_stickers = False
+    intents.guild_scheduled_events = False
+    intents.moderation = False
+    intents.polls = False
+    intents.auto_moderation = False
+    bot_options = {
+        "member_cache_flags": discord.MemberCacheFlags.none(),
+        "chunk_guilds_at_startup": False,
+        "max_messages": MESSAGE_CACHE_SIZE or None,
+    }
 
-bot.remove_command("help")
+# Refuses and tracks slash commands for graceful shutdown.
+bot_options["tree_cls"] = ShutdownAwareTree
 
-# --- Global Constants (Still fine in main.py, or move to a config.py) ---
-CALCULATION_TIMEOUT = 15
-EXACT_CALC_THRESHOLD_BOX1 = 100
-EXACT_CALC_THRESHOLD_BOX2 = 100
-PROB_DIFFERENCE_THRESHOLD = 0.001
+if SHARD_IDS:
+    bot = commands.AutoShardedBot(
+        command_prefix=command_prefix,
+        intents=intents,
+        shard_ids=[int(shard_id) for shard_id in SHARD_IDS.split(",")],
+        shard_count=int(SHARD_COUNT),
+        **bot_options,
+    )
+elif AUTO_SHARD:
+    bot = commands.AutoShardedBot(command_prefix=command_prefix, intents=intents, **bot_options)
+else:
+    bot = commands.Bot(command_prefix=command_prefix, intents=intents, **bot_options)
+
+bot.remove_command("help")
 
 # Global variable for bot online time and owner display name
 # bot_online_since = None
@@ -45,55 +149,34 @@ OWNER_DISPLAY_NAME = "Bot Owner"  # Default, will be updated on_ready
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("bot.log"), logging.StreamHandler()],
+    handlers=[
+        logging.FileHandler(f"bot.cluster{CLUSTER_ID}.log" if SHARD_IDS else "bot.log"),
+        logging.StreamHandler(),
+    ],
 )
 logger = logging.getLogger("discord_bot")
 
-# --- Global Bag Definitions (Castle Clash Data) ---
-# It's okay to keep these in main.py if they are truly global and constant,
-# or you could move them to a separate 'constants.py' or 'config.py' file
-# and import them into your cogs. For now, let's assume they are imported
-# into cogs that need them.
-BAG_I_DEFINITION = [
-    (1, 0.36),
-    (2, 0.37),
-    (5, 0.15),
-    (10, 0.07),
-    (20, 0.03),
-    (30, 0.02),
-]
-BAG_II_DEFINITION = [
-    (10, 0.46),
-    (15, 0.27),
-    (20, 0.17),
-    (50, 0.05),
-    (80, 0.03),
-    (100, 0.02),
-]
-
-
 # --- Bot Events (Reduced in main.py) ---
 @bot.event
-async def on_ready():
+async def setup_hook():
+    # One-time startup. Unlike on_ready, this does not run again when the
+    # gateway reconnects.
     global OWNER_DISPLAY_NAME
-    logger.info(f"Logged on as {bot.user}!")
-    bot.bot_online_since = discord.utils.utcnow()
 
     # Set bot owner ID and fetch name
     if OWNER:
         bot.owner_id = int(OWNER)  # Set owner_id for is_owner() check
-        try:
-            owner_user = await bot.fetch_user(bot.owner_id)
+        # Served from the lookup cache on reconnects, so no REST call then.
+        owner_user = await bot.lookup_cache.fetch_user(bot.owner_id)
+        if owner_user:
             OWNER_DISPLAY_NAME = (
                 owner_user.display_name
                 if hasattr(owner_user, "display_name")
                 else owner_user.name
             )
             logger.info(f"Fetched owner display name: {OWNER_DISPLAY_NAME}")
-        except (ValueError, discord.NotFound, discord.HTTPException) as e:
-            logger.warning(
-                f"Could not fetch owner's name: {e}. Using default 'Bot Owner'."
-            )
+        else:
+            logger.warning("Could not fetch owner's name. Using default 'Bot Owner'.")
             OWNER_DISPLAY_NAME = "Bot Owner"
     else:
         logger.warning(
@@ -101,10 +184,20 @@ async def on_ready():
         )
 
     # Assign the (now updated) global OWNER_DISPLAY_NAME to the bot object
-    # directly within on_ready(). This ensures it's set after fetching.
+    # directly within setup_hook(). This ensures it's set after fetching.
     bot.OWNER_DISPLAY_NAME = OWNER_DISPLAY_NAME
     logger.info(f"Bot's OWNER_DISPLAY_NAME attribute set to: {bot.OWNER_DISPLAY_NAME}")
 
+    bot.pull_history.start()
+    bot.loop_monitor.start()
+    # launcher.py stops clusters with SIGTERM: finish running commands and
+    # save the cache snapshot instead of exiting at once.
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGTERM, schedule_graceful_shutdown, bot
+    )
+    if CLUSTER_ID == 0:
+        bot.http_runner = await start_http_server(bot, HTTP_HOST, HTTP_PORT)
+
     # Load cogs here
     initial_extensions = [
         "cogs.general",
@@ -123,17 +216,49 @@ async def on_ready():
         except Exception as e:
             logger.error(f"Unknown error loading extension {extension}: {e}")
 
-    try:
-        # Sync slash commands after cogs are loaded
-        await bot.tree.sync()
-        logger.info("Slash commands synced successfully.")
-    except Exception as e:
-        logger.error(f"Failed to sync slash commands: {e}")
+    # Sync slash commands after cogs are loaded, only if the tree changed.
+    # Clusters share the fingerprint file, so only the first one syncs.
+    if CLUSTER_ID == 0:
+        try:
+            await sync_command_tree(bot)
+        except Exception as e:
+            logger.error(f"Failed to sync slash commands: {e}")
+
+
+@bot.event
+async def on_ready():
+    logger.info(f"Logged on as {bot.user}!")
+    if not getattr(bot, "bot_online_since", None):
+        bot.bot_online_since = discord.utils.utcnow()
+    await publish_guild_stats()
+
+
+async def publish_guild_stats():
+    # Each cluster only sees its own shards' guilds; /info sums these.
+    # member_count comes with GUILD_CREATE, so no member cache is needed.
+    # In a worker thread: another cluster may hold the database write lock.
+    guild_count = len(bot.guilds)
+    member_count = sum(g.member_count or 0 for g in bot.guilds)
+    await asyncio.to_thread(bot.shared_store.set_stat, f"guilds:{CLUSTER_ID}", guild_count)
+    await asyncio.to_thread(bot.shared_store.set_stat, f"members:{CLUSTER_ID}", member_count)
+
+
+@bot.event
+async def on_message(message):
+    # Prefix commands: refused once shutdown has started, tracked otherwise.
+    await process_commands_unless_shutting_down(bot, message)
+
+
+@bot.event
+async def on_guild_remove(guild):
+    logger.info(f"Removed from guild: {guild.name} ({guild.id})")
+    await publish_guild_stats()
 
 
 @bot.event
 async def on_guild_join(guild):
     logger.info(f"Joined guild: {guild.name} ({guild.id})")
+    await publish_guild_stats()
     embed = discord.Embed(
         title="🎉 Thanks for inviting me!",
         description="Hello! I'm your friendly Soulstone Probability Calculator bot. I can help you determine the chances of getting specific soulstone totals from your bag draws.",
@@ -144,7 +269,11 @@ async def on_guild_join(guild):
 
     embed.add_field(
         name="🚀 Getting Started",
-        value="You can use either **slash commands** (preferred) or **prefix commands**.",
+        value=(
+            "Use the **slash commands** below."
+            if SLASH_ONLY
+            else "You can use either **slash commands** (preferred) or **prefix commands**."
+        ),
         inline=False,
     )
     embed.add_field(
@@ -157,19 +286,24 @@ async def on_guild_join(guild):
         ),
         inline=False,
     )
+    if not SLASH_ONLY:
+        embed.add_field(
+            name="💡 Prefix Command (Alternative): `!bags`",
+            value=(
+                "**Usage:** `!bags <number of bag I> <number of bag II> <soulstones goal>`\n"
+                "**Example:** `!bags 10 5 200`"
+            ),
+            inline=False,
+        )
     embed.add_field(
-        name="💡 Prefix Command (Alternative): `!bags`",
+        name="❓ Need More Help?",
         value=(
-            "**Usage:** `!bags <number of bag I> <number of bag II> <soulstones goal>`\n"
-            "**Example:** `!bags 10 5 200`"
+            "Type `/menu` for a list of all commands."
+            if SLASH_ONLY
+            else "Type `/menu` or `!menu` for a list of all commands."
         ),
         inline=False,
     )
-    embed.add_field(
-        name="❓ Need More Help?",
-        value="Type `/menu` or `!menu` for a list of all commands.",
-        inline=False,
-    )
     # Use the global OWNER_DISPLAY_NAME here
     embed.set_footer(text=f"Bot developed by {OWNER_DISPLAY_NAME}")
 
@@ -236,16 +370,45 @@ async def on_app_command_error(
 
 
 # Make global variables available to cogs through the bot object
-bot.CALCULATION_TIMEOUT = CALCULATION_TIMEOUT
-bot.EXACT_CALC_THRESHOLD_BOX1 = EXACT_CALC_THRESHOLD_BOX1
-bot.EXACT_CALC_THRESHOLD_BOX2 = EXACT_CALC_THRESHOLD_BOX2
-bot.PROB_DIFFERENCE_THRESHOLD = PROB_DIFFERENCE_THRESHOLD
+for setting in config.ENGINE_SETTINGS:
+    setattr(bot, setting, getattr(config, setting))
 bot.SCIPY_AVAILABLE = SCIPY_AVAILABLE
-bot.BAG_I_DEFINITION = BAG_I_DEFINITION
-bot.BAG_II_DEFINITION = BAG_II_DEFINITION
-bot.prefix_cooldowns = commands.CooldownMapping.from_cooldown(
-    1, 10, commands.BucketType.user
+bot.CLUSTER_ID = CLUSTER_ID
+bot.SLASH_ONLY = SLASH_ONLY
+bot.MENTION_PREFIX_FALLBACK = MENTION_PREFIX_FALLBACK
+bot.DEV_GUILD_ID = DEV_GUILD_ID
+bot.COMMAND_SYNC_FINGERPRINT_PATH = COMMAND_SYNC_FINGERPRINT_PATH
+bot.CACHE_SNAPSHOT_PATH = CACHE_SNAPSHOT_PATH
+bot.SHUTDOWN_DRAIN_TIMEOUT = SHUTDOWN_DRAIN_TIMEOUT
+bot.shutdown_manager = ShutdownManager()
+# Cooldowns and stats live in a SQLite file so all shard clusters share them.
+bot.shared_store = SharedStore(SHARED_STATE_PATH)
+bot.prefix_cooldowns = SharedCooldownMapping(bot.shared_store, "bags", 1, 10)
+bot.lookup_cache = DiscordLookupCache(bot)
+bot.embed_cache = EmbedCache()
+bot.pull_history = PullHistory(PULL_HISTORY_PATH)
+bot.loop_monitor = LoopLagMonitor()
+# In-range arrays come from the memory-mapped table; everything else is
+# computed once and shared by all clusters through shared memory. Under the
+# launcher, it purges segments left by the previous run instead.
+if not SHARD_IDS:
+    SharedDistributionCache.purge(bot.shared_store)
+bot.distribution_cache = SharedDistributionCache(
+    bot.shared_store,
+    max_bytes=SHARED_CACHE_MB * 1024 * 1024,
+    table=ensure_distribution_table(
+        config.DISTRIBUTION_TABLE_PATH, config.DISTRIBUTION_TABLE_BAGS
+    ),
 )
+try:
+    loaded = bot.distribution_cache.load_snapshot(CACHE_SNAPSHOT_PATH)
+    logger.info(f"Loaded {loaded} cached distributions from {CACHE_SNAPSHOT_PATH}.")
+except Exception as e:
+    logger.warning(f"Ignoring cache snapshot {CACHE_SNAPSHOT_PATH}: {e}")
+# Bag I + Bag II totals behind the /bags result buttons (per process).
+bot.combined_cache = CombinedDistributionCache(bot.distribution_cache)
+# Forked here, before bot.run starts any threads.
+bot.calc_pool = start_calc_pool(config.CALC_WORKERS)
 
 
 bot.run(TOKEN)
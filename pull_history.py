@@ -0,0 +1,147 @@
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+import collections
+
+logger = logging.getLogger("discord_bot")
+
+
+# What users report they got from their bags (/bagslog), kept in a local
+# SQLite file in WAL mode. log() only puts the entry on an asyncio queue; one
+# writer task drains the queue and writes whatever accumulated as a single
+# transaction in a worker thread, so the event loop never waits on the disk.
+# Entries stay in `_pending` until their transaction commits; history() reads
+# the committed rows and adds the pending ones from memory.
+class PullHistory:
+    def __init__(self, path, max_batch=500):
+        self.path = path
+        self.max_batch = max_batch
+        self._local = threading.local()
+        self._connections = []  # every thread's connection, closed by close()
+        self._queue = asyncio.Queue()
+        self._writer = None
+        # Logged but not committed yet, oldest first. The lock is held across
+        # a commit and the removal of its entries, so a reader holding it sees
+        # each entry exactly once: either committed or still pending.
+        self._pending = collections.deque()
+        self._pending_lock = threading.Lock()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS pulls ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, "
+            "bag1 INTEGER NOT NULL, bag2 INTEGER NOT NULL, got INTEGER NOT NULL, "
+            "percentile REAL NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS pulls_by_user ON pulls (user_id, created_at)"
+        )
+
+    def _connection(self):
+        # sqlite3 connections must not be shared between threads.
+        # check_same_thread=False only so close() can close them all.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._pending_lock:
+                self._connections.append(conn)
+        return conn
+
+    def start(self):
+        # Call from the running event loop (setup_hook).
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    def log(self, user_id, bag1, bag2, got, percentile):
+        entry = (user_id, bag1, bag2, got, percentile, time.time())
+        with self._pending_lock:
+            self._pending.append(entry)
+        self._queue.put_nowait(entry)
+
+    async def _write_loop(self):
+        while True:
+            rows = [await self._queue.get()]
+            while len(rows) < self.max_batch and not self._queue.empty():
+                rows.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._write_batch, rows)
+            except Exception as e:
+                logger.error(f"Failed to write {len(rows)} pull history entries: {e}")
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    def _write_batch(self, rows):
+        # The queue and _pending are both in log order, so a batch is always
+        # the oldest len(rows) pending entries. A failed batch is dropped too.
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT INTO pulls (user_id, bag1, bag2, got, percentile, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            with self._pending_lock:
+                try:
+                    conn.execute("COMMIT")
+                finally:
+                    for _ in rows:
+                        self._pending.popleft()
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    async def flush(self):
+        # Waits until everything logged so far is on disk.
+        if self._writer is not None:
+            await self._queue.join()
+
+    async def close(self):
+        await self.flush()
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        with self._pending_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    async def history(self, user_id, limit=10):
+        """The user's latest entries, newest first, and (count, average
+        percentile) over all of them. Includes entries still queued, without
+        waiting for them to be written."""
+        return await asyncio.to_thread(self._read_history, user_id, limit)
+
+    def _read_history(self, user_id, limit):
+        conn = self._connection()
+        with self._pending_lock:
+            conn.execute("BEGIN")
+            try:
+                rows = conn.execute(
+                    "SELECT bag1, bag2, got, percentile, created_at FROM pulls "
+                    "WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT ?",
+                    (user_id, limit),
+                ).fetchall()
+                count, average = conn.execute(
+                    "SELECT COUNT(*), AVG(percentile) FROM pulls WHERE user_id = ?",
+                    (user_id,),
+                ).fetchone()
+            finally:
+                conn.execute("COMMIT")
+            queued = [entry[1:] for entry in self._pending if entry[0] == user_id]
+
+        if queued:
+            rows = sorted(queued + rows, key=lambda row: row[4], reverse=True)[:limit]
+            total = sum(entry[3] for entry in queued) + (average or 0.0) * count
+            count += len(queued)
+            average = total / count
+        return rows, (count, average)
@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import logging
+import numpy as np
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+from calc_helpers import DistributionCache
+
+logger = logging.getLogger("discord_bot")
+
+# A DistributionCache whose arrays live in POSIX shared memory, so an n-fold
+# distribution computed by one shard or worker process is read by all others
+# straight from the same pages, without pickling or copying.
+#
+# The index is kept in the SharedStore (SQLite): one row per array with its
+# segment name and last use, plus one row per process that has the segment
+# mapped. That holder count is the reference count: only segments no live
+# process holds are evicted (least recently used first) once the total size
+# passes `max_bytes`. Each process still keeps its own LRU of mapped arrays.
+# Lookups only read the index (no write lock); the last use and holder rows
+# they produce are written in batches. Only arrays a caller asked for are
+# published; folds computed on the way to them stay local.
+
+SEGMENT_PREFIX = "ccbot_dist_"
+FLUSH_INTERVAL = 5.0  # seconds between batched writes of lookups to the index
+LOOKUP_BATCH = 500  # keys per IN (...) query, below SQLite's parameter limit
+
+
+def _create_index(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS shm_arrays (key TEXT PRIMARY KEY, "
+        "segment TEXT NOT NULL, length INTEGER NOT NULL, "
+        "bytes INTEGER NOT NULL, last_used REAL NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS shm_holders (key TEXT NOT NULL, "
+        "pid INTEGER NOT NULL, PRIMARY KEY (key, pid))"
+    )
+
+
+def _untrack(shm):
+    # Before 3.13 the resource tracker unlinks every segment a process created
+    # or attached when it exits; their lifetime is managed by the index here.
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+def _unlink_segment(name):
+    try:
+        shm = SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()  # also unregisters it from the resource tracker
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedDistributionCache(DistributionCache):
+    def __init__(self, store, max_bytes=256 * 1024 * 1024, max_entries=512, table=None):
+        super().__init__(max_entries=max_entries, table=table)
+        self.store = store
+        self.max_bytes = max_bytes
+        self._segments = {}  # key -> SharedMemory mapped by this process
+        self._retired = []  # (key, SharedMemory) evicted locally, still referenced
+        self._used = {}  # index key -> last use, not yet written to the index
+        self._unregistered = {}  # index key -> segment mapped without a holder row
+        self._last_flush = time.monotonic()
+        with store.transaction() as conn:
+            _create_index(conn)
+        atexit.register(self.clear)
+
+    @staticmethod
+    def _index_key(key):
+        kind, box_key, num_draws = key
+        return json.dumps([kind, [list(item) for item in box_key], num_draws])
+
+    def _view(self, key, shm, length):
+        self._segments[key] = shm
+        return np.ndarray((length,), dtype=np.float64, buffer=shm.buf)
+
+    def _attach(self, key, segment, length):
+        # Maps a published segment into this process, or None if it is gone.
+        index_key = self._index_key(key)
+        try:
+            shm = SharedMemory(name=segment)
+        except FileNotFoundError:
+            # Evicted since the lookup, or left over from a run whose
+            # segments are gone.
+            with self.store.transaction() as conn:
+                conn.execute(
+                    "DELETE FROM shm_arrays WHERE key = ? AND segment = ?", (index_key, segment)
+                )
+            return None
+        _untrack(shm)
+        self._unregistered[index_key] = segment
+        self._record_use(index_key)
+        return super()._put(key, self._view(key, shm, length))
+
+    def _get(self, key):
+        array = super()._get(key)
+        if array is not None:
+            return array
+        with self.store.read() as conn:
+            row = conn.execute(
+                "SELECT segment, length FROM shm_arrays WHERE key = ?", (self._index_key(key),)
+            ).fetchone()
+        if row is None:
+            return None
+        return self._attach(key, *row)
+
+    def _nearest_fold(self, box_key, num_draws):
+        # The local arrays and the table first, then a single lookup for
+        # anything larger other processes published, instead of one per count.
+        start, dist = 0, np.array([1.0])
+        for draws in range(num_draws - 1, 0, -1):
+            local = DistributionCache._get(self, ("fold", box_key, draws))
+            if local is not None:
+                start, dist = draws, local
+                break
+        candidates = {
+            self._index_key(("fold", box_key, draws)): draws
+            for draws in range(start + 1, num_draws)
+        }
+        index_keys = list(candidates)
+        best = None
+        with self.store.read() as conn:
+            for first in range(0, len(index_keys), LOOKUP_BATCH):
+                chunk = index_keys[first : first + LOOKUP_BATCH]
+                rows = conn.execute(
+                    "SELECT key, segment, length FROM shm_arrays WHERE key IN "
+                    f"({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for index_key, segment, length in rows:
+                    if best is None or candidates[index_key] > best[0]:
+                        best = (candidates[index_key], segment, length)
+        if best is not None:
+            draws, segment, length = best
+            shared = self._attach(("fold", box_key, draws), segment, length)
+            if shared is not None:
+                return draws, shared
+        return start, dist
+
+    def _keep(self, key, array):
+        # Intermediate folds stay in this process; only the arrays callers
+        # asked for get a segment and an index row.
+        array.flags.writeable = False
+        return DistributionCache._put(self, key, array)
+
+    def _record_use(self, index_key):
+        # last_used and holder rows are written in batches, at the next
+        # publish or once FLUSH_INTERVAL has passed, not on every lookup. Until
+        # then another process may evict a segment mapped here; the mapping
+        # stays valid, it just no longer counts towards max_bytes.
+        self._used[index_key] = time.time()
+        if time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+            with self.store.transaction() as conn:
+                self._flush_uses(conn)
+
+    def _flush_uses(self, conn):
+        if self._used:
+            conn.executemany(
+                "UPDATE shm_arrays SET last_used = MAX(last_used, ?) WHERE key = ?",
+                [(used, index_key) for index_key, used in self._used.items()],
+            )
+        if self._unregistered:
+            # Only for the segment that was mapped, in case it was replaced.
+            conn.executemany(
+                "INSERT OR IGNORE INTO shm_holders (key, pid) "
+                "SELECT key, ? FROM shm_arrays WHERE key = ? AND segment = ?",
+                [
+                    (os.getpid(), index_key, segment)
+                    for index_key, segment in self._unregistered.items()
+                ],
+            )
+        self._used.clear()
+        self._unregistered.clear()
+        self._last_flush = time.monotonic()
+
+    def _put(self, key, array):
+        self._close_retired()
+        index_key = self._index_key(key)
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        shm = SharedMemory(
+            name=f"{SEGMENT_PREFIX}{uuid.uuid4().hex[:16]}",
+            create=True,
+            size=max(array.nbytes, 1),
+        )
+        _untrack(shm)
+        np.ndarray(array.shape, dtype=np.float64, buffer=shm.buf)[:] = array
+
+        with self.store.transaction() as conn:
+            row = conn.execute(
+                "SELECT segment, length FROM shm_arrays WHERE key = ?", (index_key,)
+            ).fetchone()
+            if row is not None:
+                # Another process published it first: use theirs.
+                shm.close()
+                shm.unlink()
+                shm = SharedMemory(name=row[0])
+                _untrack(shm)
+            else:
+                conn.execute(
+                    "INSERT INTO shm_arrays (key, segment, length, bytes, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (index_key, shm.name, len(array), array.nbytes, time.time()),
+                )
+            conn.execute(
+                "INSERT OR IGNORE INTO shm_holders (key, pid) VALUES (?, ?)",
+                (index_key, os.getpid()),
+            )
+            self._flush_uses(conn)
+            self._evict_shared(conn)
+        return super()._put(key, self._view(key, shm, len(array)))
+
+    def _evict_shared(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM shm_arrays").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for pid in {pid for (pid,) in conn.execute("SELECT DISTINCT pid FROM shm_holders")}:
+            if not _process_alive(pid):
+                conn.execute("DELETE FROM shm_holders WHERE pid = ?", (pid,))
+        candidates = conn.execute(
+            "SELECT key, segment, bytes FROM shm_arrays WHERE key NOT IN "
+            "(SELECT key FROM shm_holders) ORDER BY last_used"
+        ).fetchall()
+        for index_key, segment, size in candidates:
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM shm_arrays WHERE key = ?", (index_key,))
+            _unlink_segment(segment)
+            total -= size
+
+    def _evicted(self, key, array):
+        shm = self._segments.pop(key, None)
+        if shm is not None:
+            self._retired.append((key, shm))
+
+    def _close_retired(self):
+        # A segment can only be unmapped once no array view of it is alive;
+        # until then it stays retired and keeps its holder row.
+        still_open = []
+        released = []
+        for key, shm in self._retired:
+            try:
+                shm.close()
+            except BufferError:
+                still_open.append((key, shm))
+                continue
+            index_key = self._index_key(key)
+            self._unregistered.pop(index_key, None)
+            released.append(index_key)
+        self._retired = still_open
+        if released:
+            with self.store.transaction() as conn:
+                conn.executemany(
+                    "DELETE FROM shm_holders WHERE key = ? AND pid = ?",
+                    [(index_key, os.getpid()) for index_key in released],
+                )
+
+    def clear(self):
+        with self._lock:
+            for key, array in list(self._arrays.items()):
+                self._evicted(key, array)
+            super().clear()
+            self._close_retired()
+
+    @staticmethod
+    def purge(store):
+        """Unlinks every indexed segment; for startup, before any process maps one."""
+        with store.transaction() as conn:
+            _create_index(conn)
+            segments = [row[0] for row in conn.execute("SELECT segment FROM shm_arrays")]
+            conn.execute("DELETE FROM shm_arrays")
+            conn.execute("DELETE FROM shm_holders")
+        for segment in segments:
+            _unlink_segment(segment)
+        logger.info(f"Purged {len(segments)} shared distribution segments.")
@@ -0,0 +1,188 @@
+import asyncio
+import sqlite3
+import threading
+import time
+import logging
+import contextlib
+from discord import app_commands
+
+logger = logging.getLogger("discord_bot")
+
+COOLDOWN_PRUNE_INTERVAL = 60.0  # seconds between deletions of expired cooldowns
+
+
+# A small SQLite-backed store for state that has to be global across shard
+# clusters running as separate processes on the same host (cooldowns, stats).
+# SQLite in WAL mode handles concurrent readers/writers from several processes.
+class SharedStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._last_prune = 0.0
+        with self.transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cooldowns (key TEXT PRIMARY KEY, "
+                "window REAL NOT NULL, tokens INTEGER NOT NULL, expires REAL NOT NULL)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(cooldowns)")]
+            if "expires" not in columns:
+                # Databases from before expired rows were pruned.
+                conn.execute(
+                    "ALTER TABLE cooldowns ADD COLUMN expires REAL NOT NULL DEFAULT 0"
+                )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+
+    def _connection(self):
+        # sqlite3 connections must not be shared between threads.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        # Yields the connection inside BEGIN IMMEDIATE, so the block runs with
+        # the database write lock held across all processes.
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @contextlib.contextmanager
+    def read(self):
+        # Yields the connection inside a deferred transaction: a consistent
+        # snapshot that (in WAL mode) neither takes nor waits for the write lock.
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    def update_rate_limit(self, key, rate, per):
+        # Same semantics as discord.py's Cooldown.update_rate_limit: returns the
+        # seconds left when the bucket is exhausted, otherwise None. A row
+        # whose window has passed acts like no row, so once a minute those
+        # are deleted; otherwise the table keeps one row per user forever.
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if now - self._last_prune >= COOLDOWN_PRUNE_INTERVAL:
+                self._last_prune = now
+                conn.execute("DELETE FROM cooldowns WHERE expires < ?", (now,))
+            row = conn.execute(
+                "SELECT window, tokens FROM cooldowns WHERE key = ?", (key,)
+            ).fetchone()
+            window, tokens = row if row else (0.0, rate)
+            if now > window + per:
+                tokens = rate
+            if tokens == 0:
+                conn.execute("COMMIT")
+                return per - (now - window)
+            if tokens == rate:
+                window = now
+            tokens -= 1
+            conn.execute(
+                "INSERT OR REPLACE INTO cooldowns (key, window, tokens, expires) "
+                "VALUES (?, ?, ?, ?)",
+                (key, window, tokens, window + per),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return None
+
+    def reset_cooldown(self, key):
+        self._connection().execute("DELETE FROM cooldowns WHERE key = ?", (key,))
+
+    def set_stat(self, name, value):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO stats (name, value) VALUES (?, ?)", (name, value)
+        )
+
+    def increment_stat(self, name, amount=1):
+        self._connection().execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def sum_stats(self, prefix):
+        row = self._connection().execute(
+            "SELECT COALESCE(SUM(value), 0) FROM stats WHERE name LIKE ?",
+            (f"{prefix}%",),
+        ).fetchone()
+        return row[0]
+
+    def clear_stats(self, prefix):
+        self._connection().execute(
+            "DELETE FROM stats WHERE name LIKE ?", (f"{prefix}%",)
+        )
+
+
+class _SharedCooldownBucket:
+    def __init__(self, store, key, rate, per):
+        self.store = store
+        self.key = key
+        self.rate = rate
+        self.per = per
+
+    # Coroutines: the SQLite transaction runs in a worker thread, so waiting
+    # for another cluster's write lock never blocks the event loop.
+    async def update_rate_limit(self):
+        return await asyncio.to_thread(
+            self.store.update_rate_limit, self.key, self.rate, self.per
+        )
+
+    async def reset(self):
+        await asyncio.to_thread(self.store.reset_cooldown, self.key)
+
+
+class SharedCooldownMapping:
+    """Like commands.CooldownMapping (get_bucket, then update_rate_limit/reset,
+    which are awaited here), with the buckets kept in the SharedStore so every
+    cluster sees them."""
+
+    def __init__(self, store, name, rate, per):
+        self.store = store
+        self.name = name
+        self.rate = rate
+        self.per = per
+
+    def get_bucket(self, message):
+        return self.get_user_bucket(message.author.id)
+
+    def get_user_bucket(self, user_id):
+        # For interactions without a message of the user's (buttons).
+        return _SharedCooldownBucket(
+            self.store, f"{self.name}:{user_id}", self.rate, self.per
+        )
+
+
+def shared_cooldown(rate, per, key):
+    """app_commands check equivalent to app_commands.checks.cooldown, backed by
+    the bot's SharedStore instead of per-process memory."""
+    cooldown = app_commands.Cooldown(rate, per)
+
+    async def predicate(interaction):
+        store = interaction.client.shared_store
+        bucket_key = f"{interaction.command.qualified_name}:{key(interaction)}"
+        retry_after = await asyncio.to_thread(
+            store.update_rate_limit, bucket_key, rate, per
+        )
+        if retry_after:
+            raise app_commands.CommandOnCooldown(cooldown, retry_after)
+        return True
+
+    return app_commands.check(predicate)
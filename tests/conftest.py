@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, not in a package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+
+
+@pytest.fixture
+def bag1():
+    return config.BAG_I_DEFINITION
+
+
+@pytest.fixture
+def bag2():
+    return config.BAG_II_DEFINITION
@@ -0,0 +1,80 @@
+import asyncio
+import collections
+
+import numpy as np
+import pytest
+
+from calc_helpers import (
+    TRANSFORM_MIN_DRAWS,
+    calculate_draws_until_goal,
+    draws_until_by_transform,
+    summarize_draws_until,
+)
+
+
+def reference_draws_until(box_def, target_sum, tolerance=1e-15):
+    # Opens bags one at a time over a dict of the totals still below the goal.
+    below = {0: 1.0}
+    stop_probs = [0.0]
+    while sum(below.values()) > tolerance:
+        next_below = collections.defaultdict(float)
+        stopped = 0.0
+        for total, prob in below.items():
+            for val, prob_of_value in box_def:
+                if total + val >= target_sum:
+                    stopped += prob * prob_of_value
+                else:
+                    next_below[total + val] += prob * prob_of_value
+        stop_probs.append(stopped)
+        below = next_below
+    return np.array(stop_probs)
+
+
+def assert_close(result, expected, atol=1e-12):
+    length = max(len(result), len(expected))
+    result = np.pad(result, (0, length - len(result)))
+    expected = np.pad(expected, (0, length - len(expected)))
+    np.testing.assert_allclose(result, expected, rtol=0, atol=atol)
+
+
+@pytest.mark.parametrize("target_sum", [1, 7, 50, 120])
+def test_small_goals_match_reference(bag1, target_sum):
+    result = asyncio.run(calculate_draws_until_goal(bag1, target_sum))
+    assert_close(result, reference_draws_until(bag1, target_sum))
+
+
+@pytest.mark.parametrize("target_sum", [600, 1500])
+def test_transform_matches_reference_bag1(bag1, target_sum):
+    result = asyncio.run(calculate_draws_until_goal(bag1, target_sum))
+    expected = reference_draws_until(bag1, target_sum)
+    assert_close(result, expected)
+    mean_draws, quantiles = summarize_draws_until(result, (50, 90, 99))
+    expected_mean, expected_quantiles = summarize_draws_until(expected, (50, 90, 99))
+    assert mean_draws == pytest.approx(expected_mean, rel=1e-12)
+    assert quantiles == expected_quantiles
+
+
+def test_common_factor_bag2(bag2):
+    # Bag II values are all multiples of 5; goals between multiples round up.
+    for target_sum in (2996, 3000):
+        result = asyncio.run(calculate_draws_until_goal(bag2, target_sum))
+        assert_close(result, reference_draws_until(bag2, target_sum))
+
+
+def test_transform_only_for_long_runs(bag1):
+    values = [val for val, prob in bag1]
+    probs = [prob for val, prob in bag1]
+    assert draws_until_by_transform(values, probs, 30, 1e-12) is None
+    stop_probs = draws_until_by_transform(values, probs, 1000, 1e-12)
+    assert stop_probs is not None
+    assert np.flatnonzero(stop_probs)[0] >= TRANSFORM_MIN_DRAWS - 1
+    assert stop_probs.sum() == pytest.approx(1.0, abs=1e-10)
+
+
+def test_goal_already_reached(bag1):
+    np.testing.assert_array_equal(asyncio.run(calculate_draws_until_goal(bag1, 0)), [1.0])
+
+
+def test_unreachable_goal():
+    with pytest.raises(ValueError):
+        asyncio.run(calculate_draws_until_goal([(0, 1.0)], 10))
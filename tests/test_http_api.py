@@ -0,0 +1,128 @@
+import asyncio
+import types
+
+import aiohttp
+import pytest
+
+import http_api
+from http_api import CalculationBatcher, start_http_server
+
+
+class FakeParser:
+    """Stands in for async_parser: records each calculation and answers
+    P(S >= ss) = ss / 1000 after a short delay."""
+
+    def __init__(self, delay=0.01, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, bot_instance, bag1, bag2, target_sums, *args, **kwargs):
+        self.calls.append((bag1, bag2, list(target_sums)))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+            target_results = [(ss, ss / 10, 0.0) for ss in target_sums]
+            return (target_results, [], [], []), "exact"
+        finally:
+            self.running -= 1
+
+
+@pytest.fixture
+def bot():
+    return types.SimpleNamespace(CALCULATION_TIMEOUT=5, MAX_TARGETS_PER_QUERY=50)
+
+
+@pytest.fixture
+def parser(monkeypatch):
+    parser = FakeParser()
+    monkeypatch.setattr(http_api, "async_parser", parser)
+    return parser
+
+
+def test_same_pair_is_calculated_once(bot, parser):
+    async def scenario():
+        batcher = CalculationBatcher(bot)
+        return await asyncio.gather(
+            batcher.submit(100, 50, [500]),
+            batcher.submit(100, 50, [800, 500]),
+            batcher.submit(100, 50, [300]),
+        )
+
+    first, second, third = asyncio.run(scenario())
+    assert parser.calls == [(100, 50, [300, 500, 800])]
+    assert [record["ss"] for record in second] == [800, 500]
+    assert first[0]["probability"] == pytest.approx(50.0)
+    assert third[0]["method"] == "exact"
+
+
+def test_distinct_pairs_are_limited(bot, parser):
+    async def scenario():
+        batcher = CalculationBatcher(bot, max_concurrent=2)
+        return await asyncio.gather(
+            *(batcher.submit(bag1, 0, [bag1]) for bag1 in range(1, 7))
+        )
+
+    results = asyncio.run(scenario())
+    assert len(parser.calls) == 6
+    assert parser.max_running == 2
+    assert [result[0]["ss"] for result in results] == list(range(1, 7))
+
+
+def test_failure_reaches_every_waiter(bot, monkeypatch):
+    monkeypatch.setattr(http_api, "async_parser", FakeParser(error=ValueError("too many")))
+
+    async def scenario():
+        batcher = CalculationBatcher(bot)
+        return await asyncio.gather(
+            batcher.submit(1, 1, [5]), batcher.submit(1, 1, [6]), return_exceptions=True
+        )
+
+    assert [str(error) for error in asyncio.run(scenario())] == ["too many", "too many"]
+
+
+def post_calc(bot, body):
+    async def scenario():
+        runner = await start_http_server(bot, "127.0.0.1", 0)
+        try:
+            host, port = runner.addresses[0][:2]
+            async with aiohttp.ClientSession() as session:
+                async with session.post(f"http://{host}:{port}/calc", json=body) as response:
+                    return response.status, await response.json()
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(scenario())
+
+
+def test_calc_endpoint_batches_a_request(bot, parser):
+    status, answers = post_calc(
+        bot,
+        [
+            {"bag1": 10, "bag2": 2, "ss": 100},
+            {"bag1": 10, "bag2": 2, "ss": [200]},
+            {"bag1": -1},
+        ],
+    )
+    assert status == 200
+    assert parser.calls == [(10, 2, [100, 200])]
+    assert answers[1]["results"][0]["ss"] == 200
+    assert "error" in answers[2]
+
+
+def test_calc_endpoint_limits_distinct_pairs(bot, parser):
+    queries = [
+        {"bag1": bag1, "bag2": 0, "ss": 10}
+        for bag1 in range(http_api.MAX_PAIRS_PER_REQUEST + 1)
+    ]
+    status, answer = post_calc(bot, queries)
+    assert status == 413
+    assert "pairs" in answer["error"]
+    assert parser.calls == []
+    status, _ = post_calc(bot, queries[:-1])
+    assert status == 200
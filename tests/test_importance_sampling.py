@@ -0,0 +1,67 @@
+import asyncio
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import config
+from calc_helpers import calculate_rational_tail, run_importance_sampling, solve_tilt
+from cogs.bags import async_parser, result_records, run_normal_approximation
+
+
+@pytest.mark.parametrize("target_sum", [250, 400, 600])
+def test_estimate_matches_exact_tail(bag1, bag2, target_sum):
+    exact = float(calculate_rational_tail(bag1, bag2, 40, 5, target_sum)[0])
+    estimate, standard_error = run_importance_sampling(
+        bag1, bag2, 40, 5, target_sum, 200_000, seed=7
+    )
+    assert abs(estimate - exact) < 5 * standard_error
+    assert estimate == pytest.approx(exact, rel=0.05)
+
+
+def test_far_tail_below_plain_monte_carlo(bag1, bag2):
+    # Around 1e-20: no plain simulation would ever see such a total.
+    exact = float(calculate_rational_tail(bag1, bag2, 40, 5, 1000)[0])
+    assert exact < 1e-15
+    estimate, _ = run_importance_sampling(bag1, bag2, 40, 5, 1000, 200_000, seed=7)
+    assert estimate == pytest.approx(exact, rel=0.05)
+
+
+def test_edges_are_exact(bag1, bag2):
+    min_sum = 40 * 1 + 5 * 10
+    max_sum = 40 * 30 + 5 * 100
+    assert run_importance_sampling(bag1, bag2, 40, 5, min_sum, 10) == (1.0, 0.0)
+    assert run_importance_sampling(bag1, bag2, 40, 5, max_sum + 1, 10) == (0.0, 0.0)
+    estimate, standard_error = run_importance_sampling(bag1, bag2, 40, 5, max_sum, 10)
+    assert standard_error == 0.0
+    assert estimate == pytest.approx(0.02**40 * 0.02**5, rel=1e-9)
+
+
+def test_no_tilt_below_the_mean(bag1, bag2):
+    assert solve_tilt(bag1, bag2, 40, 5, 100) == 0.0
+    assert solve_tilt(bag1, bag2, 40, 5, 600) > 0.0
+
+
+def test_only_tail_targets_are_sampled(bag1, bag2):
+    with ThreadPoolExecutor(2) as pool:
+        bot = types.SimpleNamespace(
+            BAG_I_DEFINITION=bag1,
+            BAG_II_DEFINITION=bag2,
+            EXACT_CALC_THRESHOLD_BOX1=100,
+            EXACT_CALC_THRESHOLD_BOX2=100,
+            SCIPY_AVAILABLE=True,
+            TAIL_SAMPLING_THRESHOLD=config.TAIL_SAMPLING_THRESHOLD,
+            TAIL_SAMPLES=config.TAIL_SAMPLES,
+            distribution_cache=types.SimpleNamespace(table=None),
+            calc_pool=pool,
+        )
+        result_data, method = asyncio.run(async_parser(bot, 200, 200, [5000, 9000]))
+    normal = run_normal_approximation(bag1, bag2, 200, 200, [5000], True)[0][0]
+    assert method == "importance_sampling"
+    assert result_data[0][0] == normal
+    assert result_data[3][0] == (None, None)
+    low, high = result_data[3][1]
+    assert 0 < low <= result_data[0][1][1] <= high
+    records = result_records(result_data, method)
+    assert records[5000]["method"] == "normal_approx"
+    assert records[9000]["method"] == "importance_sampling"
@@ -0,0 +1,53 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from calc_helpers import DistributionCache
+from cogs.bags import (
+    array_quantiles,
+    build_combined_distribution,
+    run_exact_calculation,
+    run_table_calculation,
+    summarize_quantiles,
+)
+
+PERCENTILES = (1, 5, 10, 25, 50, 75, 90, 95, 99, 100)
+
+
+def dense(combined_sums_probs):
+    combined = np.zeros(max(combined_sums_probs) + 1)
+    for total, prob in combined_sums_probs.items():
+        combined[total] = prob
+    return combined
+
+
+@pytest.mark.parametrize("draws", [(1, 0), (0, 1), (10, 3), (40, 12)])
+def test_array_quantiles_match_dict_engine(bag1, bag2, draws):
+    combined_sums_probs = asyncio.run(build_combined_distribution(bag1, bag2, *draws))
+    assert array_quantiles(dense(combined_sums_probs), PERCENTILES) == summarize_quantiles(
+        combined_sums_probs, PERCENTILES
+    )
+
+
+def test_quantiles_on_exact_boundary():
+    # P(S >= 2) is exactly 50%, so the median is 2, not 1.
+    combined_sums_probs = {1: 0.5, 2: 0.25, 3: 0.25}
+    assert summarize_quantiles(combined_sums_probs, (50, 75)) == [(50, 2), (75, 1)]
+    assert array_quantiles(dense(combined_sums_probs), (50, 75)) == [(50, 2), (75, 1)]
+
+
+def test_table_engine_matches_dict_engine(bag1, bag2):
+    targets = [50, 200, 333, 600]
+    exact = asyncio.run(run_exact_calculation(bag1, bag2, 30, 10, targets, PERCENTILES))
+    table = run_table_calculation(
+        DistributionCache(), bag1, bag2, 30, 10, targets, PERCENTILES
+    )
+    for (ss, at_least, point), (table_ss, table_at_least, table_point) in zip(
+        exact[0], table[0]
+    ):
+        assert table_ss == ss
+        assert table_at_least == pytest.approx(at_least, abs=1e-10)
+        assert table_point == pytest.approx(point, abs=1e-10)
+    assert table[2] == exact[2]
+    assert [total for total, _ in table[1]] == [total for total, _ in exact[1]]
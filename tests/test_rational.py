@@ -0,0 +1,57 @@
+import asyncio
+import collections
+from fractions import Fraction
+
+import pytest
+
+from calc_helpers import calculate_rational_tail, integer_power_coefficients
+from cogs.bags import build_combined_distribution, summarize_targets
+
+
+def fraction_distribution(box_def, num_draws):
+    # The dict engine again, in exact fractions.
+    dist = {0: Fraction(1)}
+    for _ in range(num_draws):
+        next_dist = collections.defaultdict(Fraction)
+        for total, prob in dist.items():
+            for val, prob_of_value in box_def:
+                next_dist[total + val] += prob * Fraction(str(prob_of_value))
+        dist = next_dist
+    return dist
+
+
+@pytest.mark.parametrize("num_draws", [0, 1, 5, 17])
+def test_power_coefficients_are_exact(bag1, num_draws):
+    coefficients, denominator = integer_power_coefficients(bag1, num_draws)
+    expected = fraction_distribution(bag1, num_draws)
+    assert sum(coefficients) == denominator
+    for total, coefficient in enumerate(coefficients):
+        assert Fraction(coefficient, denominator) == expected.get(total, 0)
+
+
+@pytest.mark.parametrize("target_sum", [-5, 0, 40, 123, 260, 10**6])
+def test_rational_tail_matches_fraction_engine(bag1, bag2, target_sum):
+    dist1 = fraction_distribution(bag1, 12)
+    dist2 = fraction_distribution(bag2, 4)
+    expected_tail = sum(
+        p1 * p2
+        for s1, p1 in dist1.items()
+        for s2, p2 in dist2.items()
+        if s1 + s2 >= target_sum
+    )
+    expected_exact = sum(
+        p1 * dist2.get(target_sum - s1, 0) for s1, p1 in dist1.items()
+    )
+    assert calculate_rational_tail(bag1, bag2, 12, 4, target_sum) == (
+        expected_tail,
+        expected_exact,
+    )
+
+
+def test_rational_tail_agrees_with_float_engine(bag1, bag2):
+    targets = [100, 400, 700]
+    combined_sums_probs = asyncio.run(build_combined_distribution(bag1, bag2, 60, 15))
+    for ss, at_least, point in summarize_targets(combined_sums_probs, targets):
+        tail, exact = calculate_rational_tail(bag1, bag2, 60, 15, ss)
+        assert float(tail) * 100 == pytest.approx(at_least, abs=1e-9)
+        assert float(exact) * 100 == pytest.approx(point, abs=1e-9)
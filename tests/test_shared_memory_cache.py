@@ -0,0 +1,115 @@
+import json
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+
+from calc_helpers import DistributionCache
+from shared_memory_cache import SharedDistributionCache, _untrack
+from shared_state import SharedStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SharedStore(str(tmp_path / "shared_state.db"))
+    yield store
+    SharedDistributionCache.purge(store)
+
+
+def indexed_segments(store):
+    # {draw count: segment name} of the published folds.
+    with store.read() as conn:
+        rows = conn.execute("SELECT key, segment FROM shm_arrays").fetchall()
+    return {json.loads(key)[2]: segment for key, segment in rows}
+
+
+def segment_exists(name):
+    try:
+        shm = SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    _untrack(shm)
+    shm.close()
+    return True
+
+
+def test_folds_match_the_local_cache(store, bag1):
+    cache = SharedDistributionCache(store)
+    try:
+        expected = DistributionCache().fold(bag1, 60)
+        np.testing.assert_allclose(cache.fold(bag1, 60), expected, rtol=0, atol=1e-15)
+        np.testing.assert_allclose(
+            cache.survival(bag1, 60), DistributionCache().survival(bag1, 60), atol=1e-15
+        )
+    finally:
+        cache.clear()
+
+
+def test_only_requested_folds_are_published(store, bag1):
+    cache = SharedDistributionCache(store)
+    try:
+        cache.fold(bag1, 40)
+        assert list(indexed_segments(store)) == [40]
+    finally:
+        cache.clear()
+
+
+def test_other_process_continues_from_a_published_fold(store, bag1):
+    first = SharedDistributionCache(store)
+    second = SharedDistributionCache(store)
+    try:
+        published = np.array(first.fold(bag1, 50))
+        segment = indexed_segments(store)[50]
+        result = second.fold(bag1, 52)
+        assert second._segments[("fold", tuple(bag1), 50)].name == segment
+        np.testing.assert_allclose(
+            result, DistributionCache().fold(bag1, 52), rtol=0, atol=1e-15
+        )
+        np.testing.assert_array_equal(second.fold(bag1, 50), published)
+        del result
+    finally:
+        second.clear()
+        first.clear()
+
+
+def test_unheld_segments_are_evicted_oldest_first(store, bag1):
+    # Fold n of Bag I has 30 n + 1 totals: 12 kB, 24 kB, 36 kB and 48 kB.
+    first = SharedDistributionCache(store)
+    for num_draws in (50, 100, 150):
+        first.fold(bag1, num_draws)
+    segments = indexed_segments(store)
+    first.clear()  # releases its holder rows
+
+    second = SharedDistributionCache(store, max_bytes=90_000)
+    try:
+        second.fold(bag1, 200)  # continues from 150, which it now holds
+        remaining = indexed_segments(store)
+        assert sorted(remaining) == [150, 200]
+        assert not segment_exists(segments[50])
+        assert not segment_exists(segments[100])
+        assert all(segment_exists(segment) for segment in remaining.values())
+    finally:
+        second.clear()
+
+
+def test_held_segments_are_not_evicted(store, bag1, bag2):
+    holder = SharedDistributionCache(store)
+    publisher = SharedDistributionCache(store, max_bytes=1)
+    try:
+        holder.fold(bag1, 50)
+        publisher.fold(bag2, 10)
+        assert sorted(indexed_segments(store)) == [10, 50]
+    finally:
+        publisher.clear()
+        holder.clear()
+
+
+def test_purge_unlinks_everything(store, bag1):
+    cache = SharedDistributionCache(store)
+    cache.fold(bag1, 30)
+    (segment,) = indexed_segments(store).values()
+    cache.clear()
+    SharedDistributionCache.purge(store)
+    assert not segment_exists(segment)
+    with store.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM shm_arrays").fetchone()[0] == 0
@@ -0,0 +1,109 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+import shared_state
+from shared_state import SharedCooldownMapping, SharedStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SharedStore(str(tmp_path / "shared_state.db"))
+
+
+def test_bucket_runs_out_and_refills(store, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(shared_state.time, "time", lambda: now[0])
+    assert store.update_rate_limit("bags:1", 2, 10) is None
+    assert store.update_rate_limit("bags:1", 2, 10) is None
+    now[0] += 4
+    assert store.update_rate_limit("bags:1", 2, 10) == pytest.approx(6)
+    assert store.update_rate_limit("bags:2", 2, 10) is None  # other keys unaffected
+    now[0] += 7
+    assert store.update_rate_limit("bags:1", 2, 10) is None
+
+
+def test_reset_clears_the_bucket(store):
+    assert store.update_rate_limit("bags:1", 1, 60) is None
+    assert store.update_rate_limit("bags:1", 1, 60) > 0
+    store.reset_cooldown("bags:1")
+    assert store.update_rate_limit("bags:1", 1, 60) is None
+
+
+def test_expired_cooldowns_are_pruned(store, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(shared_state.time, "time", lambda: now[0])
+    store.update_rate_limit("bags:1", 1, 10)
+    store.update_rate_limit("daily:1", 1, 600)
+    now[0] += shared_state.COOLDOWN_PRUNE_INTERVAL
+    store.update_rate_limit("bags:2", 1, 10)
+    keys = [row[0] for row in store._connection().execute("SELECT key FROM cooldowns")]
+    assert sorted(keys) == ["bags:2", "daily:1"]
+    assert store.update_rate_limit("daily:1", 1, 600) > 0
+
+
+def test_cooldowns_table_without_expiry_is_migrated(tmp_path):
+    path = str(tmp_path / "shared_state.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE cooldowns ("
+        "key TEXT PRIMARY KEY, window REAL NOT NULL, tokens INTEGER NOT NULL)"
+    )
+    conn.execute("INSERT INTO cooldowns VALUES ('bags:1', 0, 0)")
+    conn.commit()
+    conn.close()
+    store = SharedStore(path)
+    assert store.update_rate_limit("bags:1", 1, 10) is None
+    assert store.update_rate_limit("bags:1", 1, 10) > 0
+    SharedStore(path)  # already migrated
+
+
+def test_stores_on_one_file_share_buckets(tmp_path):
+    # Two clusters are two SharedStore objects on the same database.
+    path = str(tmp_path / "shared_state.db")
+    first, second = SharedStore(path), SharedStore(path)
+    assert first.update_rate_limit("bags:1", 1, 60) is None
+    assert second.update_rate_limit("bags:1", 1, 60) > 0
+
+
+def test_concurrent_updates_never_overdraw(store):
+    results = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        for _ in range(5):
+            results.append(store.update_rate_limit("bags:1", 10, 60))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(None) == 10
+
+
+def test_mapping_buckets_are_per_user(store):
+    mapping = SharedCooldownMapping(store, "bags", 1, 10)
+
+    async def scenario():
+        first = mapping.get_user_bucket(1)
+        assert await first.update_rate_limit() is None
+        assert await first.update_rate_limit() > 0
+        assert await mapping.get_user_bucket(2).update_rate_limit() is None
+        await first.reset()
+        assert await first.update_rate_limit() is None
+
+    asyncio.run(scenario())
+
+
+def test_stats(store):
+    store.increment_stat("requests:1")
+    store.increment_stat("requests:1", 4)
+    store.set_stat("requests:2", 3)
+    store.set_stat("other", 100)
+    assert store.sum_stats("requests:") == 8
+    store.clear_stats("requests:")
+    assert store.sum_stats("requests:") == 0